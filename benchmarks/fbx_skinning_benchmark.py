@@ -0,0 +1,127 @@
+import argparse
+import json
+import logging
+import sys
+import time
+
+import numpy as np
+
+from xrviewer.server.pipelines.fbx.fbx_reader import FbxReader, get_mesh_verts
+
+
+def run(file_path: str, frame_rate: int, n_frames: int, tolerance: float):
+    logger = logging.getLogger('fbx_skinning_benchmark')
+    reader = FbxReader(logger, frame_rate=frame_rate)
+
+    begin = time.time()
+    total_frames = reader.load(file_path)
+    load_time = time.time() - begin
+    if total_frames == 0:
+        raise ValueError(f'No animation loaded from {file_path}')
+
+    frame_indices = np.linspace(
+        0, total_frames - 1, min(n_frames, total_frames), dtype=np.int64)
+
+    legacy_time = vectorized_time = 0
+    max_error = 0
+    for frame_idx in frame_indices:
+        frame_idx = int(frame_idx)
+        begin = time.time()
+        expected = get_mesh_verts(reader.root_node, reader.time_mode,
+                                  frame_idx)
+        legacy_time += time.time() - begin
+
+        begin = time.time()
+        verts = reader.forward(frame_idx)
+        vectorized_time += time.time() - begin
+
+        if verts.shape != expected.shape:
+            raise ValueError(f'Frame {frame_idx}: got {verts.shape} vertices,'
+                             f' expected {expected.shape}')
+        max_error = max(max_error, float(np.abs(verts - expected).max()))
+
+    # lookups in the baked bone transforms
+    begin = time.time()
+    reader.bake_bone_table()
+    bake_time = time.time() - begin
+
+    baked_time = 0
+    for frame_idx in frame_indices:
+        frame_idx = int(frame_idx)
+        expected = get_mesh_verts(reader.root_node, reader.time_mode,
+                                  frame_idx)
+
+        begin = time.time()
+        verts = reader.forward(frame_idx)
+        baked_time += time.time() - begin
+
+        max_error = max(max_error, float(np.abs(verts - expected).max()))
+    reader.release_bone_table()
+
+    n = len(frame_indices)
+    return {
+        'n_verts': reader.skin.n_verts,
+        'n_bones': len(reader.skin.bones),
+        'n_frames': n,
+        'load_ms': load_time * 1000,
+        'legacy_ms_per_frame': legacy_time * 1000 / n,
+        'vectorized_ms_per_frame': vectorized_time * 1000 / n,
+        'speedup': legacy_time / vectorized_time,
+        'bake_ms': bake_time * 1000,
+        'baked_ms_per_frame': baked_time * 1000 / n,
+        'max_error': max_error,
+        'passed': max_error <= tolerance,
+    }
+
+
+def setup_parser():
+    parser = argparse.ArgumentParser(
+        description='Check the vectorized skinning of FbxReader against the '
+        'per-vertex implementation and compare their time per frame.')
+
+    parser.add_argument('fbx', type=str, nargs='+', help='fbx files to check')
+    parser.add_argument(
+        '--frame_rate', type=int, default=30, choices=[30, 60, 120])
+    parser.add_argument(
+        '--n_frames',
+        type=int,
+        default=20,
+        help='number of frames evenly sampled from each animation')
+    parser.add_argument(
+        '--tolerance',
+        type=float,
+        default=1e-4,
+        help='maximum absolute difference of the vertex coordinates')
+    parser.add_argument(
+        '--output', type=str, default=None, help='path to the json report')
+
+    args = parser.parse_args()
+
+    return args
+
+
+if __name__ == '__main__':
+    args = setup_parser()
+
+    report = {}
+    for file_path in args.fbx:
+        report[file_path] = run(file_path, args.frame_rate, args.n_frames,
+                                args.tolerance)
+
+    for name, result in report.items():
+        print(f"{name}: {result['n_verts']} vertices, "
+              f"{result['n_bones']} bones, "
+              f"legacy {result['legacy_ms_per_frame']:.2f} ms/frame, "
+              f"vectorized {result['vectorized_ms_per_frame']:.2f} ms/frame "
+              f"(x{result['speedup']:.1f}), "
+              f"baked {result['baked_ms_per_frame']:.2f} ms/frame "
+              f"after {result['bake_ms']:.0f} ms, "
+              f"max error {result['max_error']:.2e} "
+              f"({'passed' if result['passed'] else 'FAILED'})")
+
+    if args.output is not None:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=4)
+
+    if not all(result['passed'] for result in report.values()):
+        sys.exit(1)
@@ -0,0 +1,127 @@
+import argparse
+import asyncio
+import json
+import time
+from typing import Any, Dict
+
+import numpy as np
+from synthetic import start_pipeline, stop_pipeline
+
+from xrviewer.server.utils import unpack_ndarray
+from xrviewer.server.websocket.headless_viewer import HeadlessViewer
+
+TRANSPORTS = ['zmq', 'shared_memory', 'in_process']
+
+
+async def next_frame(viewer: HeadlessViewer) -> Dict[str, Any]:
+    """Wait for the next frame, skipping the other messages."""
+    while True:
+        msg = await viewer.receive()
+        if msg is None:
+            raise RuntimeError('the websocket server closed the connection')
+        if msg['type'] == 'UPDATE_MESH_VERTICES':
+            return msg['data']
+
+
+async def measure(websocket_port: int, n_frames: int,
+                  n_seeks: int) -> Dict[str, float]:
+    viewer = HeadlessViewer(
+        f'ws://127.0.0.1:{websocket_port}/',
+        buffer_size=n_frames,
+        playback_fps=None)
+    begin = time.time()
+    await viewer.connect(timeout=60)
+    startup_time = time.time() - begin
+    # wait for the pipeline to subscribe to the websocket server
+    await asyncio.sleep(0.5)
+
+    begin = time.time()
+    await viewer.upload(str(n_frames).encode())
+    frame = await next_frame(viewer)
+    first_frame_time = time.time() - begin
+
+    begin = time.time()
+    n_bytes = 0
+    for _ in range(n_frames - 1):
+        frame = await next_frame(viewer)
+        n_bytes += unpack_ndarray(frame['verts']).nbytes
+    stream_time = time.time() - begin
+
+    seek_latencies = []
+    for frame_idx in np.random.default_rng(0).integers(0, n_frames, n_seeks):
+        begin = time.time()
+        await viewer.seek(int(frame_idx))
+        frame = await next_frame(viewer)
+        while frame['frame_idx'] != frame_idx:
+            frame = await next_frame(viewer)
+        seek_latencies.append(time.time() - begin)
+    viewer.close()
+
+    return {
+        'startup_s': startup_time,
+        'first_frame_ms': first_frame_time * 1000,
+        'fps': (n_frames - 1) / stream_time,
+        'mb_per_s': n_bytes / stream_time / 1e6,
+        'seek_median_ms': float(np.median(seek_latencies)) * 1000,
+        'seek_max_ms': float(np.max(seek_latencies)) * 1000,
+    }
+
+
+def run(transport: str, args: argparse.Namespace) -> Dict[str, float]:
+    process = start_pipeline(
+        n_verts=args.n_verts,
+        websocket_port=args.websocket_port,
+        transport=transport,
+        # every frame is computed and sent again
+        frame_cache_size=0)
+    try:
+        return asyncio.run(
+            measure(args.websocket_port, args.n_frames, args.n_seeks))
+    finally:
+        stop_pipeline(process)
+
+
+def setup_parser():
+    parser = argparse.ArgumentParser(
+        description='Report the startup time, throughput and seek latency '
+        'of a synthetic pipeline for each transport to the websocket '
+        'server.')
+
+    parser.add_argument('--n_frames', type=int, default=300)
+    parser.add_argument('--n_verts', type=int, default=250000)
+    parser.add_argument('--n_seeks', type=int, default=20)
+    parser.add_argument('--websocket_port', type=int, default=18878)
+    parser.add_argument(
+        '--transports',
+        type=str,
+        nargs='*',
+        default=TRANSPORTS,
+        choices=TRANSPORTS)
+    parser.add_argument(
+        '--output', type=str, default=None, help='path to the json report')
+
+    args = parser.parse_args()
+
+    return args
+
+
+if __name__ == '__main__':
+    args = setup_parser()
+
+    report = {}
+    for transport in args.transports:
+        report[transport] = run(transport, args)
+        # let the websocket port be released
+        time.sleep(1)
+
+    for name, result in report.items():
+        print(f'{name}: '
+              f"startup {result['startup_s']:.2f} s, "
+              f"first frame {result['first_frame_ms']:.1f} ms, "
+              f"{result['fps']:.1f} fps ({result['mb_per_s']:.0f} MB/s), "
+              f"seek {result['seek_median_ms']:.1f} ms median, "
+              f"{result['seek_max_ms']:.1f} ms max")
+
+    if args.output is not None:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=4)
@@ -0,0 +1,108 @@
+import multiprocessing
+import os
+import signal
+import sys
+import time
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from xrviewer.server.pipelines import Pipeline
+
+
+class SyntheticPipeline(Pipeline):
+    """A pipeline sending a random point cloud translated along the x axis,
+    whose stream data is the number of frames, so that the benchmarks
+    measure the path from the pipeline to the viewer rather than `forward`.
+
+    The time each frame is computed, from `time.monotonic_ns`, is written to
+    the bytes of its first two coordinates, see `read_timestamp`.
+    `forward_time` simulates an expensive `forward`.
+    """
+
+    def __init__(self,
+                 n_verts: int,
+                 forward_time: float = 0.0,
+                 **kwargs) -> None:
+        super().__init__(**kwargs)
+        self.forward_time = forward_time
+        self.grid = np.random.default_rng(0).uniform(
+            size=(max(n_verts, 1), 3)).astype(np.float32)
+
+    def update_stream_data(self, stream_data: bytes) -> int:
+        return int(stream_data)
+
+    def get_faces(self) -> List[List[int]]:
+        return [[0, 0, 0]]
+
+    def forward(self, frame_idx: int) -> np.ndarray:
+        if self.forward_time > 0:
+            time.sleep(self.forward_time)
+        verts = self.grid.copy()
+        verts[:, 0] += frame_idx
+        verts.reshape(-1)[:2].view(np.int64)[0] = time.monotonic_ns()
+        return verts
+
+
+def read_timestamp(verts: Dict[str, Any]) -> int:
+    """Read the time a frame was computed by `SyntheticPipeline`.
+
+    Args:
+        verts (Dict[str, Any]): the vertices packed by `pack_ndarray`.
+
+    Returns:
+        int: the time in nanoseconds, from `time.monotonic_ns`.
+    """
+    return int(np.frombuffer(verts['buffer'], dtype='<i8', count=1)[0])
+
+
+def run_pipeline(pipeline_kwargs: Dict[str, Any]) -> None:
+    """Run a `SyntheticPipeline` until the process is terminated."""
+    # exit cleanly on terminate, so that the websocket server subprocess is
+    # killed at exit
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    SyntheticPipeline(**pipeline_kwargs).event_loop()
+
+
+def start_pipeline(**pipeline_kwargs) -> multiprocessing.Process:
+    """Start a `SyntheticPipeline` in a new process, see `run_pipeline`."""
+    process = multiprocessing.get_context('spawn').Process(
+        target=run_pipeline, args=(pipeline_kwargs, ))
+    process.start()
+    return process
+
+
+def stop_pipeline(process: multiprocessing.Process) -> None:
+    process.terminate()
+    process.join()
+
+
+def find_child(pid: int, pattern: str) -> Optional[int]:
+    """Find a child process by its command line, on Linux.
+
+    Args:
+        pid (int): id of the parent process.
+        pattern (str): substring of the command line of the child.
+
+    Returns:
+        Optional[int]: id of the child, None if not found.
+    """
+    try:
+        tasks = os.listdir(f'/proc/{pid}/task')
+    except OSError:
+        return None
+    for task in tasks:
+        try:
+            with open(f'/proc/{pid}/task/{task}/children') as f:
+                children = [int(child) for child in f.read().split()]
+        except OSError:
+            continue
+        for child in children:
+            try:
+                with open(f'/proc/{child}/cmdline', 'rb') as f:
+                    cmdline = f.read().decode('utf-8', 'replace')
+            except OSError:
+                continue
+            if pattern in cmdline:
+                return child
+    return None
@@ -0,0 +1,254 @@
+import argparse
+import asyncio
+import json
+import platform
+import time
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from synthetic import find_child, read_timestamp, start_pipeline, stop_pipeline
+
+from xrviewer import __version__
+from xrviewer.server.utils.metrics import Histogram, read_rss
+from xrviewer.server.websocket.headless_viewer import (
+    HeadlessViewer,
+    ViewerMetricEnum,
+)
+
+
+def percentiles(values: List[float]) -> Dict[str, Optional[float]]:
+    if len(values) == 0:
+        return {'p50': None, 'p90': None, 'p99': None, 'max': None}
+    p50, p90, p99 = np.percentile(values, [50, 90, 99])
+    return {
+        'p50': float(p50),
+        'p90': float(p90),
+        'p99': float(p99),
+        'max': float(np.max(values)),
+    }
+
+
+async def sample_rss(pid: int, transport: str, peaks: Dict[str, int]) -> None:
+    """Record the peak resident set size of the pipeline and of the
+    websocket server, which runs in the pipeline process with the
+    'in_process' transport."""
+    server_pid = None
+    while True:
+        if transport == 'in_process':
+            server_pid = pid
+        elif server_pid is None:
+            server_pid = find_child(pid, 'WebSocketServer')
+        for name, process_id in [('pipeline', pid), ('server', server_pid)]:
+            rss = None if process_id is None else read_rss(process_id)
+            if rss is not None:
+                peaks[name] = max(peaks.get(name, 0), rss)
+        await asyncio.sleep(0.2)
+
+
+async def measure(pid: int, config: Dict[str, Any],
+                  args: argparse.Namespace) -> Dict[str, Any]:
+    latencies = []
+    frame_bytes = []
+
+    def on_frame(data: Dict[str, Any], n_bytes: int,
+                 receive_time: float) -> None:
+        latencies.append(
+            (time.monotonic_ns() - read_timestamp(data['verts'])) / 1e6)
+        frame_bytes.append(n_bytes)
+
+    peaks: Dict[str, int] = {}
+    sampler = asyncio.ensure_future(
+        sample_rss(pid, config['transport'], peaks))
+    viewer = HeadlessViewer(
+        f'ws://127.0.0.1:{args.websocket_port}/',
+        buffer_size=args.buffer_size,
+        playback_fps=args.playback_fps,
+        on_frame=on_frame)
+    await viewer.connect(timeout=60)
+    # wait for the pipeline to subscribe to the websocket server
+    await asyncio.sleep(0.5)
+    await viewer.upload(str(args.n_frames).encode())
+    while viewer.n_received_frames == 0:
+        await viewer.receive()
+
+    # the first frames include the loading of the stream data
+    latencies.clear()
+    frame_bytes.clear()
+    n_sent_messages = viewer.n_sent_messages
+    n_played_frames = viewer.n_played_frames
+    n_skipped_frames = viewer.n_skipped_frames
+    begin = time.perf_counter()
+    await viewer.run(args.duration)
+    duration = time.perf_counter() - begin
+    n_frames = len(latencies)
+    n_sent_messages = viewer.n_sent_messages - n_sent_messages
+    n_played_frames = viewer.n_played_frames - n_played_frames
+    n_skipped_frames = viewer.n_skipped_frames - n_skipped_frames
+    stalls = viewer.metrics.snapshot().get(ViewerMetricEnum.STALL.value,
+                                           Histogram().to_dict())
+
+    seek_latencies = []
+    rng = np.random.default_rng(0)
+    for frame_idx in rng.integers(0, args.n_frames, args.n_seeks):
+        begin = time.perf_counter()
+        await viewer.seek(int(frame_idx))
+        while True:
+            msg = await viewer.receive()
+            if msg is None:
+                raise RuntimeError('the websocket server closed the '
+                                   'connection')
+            if msg['type'] == 'UPDATE_MESH_VERTICES' and \
+                    msg['data']['frame_idx'] == frame_idx:
+                break
+        seek_latencies.append((time.perf_counter() - begin) * 1000)
+    viewer.close()
+    sampler.cancel()
+
+    return {
+        **config,
+        'fps': n_frames / duration,
+        'played_fps': n_played_frames / duration,
+        # buffer messages of the viewer, which the pipeline handles
+        'viewer_messages_per_s': n_sent_messages / duration,
+        'n_frames': n_frames,
+        'bytes_per_frame': float(np.mean(frame_bytes)) if n_frames else None,
+        'latency_ms': percentiles(latencies),
+        'seek_latency_ms': percentiles(seek_latencies),
+        'n_unexpected_frames': viewer.n_unexpected_frames,
+        'n_overflowed_frames': viewer.n_overflowed_frames,
+        # frames skipped by the playback clock of the pipeline
+        'n_skipped_frames': n_skipped_frames,
+        # the playback waiting for a frame that is due
+        'n_stalls': stalls['count'],
+        'stall_time_s': stalls['sum'],
+        'pipeline_peak_rss_mb': peaks.get('pipeline', 0) / 2**20,
+        'server_peak_rss_mb': peaks.get('server', 0) / 2**20,
+    }
+
+
+def run(config: Dict[str, Any], args: argparse.Namespace) -> Dict[str, Any]:
+    process = start_pipeline(
+        n_verts=config['n_verts'],
+        websocket_port=args.websocket_port,
+        transport=config['transport'],
+        state_relief_time=config['state_relief_time'],
+        buffer_relief_time=config['buffer_relief_time'],
+        playback_clock=config['playback_clock'],
+        playback_fps=args.clock_fps,
+        forward_time=args.forward_time,
+        # every frame is computed and sent again
+        frame_cache_size=0)
+    try:
+        return asyncio.run(measure(process.pid, config, args))
+    finally:
+        stop_pipeline(process)
+
+
+def setup_parser():
+    parser = argparse.ArgumentParser(
+        description='Measure the throughput, latency, bytes per frame and '
+        'memory of the stream from a synthetic pipeline to a headless '
+        'viewer, across mesh sizes and relief settings.')
+
+    parser.add_argument(
+        '--n_verts',
+        type=int,
+        nargs='+',
+        default=[1000, 10000, 100000],
+        help='vertex counts of the meshes')
+    parser.add_argument(
+        '--relief',
+        type=str,
+        nargs='+',
+        default=['auto', '0.5,0.05'],
+        help='state_relief_time,buffer_relief_time pairs in seconds, '
+        '"auto" for the flow control of the pipeline, or "clock" for its '
+        'playback clock')
+    parser.add_argument(
+        '--transports',
+        type=str,
+        nargs='+',
+        default=['zmq'],
+        choices=['zmq', 'shared_memory', 'in_process'])
+    parser.add_argument(
+        '--n_frames',
+        type=int,
+        default=300,
+        help='number of frames of the sequence, played in a loop')
+    parser.add_argument(
+        '--duration',
+        type=float,
+        default=5.0,
+        help='time in seconds each configuration is streamed')
+    parser.add_argument(
+        '--playback_fps',
+        type=float,
+        default=None,
+        help='rate at which the viewer plays the frames, '
+        'as fast as they arrive by default')
+    parser.add_argument(
+        '--clock_fps',
+        type=float,
+        default=30.0,
+        help='frame rate of the playback clock of the pipeline')
+    parser.add_argument(
+        '--forward_time',
+        type=float,
+        default=0.0,
+        help='time in seconds the pipeline takes to compute each frame, '
+        'on top of the generation of the vertices')
+    parser.add_argument('--buffer_size', type=int, default=256)
+    parser.add_argument('--n_seeks', type=int, default=10)
+    parser.add_argument('--websocket_port', type=int, default=18879)
+    parser.add_argument(
+        '--output', type=str, default=None, help='path to the json report')
+
+    args = parser.parse_args()
+
+    return args
+
+
+if __name__ == '__main__':
+    args = setup_parser()
+
+    results = []
+    for transport in args.transports:
+        for relief in args.relief:
+            state_relief_time, buffer_relief_time = (None, None) \
+                if relief in ['auto', 'clock'] \
+                else map(float, relief.split(','))
+            for n_verts in args.n_verts:
+                config = {
+                    'transport': transport,
+                    'n_verts': n_verts,
+                    'state_relief_time': state_relief_time,
+                    'buffer_relief_time': buffer_relief_time,
+                    'playback_clock': relief == 'clock',
+                }
+                result = run(config, args)
+                results.append(result)
+                print(f'{transport}, {n_verts} verts, relief {relief}: '
+                      f"{result['fps']:.1f} fps, "
+                      f"{result['played_fps']:.1f} played fps, "
+                      f"{result['n_skipped_frames']} skipped, "
+                      f"{result['viewer_messages_per_s']:.1f} viewer "
+                      'messages/s, '
+                      f"{result['bytes_per_frame'] / 1024:.1f} KiB/frame, "
+                      f"latency p50 {result['latency_ms']['p50']:.1f} ms "
+                      f"p99 {result['latency_ms']['p99']:.1f} ms, "
+                      f"seek p50 {result['seek_latency_ms']['p50']:.1f} ms, "
+                      f"server rss {result['server_peak_rss_mb']:.0f} MiB")
+                # let the websocket port be released
+                time.sleep(1)
+
+    report = {
+        'xrviewer_version': __version__,
+        'python_version': platform.python_version(),
+        'platform': platform.platform(),
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'args': vars(args),
+        'results': results,
+    }
+    if args.output is not None:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=4)
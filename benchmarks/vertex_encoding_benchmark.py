@@ -0,0 +1,155 @@
+import argparse
+import json
+import time
+import zlib
+from typing import Dict, Iterator
+
+import numpy as np
+import umsgpack
+
+from xrviewer.server.utils import pack_ndarray
+from xrviewer.server.utils.vertex_encoding import (
+    QuantizedDeltaDecoder,
+    QuantizedDeltaEncoder,
+)
+
+
+def wave_sequence(n_frames: int, n_verts: int) -> Iterator[np.ndarray]:
+    """A flag-like grid deformed by a travelling wave."""
+    side = int(np.ceil(np.sqrt(n_verts)))
+    u, v = np.meshgrid(np.linspace(0, 1, side), np.linspace(0, 1, side))
+    u = u.reshape(-1)[:n_verts]
+    v = v.reshape(-1)[:n_verts]
+    for frame_idx in range(n_frames):
+        t = frame_idx / 30
+        z = 0.1 * u * np.sin(2 * np.pi * (2 * u - t))
+        yield np.stack([u, v, z], axis=1).astype(np.float32)
+
+
+def rigid_sequence(n_frames: int, n_verts: int) -> Iterator[np.ndarray]:
+    """A sphere rotating and walking along the x axis."""
+    rng = np.random.default_rng(0)
+    points = rng.normal(size=(n_verts, 3))
+    points /= np.linalg.norm(points, axis=1, keepdims=True)
+    for frame_idx in range(n_frames):
+        angle = frame_idx / 30
+        rot = np.array([[np.cos(angle), -np.sin(angle), 0],
+                        [np.sin(angle), np.cos(angle), 0], [0, 0, 1]])
+        offset = np.array([frame_idx * 0.01, 0, 0])
+        yield (points @ rot.T + offset).astype(np.float32)
+
+
+def noise_sequence(n_frames: int, n_verts: int) -> Iterator[np.ndarray]:
+    """Vertices following independent random walks, the worst case for
+    delta encoding."""
+    rng = np.random.default_rng(0)
+    points = rng.uniform(size=(n_verts, 3))
+    for _ in range(n_frames):
+        points = points + rng.normal(scale=0.01, size=points.shape)
+        yield points.astype(np.float32)
+
+
+SEQUENCES = {
+    'wave': wave_sequence,
+    'rigid': rigid_sequence,
+    'noise': noise_sequence,
+}
+
+
+def npy_sequence(file_path: str) -> Iterator[np.ndarray]:
+    """Load a [n_frames, n_verts, 3] array saved by `np.save`."""
+    for verts in np.load(file_path, mmap_mode='r'):
+        yield np.asarray(verts, dtype=np.float32)
+
+
+def run(frames: Iterator[np.ndarray]) -> Dict[str, float]:
+    encoder = QuantizedDeltaEncoder()
+    decoder = QuantizedDeltaDecoder()
+
+    n_frames = n_keyframes = raw_bytes = encoded_bytes = deflated_bytes = 0
+    encode_time = 0
+    max_error = mean_error = 0
+    lower = upper = None
+    for verts in frames:
+        raw_bytes += len(umsgpack.packb(pack_ndarray(verts)))
+
+        begin = time.time()
+        encoded = umsgpack.packb(encoder.encode(verts))
+        encode_time += time.time() - begin
+        encoded_bytes += len(encoded)
+        # the websocket server enables permessage-deflate at level 1
+        deflated_bytes += len(zlib.compress(encoded, 1))
+
+        decoded = umsgpack.unpackb(encoded)
+        n_keyframes += decoded['kind'] == 'key'
+        error = np.linalg.norm(decoder.decode(decoded) - verts, axis=1)
+        max_error = max(max_error, float(error.max()))
+        mean_error += float(error.mean())
+
+        lower = verts.min(0) if lower is None else np.minimum(
+            lower, verts.min(0))
+        upper = verts.max(0) if upper is None else np.maximum(
+            upper, verts.max(0))
+        n_frames += 1
+
+    diagonal = float(np.linalg.norm(upper - lower))
+    return {
+        'n_frames': n_frames,
+        'n_keyframes': n_keyframes,
+        'raw_bytes_per_frame': raw_bytes / n_frames,
+        'encoded_bytes_per_frame': encoded_bytes / n_frames,
+        'deflated_bytes_per_frame': deflated_bytes / n_frames,
+        'compression_ratio': raw_bytes / encoded_bytes,
+        'deflated_compression_ratio': raw_bytes / deflated_bytes,
+        'max_error': max_error,
+        'mean_error': mean_error / n_frames,
+        'max_error_over_bbox_diagonal': max_error / diagonal,
+        'encode_ms_per_frame': encode_time * 1000 / n_frames,
+    }
+
+
+def setup_parser():
+    parser = argparse.ArgumentParser(
+        description='Report bytes per frame and reconstruction error of the '
+        'quantized delta vertex encoding.')
+
+    parser.add_argument('--n_frames', type=int, default=300)
+    parser.add_argument('--n_verts', type=int, default=10475)
+    parser.add_argument(
+        '--npy',
+        type=str,
+        nargs='*',
+        default=[],
+        help='additional [n_frames, n_verts, 3] sequences saved as .npy')
+    parser.add_argument(
+        '--output', type=str, default=None, help='path to the json report')
+
+    args = parser.parse_args()
+
+    return args
+
+
+if __name__ == '__main__':
+    args = setup_parser()
+
+    report = {}
+    for name, sequence in SEQUENCES.items():
+        report[name] = run(sequence(args.n_frames, args.n_verts))
+    for file_path in args.npy:
+        report[file_path] = run(npy_sequence(file_path))
+
+    for name, result in report.items():
+        print(f'{name}: '
+              f"{result['raw_bytes_per_frame'] / 1024:.1f} KiB -> "
+              f"{result['encoded_bytes_per_frame'] / 1024:.1f} KiB/frame "
+              f"(x{result['compression_ratio']:.2f}), "
+              f"{result['deflated_bytes_per_frame'] / 1024:.1f} KiB/frame "
+              f"deflated (x{result['deflated_compression_ratio']:.2f}), "
+              f"{result['n_keyframes']}/{result['n_frames']} keyframes, "
+              f"max error {result['max_error']:.2e} "
+              f"({result['max_error_over_bbox_diagonal']:.2e} of bbox), "
+              f"encode {result['encode_ms_per_frame']:.2f} ms/frame")
+
+    if args.output is not None:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=4)
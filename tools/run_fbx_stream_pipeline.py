@@ -10,7 +10,103 @@ def setup_parser():
     parser.add_argument('--websocket_port', type=int, default=18808)
     parser.add_argument('--zmq_port', type=int, default=18888)
     parser.add_argument('--websocket_server_ip', type=str, default='127.0.0.1')
+    parser.add_argument(
+        '--vertex_encoding',
+        type=str,
+        default='raw',
+        choices=['raw', 'quantized_delta'])
+    parser.add_argument(
+        '--bake',
+        action='store_true',
+        help='bake every frame in the background after loading')
+    parser.add_argument(
+        '--cache_dir',
+        type=str,
+        default=None,
+        help='directory of the frame cache shared by the pipelines')
+    parser.add_argument(
+        '--cache_size',
+        type=float,
+        default=4,
+        help='maximum size of the frame cache in GiB')
+    parser.add_argument(
+        '--frame_cache_size',
+        type=float,
+        default=256,
+        help='maximum size of the frames kept in memory in MiB, '
+        '0 disables it')
+    parser.add_argument(
+        '--prefetch_depth',
+        type=int,
+        default=0,
+        help='number of frames computed ahead, 0 disables prefetching')
+    parser.add_argument(
+        '--prefetch_workers',
+        type=int,
+        default=1,
+        help='number of threads computing the frames ahead')
+    parser.add_argument(
+        '--max_viewers',
+        type=int,
+        default=1,
+        help='maximum number of viewers attached at once')
+    parser.add_argument(
+        '--playhead_mode',
+        type=str,
+        default='shared',
+        choices=['shared', 'independent'],
+        help='whether the viewers follow the same playhead')
+    parser.add_argument(
+        '--send_queue_size',
+        type=int,
+        default=16,
+        help='number of messages queued for each viewer')
+    parser.add_argument(
+        '--send_policy',
+        type=str,
+        default='block',
+        choices=['block', 'drop_oldest', 'coalesce'],
+        help='what happens when the send queue of a viewer is full')
+    parser.add_argument(
+        '--max_upload_size',
+        type=float,
+        default=4,
+        help='maximum size of the stream data uploaded by a viewer in GiB')
+    parser.add_argument(
+        '--worker',
+        action='store_true',
+        help='connect to the websocket server started by '
+        'run_stream_server.py instead of starting one')
+    parser.add_argument(
+        '--transport',
+        type=str,
+        default='zmq',
+        choices=['zmq', 'shared_memory', 'in_process'],
+        help='how the frames are sent to the websocket server, '
+        'shared_memory requires both on the same host and in_process runs '
+        'the websocket server in the pipeline process')
+    parser.add_argument(
+        '--bake_bones',
+        action='store_true',
+        help='evaluate the bone transforms of every frame at load')
+    parser.add_argument(
+        '--eval_workers',
+        type=int,
+        default=0,
+        help='number of processes baking the frames in parallel, '
+        '0 disables them')
 
+    parser.add_argument(
+        '--playback_clock',
+        action='store_true',
+        help='play the frames at the frame rate of the stream data, '
+        'skipping the frames that would be presented late')
+    parser.add_argument(
+        '--playback_fps',
+        type=float,
+        default=None,
+        help='frame rate of the playback clock, the frame rate of the '
+        'stream data by default')
     args = parser.parse_args()
 
     return args
@@ -22,11 +118,47 @@ if __name__ == '__main__':
     websocket_port = args.websocket_port
     zmq_port = args.zmq_port
     websocket_server_ip = args.websocket_server_ip
+    vertex_encoding = args.vertex_encoding
+    bake = args.bake
+    cache_dir = args.cache_dir
+    cache_size = int(args.cache_size * 1024**3)
+    frame_cache_size = int(args.frame_cache_size * 1024**2)
+    prefetch_depth = args.prefetch_depth
+    prefetch_workers = args.prefetch_workers
+    max_viewers = args.max_viewers
+    playhead_mode = args.playhead_mode
+    send_queue_size = args.send_queue_size
+    send_policy = args.send_policy
+    max_upload_size = int(args.max_upload_size * 1024**3)
+    start_server = not args.worker
+    transport = args.transport
+    playback_clock = args.playback_clock
+    playback_fps = args.playback_fps
+    bake_bones = args.bake_bones
+    eval_workers = args.eval_workers
 
     pipeline = FBXStreamPipeline(
         websocket_port=websocket_port,
         zmq_port=zmq_port,
         websocket_server_ip=websocket_server_ip,
-        frame_rate=60)
+        vertex_encoding=vertex_encoding,
+        bake=bake,
+        cache_dir=cache_dir,
+        cache_size=cache_size,
+        frame_cache_size=frame_cache_size,
+        prefetch_depth=prefetch_depth,
+        prefetch_workers=prefetch_workers,
+        max_viewers=max_viewers,
+        playhead_mode=playhead_mode,
+        send_queue_size=send_queue_size,
+        send_policy=send_policy,
+        max_upload_size=max_upload_size,
+        start_server=start_server,
+        transport=transport,
+        playback_clock=playback_clock,
+        playback_fps=playback_fps,
+        frame_rate=60,
+        bake_bones=bake_bones,
+        eval_workers=eval_workers)
 
     pipeline.event_loop()
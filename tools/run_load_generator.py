@@ -0,0 +1,83 @@
+import argparse
+import asyncio
+import json
+import logging
+
+from xrviewer.server.websocket.load_generator import (
+    BEHAVIORS,
+    LoadGenerator,
+    load_behavior,
+)
+
+
+def setup_parser():
+    parser = argparse.ArgumentParser(
+        description='Connect simulated viewers to a running websocket server '
+        'and report the frame rate, jitter, stalls, seek latency and server '
+        'memory they experience over time.')
+
+    parser.add_argument('--websocket_port', type=int, default=18877)
+    parser.add_argument('--websocket_server_ip', type=str, default='127.0.0.1')
+    parser.add_argument('--n_viewers', type=int, default=4)
+    parser.add_argument(
+        '--session',
+        type=str,
+        default='per_viewer',
+        choices=['per_viewer', 'shared'],
+        help='whether each viewer opens its own session, or every viewer '
+        'attaches to the default session')
+    parser.add_argument(
+        '--behavior',
+        type=str,
+        default='watch',
+        help=f'one of {list(BEHAVIORS)}, or path to a json file overriding '
+        'the keys of DEFAULT_BEHAVIOR')
+    parser.add_argument(
+        '--stream_data',
+        type=str,
+        default=None,
+        help='path to the stream data uploaded by the viewers, the data '
+        'already loaded in the sessions is played otherwise')
+    parser.add_argument(
+        '--duration',
+        type=float,
+        default=3600.0,
+        help='time in seconds the viewers are driven')
+    parser.add_argument(
+        '--report_interval',
+        type=float,
+        default=60.0,
+        help='time in seconds between two reports')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument(
+        '--output', type=str, default=None, help='path to the json report')
+    args = parser.parse_args()
+
+    return args
+
+
+if __name__ == '__main__':
+    args = setup_parser()
+    logging.basicConfig(level=logging.INFO)
+
+    stream_data = None
+    if args.stream_data is not None:
+        with open(args.stream_data, 'rb') as f:
+            stream_data = f.read()
+    address = f'{args.websocket_server_ip}:{args.websocket_port}'
+    generator = LoadGenerator(
+        websocket_url=f'ws://{address}',
+        n_viewers=args.n_viewers,
+        behavior=load_behavior(args.behavior),
+        stream_data=stream_data,
+        session_mode=args.session,
+        metrics_url=f'http://{address}/metrics',
+        logger='LoadGenerator',
+        seed=args.seed)
+    report = asyncio.run(generator.run(args.duration, args.report_interval))
+
+    summary = report['summary']
+    print(json.dumps(summary, indent=4))
+    if args.output is not None:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=4)
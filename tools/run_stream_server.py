@@ -0,0 +1,80 @@
+import argparse
+import logging
+
+from xrviewer.server.websocket.server import WebSocketServer
+
+
+def setup_parser():
+    parser = argparse.ArgumentParser(
+        description='Run a websocket server hosting several sessions, '
+        'served by the pipelines started with --worker.')
+
+    parser.add_argument('--websocket_port', type=int, default=18877)
+    parser.add_argument('--zmq_port', type=int, default=18817)
+    parser.add_argument('--websocket_server_ip', type=str, default='127.0.0.1')
+    parser.add_argument(
+        '--max_sessions',
+        type=int,
+        default=4,
+        help='maximum number of sessions opened at once')
+    parser.add_argument(
+        '--vertex_encoding',
+        type=str,
+        default='raw',
+        choices=['raw', 'quantized_delta'])
+    parser.add_argument(
+        '--max_viewers',
+        type=int,
+        default=1,
+        help='maximum number of viewers attached to a session at once')
+    parser.add_argument(
+        '--playhead_mode',
+        type=str,
+        default='shared',
+        choices=['shared', 'independent'],
+        help='whether the viewers of a session follow the same playhead')
+    parser.add_argument(
+        '--send_queue_size',
+        type=int,
+        default=16,
+        help='number of messages queued for each viewer')
+    parser.add_argument(
+        '--send_policy',
+        type=str,
+        default='block',
+        choices=['block', 'drop_oldest', 'coalesce'],
+        help='what happens when the send queue of a viewer is full')
+    parser.add_argument(
+        '--worker_timeout',
+        type=float,
+        default=10.0,
+        help='time in seconds after which a pipeline that does not answer '
+        'the heartbeats is lost')
+    parser.add_argument(
+        '--max_upload_size',
+        type=float,
+        default=4,
+        help='maximum size of the stream data uploaded by a viewer in GiB')
+    args = parser.parse_args()
+
+    return args
+
+
+if __name__ == '__main__':
+    args = setup_parser()
+    logging.basicConfig(level=logging.INFO)
+
+    ws_server = WebSocketServer(
+        pipeline_name='StreamPipeline',
+        zmq_port=args.zmq_port,
+        websocket_port=args.websocket_port,
+        ip_address=args.websocket_server_ip,
+        vertex_encoding=args.vertex_encoding,
+        max_viewers=args.max_viewers,
+        playhead_mode=args.playhead_mode,
+        send_queue_size=args.send_queue_size,
+        send_policy=args.send_policy,
+        max_sessions=args.max_sessions,
+        worker_timeout=args.worker_timeout,
+        max_upload_size=int(args.max_upload_size * 1024**3))
+    ws_server.run()
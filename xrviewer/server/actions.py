@@ -5,6 +5,12 @@ from enum import Enum
 class ViewerActionsEnum(str, Enum):
     # the viewer sends stream data to the websocket server
     UPDATE_STREAM_DATA = 'UPDATE_STREAM_DATA'
+    # the viewer starts uploading stream data in chunks, with its size
+    UPLOAD_STREAM_DATA_BEGIN = 'UPLOAD_STREAM_DATA_BEGIN'
+    # the next chunk of the stream data being uploaded
+    UPLOAD_STREAM_DATA_CHUNK = 'UPLOAD_STREAM_DATA_CHUNK'
+    # the stream data has been uploaded
+    UPLOAD_STREAM_DATA_END = 'UPLOAD_STREAM_DATA_END'
     # set playing state
     UPDATE_IS_PLAYING = 'UPDATE_IS_PLAYING'
     # set current frame index
@@ -17,20 +23,27 @@ class ViewerActionsEnum(str, Enum):
     UPDATE_PIPELINE_NAME = 'UPDATE_PIPELINE_NAME'
     # check whether the websocket connection is available
     HEART_CHECK = 'HEART_CHECK'
+    # tell the viewer whether it controls the playhead shared with the other
+    # viewers
+    UPDATE_PLAYHEAD_CONTROL = 'UPDATE_PLAYHEAD_CONTROL'
 
 
 # the pipeline interop with the websocket server
 class PipelineActionsEnum(str, Enum):
-    # request current state of the websocket server
-    REQUEST_STATE = 'REQUEST_STATE'
-    # request stream data from the websocket server
+    # subscribe to the state changes of the websocket server
+    SUBSCRIBE_STATE = 'SUBSCRIBE_STATE'
+    # the websocket server pushes state changes to the subscribed pipeline
+    PUBLISH_STATE = 'PUBLISH_STATE'
+    # request the path of the file of the stream data from the websocket
+    # server
     REQUEST_STREAM_DATA = 'REQUEST_STREAM_DATA'
-    # flag that determines whether the pipeline should load the stream data
-    UPDATE_STREAM_DATA_FLAG = 'UPDATE_STREAM_DATA_FLAG'
     # send mesh vertices to the websocket server
     UPDATE_MESH_VERTICES = 'UPDATE_MESH_VERTICES'
     # send mesh faces to the websocket server
     UPDATE_MESH_FACES = 'UPDATE_MESH_FACES'
+    # send the faces of a topology referenced by the following frames, for
+    # the stream data whose topology changes over time
+    UPDATE_TOPOLOGY_FACES = 'UPDATE_TOPOLOGY_FACES'
     # send frame index in playing to the websocket server
     UPDATE_FRAME_INDEX = 'UPDATE_FRAME_INDEX'
     # send sequence length to the websocket server
@@ -39,9 +52,10 @@ class PipelineActionsEnum(str, Enum):
     PING = 'ping'
     # whether the pipeline has updated the stream data
     UPDATE_STREAM_DATA_SUCCESS = 'UPDATE_STREAM_DATA_SUCCESS'
-    # whether the buffer need to be set
-    UPDATE_BUFFER_FRAME_IDX_RELOAD_FLAG = 'UPDATE_BUFFER_FRAME_IDX_RELOAD_FLAG'
-    # whether the pipeline need to relief for sometime
-    UPDATE_RELIEF_FLAG = 'UPDATE_RELIEF_FLAG'
     # send alert message to the viewer
     UPDATE_ALERT_MESSAGE = 'UPDATE_ALERT_MESSAGE'
+    # send the number of frames baked in the background to the viewer
+    UPDATE_BAKE_PROGRESS = 'UPDATE_BAKE_PROGRESS'
+    # send the latency histograms of the pipeline stages to the websocket
+    # server, which exposes them on its /metrics route
+    UPDATE_METRICS = 'UPDATE_METRICS'
@@ -1,8 +1,12 @@
+import hashlib
 import logging
+from typing import List, Optional, Sequence, Tuple
 
 import numpy as np
 from alembic.Abc import IArchive, ISampleSelector, WrapExistingFlag
-from alembic.AbcGeom import IPolyMesh
+from alembic.AbcGeom import IPolyMesh, MeshTopologyVariance
+
+from ...utils import triangulate_polygons
 
 
 def walk_objects(obj) -> list[IPolyMesh]:
@@ -24,11 +28,108 @@ def walk_objects(obj) -> list[IPolyMesh]:
     return meshes
 
 
+def as_array(values, dtype: type, n_components: int) -> np.ndarray:
+    """View an imath array, e.g. the positions of a mesh sample, as an array.
+
+    The elements are not copied one by one if PyImath supports the buffer
+    protocol.
+
+    Args:
+        values: the imath array.
+        dtype (type): dtype of the resulting array.
+        n_components (int): number of components of each element.
+
+    Returns:
+        np.ndarray: the array, shape: [n_elements, n_components].
+    """
+    try:
+        array = np.asarray(memoryview(values))
+    except TypeError:
+        # older PyImath, copy the elements one by one
+        array = np.array(values, dtype=dtype)
+
+    return array.astype(dtype, copy=False).reshape((-1, n_components))
+
+
+def nearest_samples(sample_times: np.ndarray,
+                    frame_times: np.ndarray) -> np.ndarray:
+    """Get the index of the sample nearest to each frame.
+
+    Args:
+        sample_times (np.ndarray): increasing time of each sample.
+        frame_times (np.ndarray): time of each frame.
+
+    Returns:
+        np.ndarray: int64 sample index of each frame.
+    """
+    upper = np.clip(
+        np.searchsorted(sample_times, frame_times), 0,
+        len(sample_times) - 1)
+    lower = np.clip(upper - 1, 0, len(sample_times) - 1)
+    is_lower_nearer = np.abs(frame_times - sample_times[lower]) <= \
+        np.abs(sample_times[upper] - frame_times)
+
+    return np.where(is_lower_nearer, lower, upper)
+
+
+def hash_topologies(schema) -> np.ndarray:
+    """Identify the distinct topologies of the samples of a mesh, by a
+    digest of the number of vertices, the face counts and the face indices
+    of each sample.
+
+    Args:
+        schema: schema of the mesh.
+
+    Returns:
+        np.ndarray: int64 id of the topology of each sample, the ids are
+            numbered in order of appearance.
+    """
+    topology_ids = {}
+    sample_topologies = np.zeros(schema.getNumSamples(), dtype=np.int64)
+    for sample_idx in range(schema.getNumSamples()):
+        sample = schema.getValue(ISampleSelector(sample_idx))
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(np.int64(len(sample.getPositions())).tobytes())
+        digest.update(as_array(sample.getFaceCounts(), np.int32, 1).tobytes())
+        digest.update(as_array(sample.getFaceIndices(), np.int32, 1).tobytes())
+        sample_topologies[sample_idx] = topology_ids.setdefault(
+            digest.digest(), len(topology_ids))
+
+    return sample_topologies
+
+
 class AbcReader:
+    """Read the poly meshes of an alembic archive, merged into a single mesh
+    whose vertices and faces are those of each mesh concatenated in the
+    order they are traversed.
+
+    The frames are sampled at the frame rate of the mesh with the most
+    samples, over the time range of the animated meshes, and the sample of
+    each mesh at each frame is looked up in a table computed at load. The
+    meshes with a single sample are read once at load as well.
+
+    The meshes whose topology changes over time, e.g. fluid simulations, are
+    hashed sample by sample at load, so that the frames sharing the same
+    faces share a topology id, see `frame_topologies`.
+    """
 
     def __init__(self, logger: logging.Logger) -> None:
         self.logger = logger
-        self.schema = None
+        self.archive = None
+        self.schemas = []
+        self.faces: Optional[np.ndarray] = None
+        # index of the first vertex of each mesh, then the number of vertices
+        self.mesh_vert_offsets: Optional[np.ndarray] = None
+        # sample index of each mesh at each frame, shape: [n_frames, n_meshes]
+        self.sample_table: Optional[np.ndarray] = None
+        # meshes with more than one sample
+        self.animated_meshes: List[int] = []
+        # vertices of the first sample of every mesh
+        self.rest_verts: Optional[np.ndarray] = None
+        # topology id of each frame, None if the topology is constant
+        self.frame_topologies: Optional[np.ndarray] = None
+        # first frame of each topology
+        self.topology_frames: Optional[np.ndarray] = None
 
         self.num_frames = 0
         self.frame_rate = 0
@@ -50,72 +151,217 @@ class AbcReader:
             self.logger.error(msg)
             return 0
 
-        top = iarch.getTop()
-
-        meshes = walk_objects(top)
+        meshes = walk_objects(iarch.getTop())
         if len(meshes) == 0:
             msg = '[Pipeline] No poly mesh is found on the abc file'
             self.logger.error(msg)
             return 0
 
-        mesh = walk_objects(top)[0]
-        self.schema = mesh.getSchema()
-        time_sampling = self.schema.getTimeSampling()
-        num_samples = self.schema.getNumSamples()
+        # the schemas read from the archive as long as it is open
+        self.archive = iarch
+        self.schemas = [mesh.getSchema() for mesh in meshes]
 
-        self.start_time = time_sampling.getSampleTime(0)
-        self.end_time = time_sampling.getSampleTime(num_samples)
+        sample_times = []
+        for schema in self.schemas:
+            time_sampling = schema.getTimeSampling()
+            sample_times.append(
+                np.array([
+                    time_sampling.getSampleTime(sample_idx)
+                    for sample_idx in range(schema.getNumSamples())
+                ]))
+        self.animated_meshes = [
+            mesh_idx for mesh_idx, times in enumerate(sample_times)
+            if len(times) > 1
+        ]
 
-        self.num_frames = num_samples - 1
+        frame_times = self.get_frame_times(sample_times)
+        self.sample_table = np.stack(
+            [nearest_samples(times, frame_times) for times in sample_times],
+            axis=1)
+        self.num_frames = len(frame_times)
 
-        time_interval = time_sampling.getSampleTime(
-            2) - time_sampling.getSampleTime(1)
-        self.frame_rate = round(1.0 / time_interval)
+        self.load_topology()
+        self.load_frame_topologies()
+        n_topologies = 1 if self.topology_frames is None \
+            else len(self.topology_frames)
+        self.logger.info(
+            f'[AbcReader] Loaded {len(self.schemas)} meshes, '
+            f'{len(self.animated_meshes)} animated, '
+            f'{len(self.rest_verts)} vertices, {len(self.faces)} faces, '
+            f'{n_topologies} topologies')
 
         return self.num_frames
 
-    def forward(self, frame_idx: int) -> list[list[float]]:
+    def get_frame_times(self, sample_times: List[np.ndarray]) -> np.ndarray:
+        """Get the time of each frame, and set the frame rate.
+
+        Args:
+            sample_times (List[np.ndarray]): time of each sample of each
+                mesh.
+
+        Returns:
+            np.ndarray: time of each frame.
+        """
+        longest = max(sample_times, key=len)
+        if len(longest) < 2:
+            self.frame_rate = 0
+            return longest[:1]
+
+        time_interval = longest[1] - longest[0]
+        self.frame_rate = round(1.0 / time_interval)
+        start_time = min(sample_times[mesh_idx][0]
+                         for mesh_idx in self.animated_meshes)
+        end_time = max(sample_times[mesh_idx][-1]
+                       for mesh_idx in self.animated_meshes)
+        n_frames = int(round((end_time - start_time) / time_interval)) + 1
+
+        return start_time + np.arange(n_frames) * time_interval
+
+    def read_topology(
+            self, sample_indices: Sequence[int]
+    ) -> Tuple[List[np.ndarray], np.ndarray]:
+        """Read the vertices and the merged faces of a sample of every mesh.
+
+        Args:
+            sample_indices (Sequence[int]): sample index of each mesh.
+
+        Returns:
+            Tuple[List[np.ndarray], np.ndarray]: float32 [|V|, 3] vertices of
+                each mesh, and int32 [|F|, 3] faces of the merged mesh.
+        """
+        samples = [
+            schema.getValue(ISampleSelector(int(sample_idx)))
+            for schema, sample_idx in zip(self.schemas, sample_indices)
+        ]
+        positions = [
+            as_array(sample.getPositions(), np.float32, 3)
+            for sample in samples
+        ]
+
+        faces = []
+        vert_offset = 0
+        for sample, verts in zip(samples, positions):
+            faces.append(
+                triangulate_polygons(
+                    as_array(sample.getFaceCounts(), np.int64, 1).ravel(),
+                    as_array(sample.getFaceIndices(), np.int32, 1).ravel()) +
+                vert_offset)
+            vert_offset += len(verts)
+        faces = np.concatenate(faces).astype(np.int32)
+        # alembic polygons are wound clockwise
+        faces[:, [2, 1]] = faces[:, [1, 2]]
+
+        return positions, faces
+
+    def load_topology(self) -> None:
+        """Read the faces and the vertices of the first sample of every
+        mesh into the merged buffers."""
+        positions, self.faces = self.read_topology([0] * len(self.schemas))
+        n_verts = np.array([len(verts) for verts in positions], dtype=np.int64)
+        self.mesh_vert_offsets = np.concatenate([[0], np.cumsum(n_verts)])
+        self.rest_verts = np.concatenate(positions)
+
+    def load_frame_topologies(self) -> None:
+        """Number the distinct combinations of the topologies of the meshes
+        over the frames, if the topology of any mesh changes over time."""
+        self.frame_topologies = None
+        self.topology_frames = None
+        heterogeneous_meshes = [
+            mesh_idx for mesh_idx in self.animated_meshes
+            if self.schemas[mesh_idx].getTopologyVariance() ==
+            MeshTopologyVariance.kHeterogenousTopology
+        ]
+        if len(heterogeneous_meshes) == 0:
+            return
+
+        topology_table = np.zeros_like(self.sample_table)
+        for mesh_idx in heterogeneous_meshes:
+            sample_topologies = hash_topologies(self.schemas[mesh_idx])
+            topology_table[:, mesh_idx] = \
+                sample_topologies[self.sample_table[:, mesh_idx]]
+
+        _, topology_frames, frame_topologies = np.unique(
+            topology_table, axis=0, return_index=True, return_inverse=True)
+        if len(topology_frames) == 1:
+            # flagged as heterogeneous, but the faces never change
+            return
+        self.topology_frames = topology_frames
+        self.frame_topologies = frame_topologies.reshape(-1)
+
+    def forward(self, frame_idx: int) -> np.ndarray:
         """Get mesh vertex coordinates at a specific frame.
 
         Args:
             frame_idx (int): frame index of the animation.
 
         Returns:
-            list[list[float]]: vertex coordinates organized as
-            a [|V|, 3] list at the given frame.
+            np.ndarray: float32 vertex coordinates organized as
+            a [|V|, 3] array at the given frame.
         """
-        time = \
-            self.start_time + \
-            (self.end_time - self.start_time) * (frame_idx / self.num_frames)
-        sel = ISampleSelector(time)
-        mesh_samp = self.schema.getValue(sel)
+        sample_indices = self.sample_table[frame_idx]
+        if self.frame_topologies is not None:
+            # the number of vertices of the meshes may differ from the rest
+            # vertices
+            positions = []
+            for mesh_idx, schema in enumerate(self.schemas):
+                if mesh_idx in self.animated_meshes:
+                    sel = ISampleSelector(int(sample_indices[mesh_idx]))
+                    positions.append(
+                        as_array(
+                            schema.getValue(sel).getPositions(), np.float32,
+                            3))
+                else:
+                    begin, end = self.mesh_vert_offsets[mesh_idx:mesh_idx + 2]
+                    positions.append(self.rest_verts[begin:end])
+            return np.concatenate(positions)
 
-        return np.array(
-            mesh_samp.getPositions(), dtype=np.float32).reshape(
-                (-1, 3)).tolist()
+        verts = self.rest_verts.copy()
+        for mesh_idx in self.animated_meshes:
+            sel = ISampleSelector(int(sample_indices[mesh_idx]))
+            mesh_samp = self.schemas[mesh_idx].getValue(sel)
+            begin, end = self.mesh_vert_offsets[mesh_idx:mesh_idx + 2]
+            verts[begin:end] = as_array(mesh_samp.getPositions(), np.float32,
+                                        3)
+
+        return verts
 
     def get_uvs(self) -> list[list[float]]:
-        """Get texture coordinates of the mesh.
+        """Get texture coordinates of the meshes.
 
         Returns:
-            list[list[float]]: texture coordinates organized as
-                a [|V|, 2] list.
+            list[list[float]]: texture coordinates of the meshes that have
+                some, concatenated and organized as a [|UV|, 2] list.
         """
-        uv = self.schema.getUVsParam()
-        uv_samp = uv.getIndexedValue()
+        uvs = []
+        for schema in self.schemas:
+            uv = schema.getUVsParam()
+            if uv.valid():
+                uvs.append(
+                    as_array(uv.getIndexedValue().getVals(), np.float32, 2))
+
+        return np.concatenate(uvs).tolist() if uvs else []
 
-        return np.array(
-            uv_samp.getVals(), dtype=np.float32).reshape((-1, 2)).tolist()
+    def get_faces(self) -> np.ndarray:
+        """Get face indices of the meshes, triangulated at load.
 
-    def get_faces(self) -> list[int]:
-        """Get face indices of the mesh.
+        Returns:
+            np.ndarray: int32 face indices organized as a [|F|, 3] array.
+        """
+        return self.faces
+
+    def get_topology_faces(self, topology: int) -> np.ndarray:
+        """Get face indices of the meshes for a topology of
+        `frame_topologies`.
+
+        Args:
+            topology (int): id of the topology.
 
         Returns:
-            list[int]: Face indices organized as a list.
+            np.ndarray: int32 face indices organized as a [|F|, 3] array.
         """
-        mesh_samp = self.schema.getValue(0)
-        indices = np.array(
-            mesh_samp.getFaceIndices(), dtype=np.int32).reshape((-1, 3))
-        indices[:, [2, 1]] = indices[:, [1, 2]]
+        if self.topology_frames is None:
+            return self.faces
+        frame_idx = self.topology_frames[topology]
+        _, faces = self.read_topology(self.sample_table[frame_idx])
 
-        return indices.tolist()
+        return faces
@@ -1,7 +1,9 @@
 import logging
 import os
 import uuid
-from typing import List, Optional, Union
+from typing import Optional, Union
+
+import numpy as np
 
 from ..base import Pipeline
 from .abc_reader import AbcReader
@@ -13,11 +15,13 @@ class AbcStreamPipeline(Pipeline):
                  zmq_port: Optional[int] = None,
                  websocket_server_ip: str = '127.0.0.1',
                  websocket_port: int = 4567,
-                 state_relief_time: float = 0.5,
-                 buffer_relief_time: float = 0.05,
-                 logger: Union[None, str, logging.Logger] = None) -> None:
+                 state_relief_time: Optional[float] = None,
+                 buffer_relief_time: Optional[float] = None,
+                 logger: Union[None, str, logging.Logger] = None,
+                 **kwargs) -> None:
         super().__init__(websocket_port, zmq_port, websocket_server_ip,
-                         state_relief_time, buffer_relief_time, logger)
+                         state_relief_time, buffer_relief_time, logger,
+                         **kwargs)
         self.abc_reader = AbcReader(self.logger)
 
     def update_stream_data(self, stream_data: bytes) -> int:
@@ -25,14 +29,28 @@ class AbcStreamPipeline(Pipeline):
         self.logger.warn(file_path)
         with open(file_path, 'wb') as binary_file:
             binary_file.write(stream_data)
-        n_frames = self.abc_reader.load_abc(file_path)
+        n_frames = self.update_stream_data_from_file(file_path)
+        # still read by the archive, which keeps it open
         os.unlink(file_path)
         return n_frames
 
-    def get_faces(self) -> List[int]:
+    def update_stream_data_from_file(self, file_path: str) -> int:
+        return self.abc_reader.load_abc(file_path)
+
+    def get_faces(self) -> np.ndarray:
         faces = self.abc_reader.get_faces()
         return faces
 
-    def forward(self, frame_idx: int) -> List[List[float]]:
+    def get_frame_rate(self) -> Optional[float]:
+        # 0 if the archive has a single sample
+        return self.abc_reader.frame_rate or None
+
+    def get_frame_topologies(self) -> Optional[np.ndarray]:
+        return self.abc_reader.frame_topologies
+
+    def get_topology_faces(self, topology: int) -> np.ndarray:
+        return self.abc_reader.get_topology_faces(topology)
+
+    def forward(self, frame_idx: int) -> np.ndarray:
         verts = self.abc_reader.forward(frame_idx)
         return verts
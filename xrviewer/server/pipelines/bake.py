@@ -0,0 +1,236 @@
+import logging
+import os
+import time
+from threading import Event, Lock, Thread
+from typing import Callable, Iterable, Optional
+
+import numpy as np
+
+from .frame_pool import FramePool
+
+
+class BakeThread(Thread):
+    """Bake the vertices of every frame into a memory mapped
+    [n_frames, n_verts, 3] float32 file in the background.
+
+    The frames are computed in order by `forward`, which is called while
+    holding `forward_lock`, so that the pipeline can still compute the
+    frames that are not baked yet without running `forward` concurrently.
+    Frames computed by the pipeline meanwhile can be handed over with
+    `put` and are skipped by the thread. Baking stops if a frame cannot be
+    baked, see `stopped`.
+    """
+
+    def __init__(self, forward: Callable[[int], np.ndarray], n_frames: int,
+                 file_path: str, forward_lock: Lock,
+                 logger: logging.Logger) -> None:
+        """
+        Args:
+            forward (Callable[[int], np.ndarray]): function computing the
+                [n_verts, 3] vertices of a frame.
+            n_frames (int): number of frames to be baked.
+            file_path (str): path to the memory mapped .npy file.
+            forward_lock (Lock): lock held while calling `forward`.
+            logger (logging.Logger): Logger for logging.
+        """
+        super().__init__(daemon=True)
+        self.forward = forward
+        self.n_frames = n_frames
+        self.forward_lock = forward_lock
+        self.logger = logger
+
+        self.file_path = file_path
+        self.frames: Optional[np.ndarray] = None
+        self.baked = np.zeros(n_frames, dtype=bool)
+        self.n_baked = 0
+        self.stop_event = Event()
+        # protects `frames`, `baked` and `n_baked`
+        self.lock = Lock()
+
+    @property
+    def done(self) -> bool:
+        return self.n_baked == self.n_frames
+
+    @property
+    def stopped(self) -> bool:
+        """Whether baking has stopped, e.g. on an error, the frames that
+        are not baked are not baked anymore."""
+        return self.stop_event.is_set()
+
+    def allocate(self, n_verts: int) -> None:
+        self.frames = np.lib.format.open_memmap(
+            self.file_path,
+            mode='w+',
+            dtype=np.float32,
+            shape=(self.n_frames, n_verts, 3))
+
+    def put(self, frame_idx: int, verts: np.ndarray) -> None:
+        """Store the vertices of a frame computed outside the thread.
+
+        Args:
+            frame_idx (int): index of the frame.
+            verts (np.ndarray): vertices of the frame, shape: [n_verts, 3].
+        """
+        with self.lock:
+            if self.stop_event.is_set() or self.baked[frame_idx]:
+                return
+            if self.frames is None:
+                self.allocate(len(verts))
+            elif self.frames.shape[1:] != verts.shape:
+                self.logger.warning(
+                    '[BakeThread] The number of vertices changes at frame '
+                    f'{frame_idx}, stop baking.')
+                self.stop_event.set()
+                return
+            self.frames[frame_idx] = verts
+            self.baked[frame_idx] = True
+            self.n_baked += 1
+
+    def mark_baked(self, frame_indices: Iterable[int]) -> None:
+        """Mark frames written to the memory mapped file by other processes
+        as baked.
+
+        Args:
+            frame_indices (Iterable[int]): indices of the frames.
+        """
+        with self.lock:
+            if self.stop_event.is_set():
+                return
+            for frame_idx in frame_indices:
+                if not self.baked[frame_idx]:
+                    self.baked[frame_idx] = True
+                    self.n_baked += 1
+
+    def get(self, frame_idx: int) -> Optional[np.ndarray]:
+        """Get the vertices of a baked frame.
+
+        Args:
+            frame_idx (int): index of the frame.
+
+        Returns:
+            Optional[np.ndarray]: vertices of the frame, None if the frame
+                is not baked yet.
+        """
+        with self.lock:
+            if not self.baked[frame_idx]:
+                return None
+            return self.frames[frame_idx]
+
+    def flush(self) -> None:
+        """Write the baked frames to the memory mapped file."""
+        with self.lock:
+            if self.frames is not None:
+                self.frames.flush()
+
+    def run(self) -> None:
+        for frame_idx in range(self.n_frames):
+            if self.stop_event.is_set():
+                return
+            if self.baked[frame_idx]:
+                continue
+            with self.forward_lock:
+                # the pipeline may have computed the frame meanwhile
+                if self.baked[frame_idx]:
+                    continue
+                try:
+                    verts = np.asarray(
+                        self.forward(frame_idx), dtype=np.float32)
+                except Exception as e:
+                    self.logger.error('[BakeThread] Failed to bake the frame '
+                                      f'{frame_idx}: {e}, stop baking.')
+                    self.stop_event.set()
+                    return
+                self.put(frame_idx, verts)
+
+        if self.done:
+            self.logger.info(f'[BakeThread] Baked {self.n_frames} frames of '
+                             f'{self.frames.shape[1]} vertices')
+
+    def stop(self) -> None:
+        """Stop baking and remove the memory mapped file if it has not been
+        moved."""
+        self.stop_event.set()
+        if self.is_alive():
+            self.join()
+        with self.lock:
+            self.frames = None
+            self.baked[:] = False
+            self.n_baked = 0
+        if os.path.exists(self.file_path):
+            os.unlink(self.file_path)
+
+
+class PoolBakeThread(BakeThread):
+    """Bake the vertices of every frame on the worker processes of a
+    `FramePool`, which write them to the memory mapped file directly.
+
+    The frames are submitted in order by chunks of consecutive frames, and
+    marked as baked as soon as their chunk is done, so that the pipeline can
+    send them in order while the later chunks are evaluated. The pipeline
+    still computes the frames it needs before they are baked with
+    `forward`.
+    """
+
+    def __init__(self, frame_pool: FramePool,
+                 load: Callable[..., Callable[[int], np.ndarray]],
+                 load_args: tuple, n_verts: int, n_frames: int, file_path: str,
+                 forward_lock: Lock, logger: logging.Logger,
+                 forward: Callable[[int],
+                                   np.ndarray], chunk_size: int) -> None:
+        """
+        Args:
+            frame_pool (FramePool): pool of worker processes.
+            load (Callable[..., Callable[[int], np.ndarray]]): picklable
+                function loading the stream data in the workers, see
+                `FramePool.evaluate`.
+            load_args (tuple): picklable arguments of `load`.
+            n_verts (int): number of vertices of each frame.
+            n_frames (int): number of frames to be baked.
+            file_path (str): path to the memory mapped .npy file.
+            forward_lock (Lock): lock held while calling `forward`.
+            logger (logging.Logger): Logger for logging.
+            forward (Callable[[int], np.ndarray]): function computing the
+                vertices of a frame in the pipeline process.
+            chunk_size (int): number of frames evaluated by a worker at
+                once.
+        """
+        super().__init__(forward, n_frames, file_path, forward_lock, logger)
+        self.frame_pool = frame_pool
+        self.load = load
+        self.load_args = load_args
+        self.chunk_size = chunk_size
+        self.allocate(n_verts)
+        self.frames.flush()
+
+    def run(self) -> None:
+        bake_begin = time.time()
+        frame_indices = np.flatnonzero(~self.baked).tolist()
+        try:
+            for written in self.frame_pool.evaluate(
+                    self.load,
+                    self.load_args,
+                    self.file_path,
+                    frame_indices,
+                    chunk_size=self.chunk_size):
+                if self.stop_event.is_set():
+                    return
+                self.mark_baked(written)
+        except Exception as e:
+            # raised by a worker, e.g. failing to load the stream data
+            self.logger.error(
+                f'[PoolBakeThread] Failed to bake the frames: {e}, '
+                'stop baking.')
+            self.stop_event.set()
+            return
+
+        if self.done:
+            self.logger.info(
+                f'[PoolBakeThread] Baked {self.n_frames} frames of '
+                f'{self.frames.shape[1]} vertices on '
+                f'{self.frame_pool.n_workers} processes in '
+                f'{round(time.time() - bake_begin, 2)} s')
+
+    def stop(self) -> None:
+        """Skip the frames not evaluated yet, then stop baking."""
+        self.frame_pool.cancel()
+        super().stop()
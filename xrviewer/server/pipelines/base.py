@@ -1,122 +1,471 @@
 import logging
-import pickle
+import os
+import shutil
 import tempfile
 import time
+import uuid
 from abc import abstractmethod
-from typing import List, Optional, Union
+from contextlib import nullcontext
+from threading import Lock
+from typing import Any, Dict, List, Optional, Set, Union
 
-import umsgpack
+import numpy as np
 
 from ..actions import PipelineActionsEnum
+from ..utils import StageEnum, StageMetrics
 from ..websocket.state import State
 from ..websocket.subprocess import WebSocketServerSubprocess
-from ..zmq import ZMQHandler
+from ..websocket.thread import WebSocketServerThread
+from ..zmq import TransportEnum, ZMQHandler
+from .bake import BakeThread
+from .disk_cache import DiskFrameCache
+from .flow_control import FlowController
+from .frame_cache import FrameCache
+from .playback_clock import PlaybackClock
+from .prefetch import PrefetchScheduler
 
 
 class Pipeline:
 
+    # whether `forward` can be called from several threads at once
+    thread_safe_forward = False
+    # minimum time in seconds between two reports of the stage latencies to
+    # the websocket server
+    metrics_report_interval = 1.0
+
     def __init__(self,
                  websocket_port: int = 4567,
                  zmq_port: Optional[int] = None,
                  websocket_server_ip: str = '127.0.0.1',
-                 state_relief_time: float = 0.5,
-                 buffer_relief_time: float = 0.05,
-                 logger: Union[None, str, logging.Logger] = None) -> None:
+                 state_relief_time: Optional[float] = None,
+                 buffer_relief_time: Optional[float] = None,
+                 logger: Union[None, str, logging.Logger] = None,
+                 vertex_encoding: str = 'raw',
+                 zmq_window_size: int = 8,
+                 bake: bool = False,
+                 bake_progress_interval: float = 1.0,
+                 cache_dir: Optional[str] = None,
+                 cache_size: int = 4 * 1024**3,
+                 frame_cache_size: int = 256 * 1024**2,
+                 prefetch_depth: int = 0,
+                 prefetch_workers: int = 1,
+                 max_viewers: int = 1,
+                 playhead_mode: str = 'shared',
+                 send_queue_size: int = 16,
+                 send_policy: str = 'block',
+                 max_upload_size: int = 4 * 1024**3,
+                 start_server: bool = True,
+                 transport: str = 'zmq',
+                 playback_clock: bool = False,
+                 playback_fps: Optional[float] = None) -> None:
         """
 
         Args:
             websocket_port (int, optional): port used to communicate with
                 the viewer. Defaults to 4567.
             zmq_port (Optional[int], optional): port that the websocket server
-                exposed to interop with pipeline. Defaults to None.
+                exposed to interop with pipeline. None picks a free port.
+                Required if `start_server` is False. Defaults to None.
             websocket_server_ip (str, optional): ip address of the websocket
                 server. Defaults to '127.0.0.1'.
-            state_relief_time (float, optional): time in seconds that the
-                backend should sleep to avoid websocket blocking when the
-                following events happen: (a).the viewer's slider value changed
-                to a specific frame; (b).the animation is end and rollback to
-                the first frame. Larger value is recommended when the network
-                connection is not good. Defaults to 0.5s.
-            buffer_relief_time (float, optional): time in seconds that the
-                backend should sleep to avoid websocket blocking. When the
-                viewer plays the geometry cache at a frame rate that is slower
-                than the backend inference speed, the buffer frequently switch
-                the status between the opening and closed. Larger value is
-                recommended when the network connection is not good. Defaults
-                to 0.05s.
+            state_relief_time (Optional[float], optional): fixed time in
+                seconds that the backend sleeps whenever the viewer sets its
+                buffer frame index, e.g. after a seek. None serves the seeks
+                at once. Defaults to None.
+            buffer_relief_time (Optional[float], optional): fixed time in
+                seconds that the backend sleeps whenever the buffers of the
+                viewers are closed. None lets a `FlowController` pace the
+                frames of each playhead at the consumption rate measured
+                from its viewer, ahead by the drain time of the frames, which
+                adapts to the frame rate of the viewer and to slow networks.
+                Defaults to None.
             logger (Union[None, str, logging.Logger], optional): Logger for
                 logging. If None, root logger will be selected. Defaults to
                 None.
+            vertex_encoding (str, optional): encoding of the vertices sent
+                to the viewer. 'raw' sends float32 positions, whereas
+                'quantized_delta' sends 16-bit quantized keyframes and
+                per-frame deltas to the viewers that support it, which
+                reduces the bandwidth at the cost of a small quantization
+                error. Defaults to 'raw'.
+            zmq_window_size (int, optional): maximum number of messages,
+                e.g. frames, that the pipeline sends to the websocket server
+                without waiting for their acknowledgement. Larger value keeps
+                more frames in flight. Defaults to 8.
+            bake (bool, optional): whether to bake the vertices of every
+                frame into a memory mapped file in the background once the
+                stream data is loaded, so that the baked frames are served
+                without calling `forward` again. Defaults to False.
+            bake_progress_interval (float, optional): minimum time in
+                seconds between two bake progress reports to the viewer.
+                Defaults to 1.0.
+            cache_dir (Optional[str], optional): directory of the disk
+                cache shared by the pipelines on the host. The faces and
+                baked frames of each stream data are stored there, keyed by
+                the hash of the stream data and `get_cache_params`, so that
+                uploading the same data again skips `update_stream_data`.
+                Implies `bake`. None disables the cache. Defaults to None.
+            cache_size (int, optional): maximum size in bytes of the disk
+                cache, the least recently used entries are evicted beyond
+                it. Defaults to 4 GiB.
+            frame_cache_size (int, optional): maximum size in bytes of the
+                frames computed by `forward` kept in memory, so that seeking
+                back or replaying a range does not compute them again. The
+                least recently used frames are dropped beyond it. 0 disables
+                the cache. Defaults to 256 MiB.
+            prefetch_depth (int, optional): number of frames computed ahead
+                of the one being sent on worker threads, which hides the
+                variations of the time spent in `forward`. 0 computes each
+                frame when it is sent. Defaults to 0.
+            prefetch_workers (int, optional): number of worker threads
+                computing the frames ahead. `forward` is only called
+                concurrently if `thread_safe_forward` is True. Defaults
+                to 1.
+            max_viewers (int, optional): maximum number of viewers attached
+                to the pipeline at once. Each frame is computed once and
+                sent to every viewer expecting it. Defaults to 1.
+            playhead_mode (str, optional): 'shared' makes the viewers follow
+                the playhead of the first viewer, whereas 'independent'
+                gives each viewer its own playhead, served from the same
+                frame cache and baked frames. Defaults to 'shared'.
+            send_queue_size (int, optional): number of messages queued by
+                the websocket server for each viewer before `send_policy`
+                applies. Defaults to 16.
+            send_policy (str, optional): what happens when a viewer is too
+                slow to receive the frames. 'block' pauses the pipeline
+                until the viewer catches up, 'drop_oldest' drops the oldest
+                queued frame and 'coalesce' only keeps the latest frame,
+                the viewer requesting the dropped frames again if needed.
+                Defaults to 'block'.
+            max_upload_size (int, optional): maximum size in bytes of the
+                stream data uploaded by a viewer, the larger uploads are
+                rejected by the websocket server. Defaults to 4 GiB.
+            start_server (bool, optional): whether to start a websocket
+                server for this pipeline. If False, the pipeline connects to
+                the websocket server already listening on `zmq_port` as one
+                of its workers, bound to a session whenever a viewer opens
+                one, and the websocket server options above are ignored.
+                Defaults to True.
+            transport (str, optional): how the frames are sent to the
+                websocket server. 'zmq' copies them into the zmq messages,
+                whereas 'shared_memory' writes them to a ring of
+                `zmq_window_size` slots in shared memory and only sends
+                their location, which requires the websocket server to run
+                on the same host. 'in_process' runs the websocket server on
+                a thread of the pipeline process instead of a subprocess,
+                connected over an inproc zmq url, and passes the frames by
+                reference, which requires `start_server`. Defaults to 'zmq'.
+            playback_clock (bool, optional): whether the frames of each
+                playhead are played on a `PlaybackClock` at the frame rate
+                of the stream data, instead of being sent as fast as the
+                viewer buffers them, which replaces the `FlowController`.
+                The frames are timestamped for the viewer to present them
+                at this rate, and the frames that would be presented late
+                are skipped without being computed, which bounds the frames
+                computed per second. Defaults to False.
+            playback_fps (Optional[float], optional): frame rate of the
+                playback clock. None plays the frames at the frame rate of
+                the stream data given by `get_frame_rate`, or at
+                `PlaybackClock.default_frame_rate` if it is unknown.
+                Defaults to None.
+
+        Raises:
+            ValueError: raises when `start_server` is False without
+                `zmq_port`, or with the 'in_process' transport.
         """
         if logger is None or isinstance(logger, str):
             self.logger = logging.getLogger(logger)
         else:
             self.logger = logger
 
-        self.state = State()
-
-        self.websocket_server_subprocess = WebSocketServerSubprocess(
-            pipeline_name=self.__class__.__name__,
-            websocket_port=websocket_port,
-            zmq_port=zmq_port,
-            ip_address=websocket_server_ip,
-            logger=self.logger)
-        zmq_port = self.websocket_server_subprocess.start()
-
+        self.websocket_server_subprocess: \
+            Optional[WebSocketServerSubprocess] = None
+        self.websocket_server_thread: Optional[WebSocketServerThread] = None
+        zmq_url = None
+        if start_server and transport == TransportEnum.IN_PROCESS:
+            self.websocket_server_thread = WebSocketServerThread(
+                pipeline_name=self.__class__.__name__,
+                websocket_port=websocket_port,
+                logger=self.logger,
+                vertex_encoding=vertex_encoding,
+                max_viewers=max_viewers,
+                playhead_mode=playhead_mode,
+                send_queue_size=send_queue_size,
+                send_policy=send_policy,
+                max_upload_size=max_upload_size)
+            zmq_url = self.websocket_server_thread.start()
+        elif start_server:
+            self.websocket_server_subprocess = WebSocketServerSubprocess(
+                pipeline_name=self.__class__.__name__,
+                websocket_port=websocket_port,
+                zmq_port=zmq_port,
+                ip_address=websocket_server_ip,
+                logger=self.logger,
+                vertex_encoding=vertex_encoding,
+                max_viewers=max_viewers,
+                playhead_mode=playhead_mode,
+                send_queue_size=send_queue_size,
+                send_policy=send_policy,
+                max_upload_size=max_upload_size)
+            zmq_port = self.websocket_server_subprocess.start()
+        elif transport == TransportEnum.IN_PROCESS:
+            msg = 'the in_process transport requires the pipeline to ' \
+                'start the websocket server'
+            self.logger.error(msg)
+            raise ValueError(msg)
+        elif zmq_port is None:
+            msg = 'zmq port of the websocket server is required ' \
+                'when the pipeline does not start it'
+            self.logger.error(msg)
+            raise ValueError(msg)
+
+        # latency histograms of the stages of the stream, also reported to
+        # the websocket server which exposes them on its /metrics route
+        self.metrics = StageMetrics()
+        self.metrics_report_time = 0
         self.zmq_handler = ZMQHandler(
             zmq_port=zmq_port,
             ip_address=websocket_server_ip,
-            logger=self.logger)
+            logger=self.logger,
+            window_size=zmq_window_size,
+            pipeline_name=self.__class__.__name__,
+            transport=transport,
+            zmq_url=zmq_url,
+            metrics=self.metrics)
+        # mirror of the websocket server state, kept up to date by the
+        # zmq handler
+        self.state: State = self.zmq_handler.state
 
         self.state_relief_time = state_relief_time
         self.buffer_relief_time = buffer_relief_time
-        self.n_cached_frames = 0
+        self.playback_fps = playback_fps
+        # paces the frames at the playback rate instead of the consumption
+        # rate of the viewers
+        self.playback_clock = PlaybackClock(
+            playback_fps,
+            max_frames_in_flight=zmq_window_size + send_queue_size) \
+            if playback_clock else None
+        self.flow_controller = FlowController(
+            max_frames_in_flight=zmq_window_size + send_queue_size) \
+            if buffer_relief_time is None and not playback_clock else None
+        # number of frames sent to each playhead since its buffer frame
+        # index was set
+        self.n_cached_frames: Dict[str, int] = {}
         self.n_frames = 0
+        # frames per second of the current stream data, None if unknown
+        self.frame_rate: Optional[float] = None
 
+        self.n_sent_frames = 0
+        # frames skipped by the playback clock
+        self.n_skipped_frames = 0
         self.step_time = 0
         self.tmp_dir = tempfile.TemporaryDirectory(prefix='xrviewer_pipeline_')
+        # file of the current stream data, owned by the pipeline
+        self.stream_data_path: Optional[str] = None
+
+        self.disk_cache = None if cache_dir is None else DiskFrameCache(
+            cache_dir, max_size=cache_size, logger=self.logger)
+        self.cache_key: Optional[str] = None
+        # frames of the current stream data loaded from the disk cache
+        self.cached_frames: Optional[np.ndarray] = None
+        self.faces: Optional[np.ndarray] = None
+        # topology of each frame of the current stream data, None if every
+        # frame has `self.faces`
+        self.frame_topologies: Optional[np.ndarray] = None
+        # topologies whose faces have been sent since the stream data was
+        # loaded
+        self.sent_topologies: Set[int] = set()
+        self.frame_cache = FrameCache(frame_cache_size) \
+            if frame_cache_size > 0 else None
+
+        self.bake = bake or self.disk_cache is not None
+        self.bake_progress_interval = bake_progress_interval
+        self.bake_thread: Optional[BakeThread] = None
+        # directory of the disk cache entry being baked
+        self.bake_staging_dir: Optional[str] = None
+        self.reported_n_baked = 0
+        self.bake_report_time = 0
+        # `forward` is not assumed to be thread safe
+        self.forward_lock = Lock() if not self.thread_safe_forward \
+            else nullcontext()
+
+        self.prefetcher = PrefetchScheduler(
+            self.get_verts, depth=prefetch_depth,
+            n_workers=prefetch_workers) if prefetch_depth > 0 else None
+
+    def step(self) -> Optional[float]:
+        """Send the next frame of every playhead whose buffer is open.
+
+        Playheads expecting the same frame share a single message, which the
+        websocket server forwards to each of their viewers.
 
-    def step(self, should_update_frame_idx: bool = True) -> Optional[float]:
-        idx = self.state.buffer_frame_idx + self.n_cached_frames
-
-        if idx >= self.n_frames:
-            self.n_cached_frames = 0
+        Returns:
+            Optional[float]: time elapsed in milliseconds, None if no
+                playhead expects a frame.
+        """
+        # playheads expecting each frame
+        requests: Dict[int, List[str]] = {}
+        # frames following frames skipped by the playback clock
+        skips: Set[int] = set()
+        now = time.time()
+        for playhead_id, playhead in self.state.playheads.items():
+            if not playhead['is_buffer_open']:
+                continue
+            if self.flow_controller is not None and \
+                    not self.flow_controller.is_ready(
+                        playhead_id, now, self.zmq_handler.round_trip_time):
+                continue
+            idx = playhead['buffer_frame_idx'] + \
+                self.n_cached_frames.get(playhead_id, 0)
+            if idx >= self.n_frames:
+                continue
+            if self.playback_clock is not None:
+                clock_idx = self.playback_clock.get_frame_idx(
+                    playhead_id, idx, now)
+                if clock_idx is None:
+                    continue
+                # the last frame is always sent, so that the viewer reaches
+                # the end of the sequence
+                clock_idx = min(clock_idx, self.n_frames - 1)
+                if clock_idx > idx:
+                    skips.add(clock_idx)
+                    self.n_skipped_frames += clock_idx - idx
+                    self.n_cached_frames[playhead_id] = \
+                        self.n_cached_frames.get(playhead_id, 0) + \
+                        clock_idx - idx
+                    idx = clock_idx
+            requests.setdefault(idx, []).append(playhead_id)
+
+        if len(requests) == 0:
             self.step_time = 0
             return
 
-        verts_begin = time.time()
-        verts = self.forward(idx)
+        step_begin = time.time()
+        if self.prefetcher is not None:
+            self.prefetcher.schedule(requests.keys(), self.n_frames)
 
-        data = {'verts': verts, 'frame_idx': idx}
-        self.zmq_handler.write(PipelineActionsEnum.UPDATE_MESH_VERTICES, data)
-
-        if should_update_frame_idx:
-            self.n_cached_frames += 1
+        for idx, playhead_ids in sorted(requests.items()):
+            verts_begin = time.time()
+            if self.prefetcher is not None:
+                verts = self.prefetcher.get(idx)
+            else:
+                verts = self.get_verts(idx)
+
+            data = {
+                'verts': verts,
+                'frame_idx': idx,
+                'playheads': playhead_ids
+            }
+            if self.frame_topologies is not None:
+                data['topology'] = self.send_topology(
+                    int(self.frame_topologies[idx]))
+            if self.playback_clock is not None:
+                data['timestamp'] = self.playback_clock.get_timestamp(idx)
+                if idx in skips:
+                    data['skipped'] = True
+            self.zmq_handler.write(PipelineActionsEnum.UPDATE_MESH_VERTICES,
+                                   data)
+
+            for playhead_id in playhead_ids:
+                self.n_cached_frames[playhead_id] = \
+                    self.n_cached_frames.get(playhead_id, 0) + 1
+                if self.flow_controller is not None:
+                    self.flow_controller.sent(playhead_id, idx)
+                if self.playback_clock is not None:
+                    self.playback_clock.sent(playhead_id, idx)
+
+            self.step_time += (time.time() - verts_begin) * 1000
+            self.n_sent_frames += 1
+            if self.n_sent_frames % 50 == 0:
+                avg_time_elapsed = self.step_time / 50
+                msg = '[Pipeline] inferred frame ' \
+                    f'{idx}/{self.state.n_frames - 1}, ' \
+                    f'avg time elapsed: {round(avg_time_elapsed, 2)} ms'
+                if self.frame_cache is not None:
+                    msg += ', frame cache hit rate: ' \
+                        f'{round(self.frame_cache.hit_rate * 100, 1)}%'
+                if self.playback_clock is not None:
+                    msg += f', skipped frames: {self.n_skipped_frames}'
+                msg += f', mean stage latencies: {self.metrics.summary()}'
+                self.logger.info(msg)
+                self.step_time = 0
+
+        return (time.time() - step_begin) * 1000
+
+    def send_topology(self, topology: int) -> int:
+        """Send the faces of a topology, unless they have already been sent
+        since the stream data was loaded.
 
-        time_elapsed = (time.time() - verts_begin) * 1000
+        Args:
+            topology (int): id of the topology.
 
-        self.step_time += time_elapsed
+        Returns:
+            int: id of the topology.
+        """
+        if topology not in self.sent_topologies:
+            faces = self.get_topology_faces(topology)
+            faces = np.ascontiguousarray(
+                faces, dtype=np.int32).reshape((-1, 3))
+            self.zmq_handler.write(PipelineActionsEnum.UPDATE_TOPOLOGY_FACES, {
+                'topology': topology,
+                'faces': faces
+            })
+            self.sent_topologies.add(topology)
+
+        return topology
+
+    def get_verts(self, frame_idx: int) -> np.ndarray:
+        """Get the vertices of a frame, either baked, cached in memory or
+        computed by `forward`.
 
-        if self.n_cached_frames % 50 == 0 and self.n_cached_frames != 0:
-            avg_time_elapsed = self.step_time / 50
-            self.logger.info(
-                '[Pipeline] inferred frame '
-                f'{idx}/{self.state.n_frames - 1}, '
-                f'avg time elapsed: {round(avg_time_elapsed, 2)} ms')
-            self.step_time = 0
+        Args:
+            frame_idx (int): frame index in infer
 
-        return time_elapsed
+        Returns:
+            np.ndarray: float32 vertices, shape: [n_verts, 3].
+        """
+        if self.cached_frames is not None:
+            return self.cached_frames[frame_idx]
+
+        bake_thread = self.bake_thread
+        # the baked frames make the memory cache redundant
+        frame_cache = self.frame_cache if bake_thread is None else None
+        generation = None
+        if bake_thread is not None:
+            verts = bake_thread.get(frame_idx)
+        elif frame_cache is not None:
+            generation = frame_cache.generation
+            verts = frame_cache.get(frame_idx)
+        else:
+            verts = None
+        if verts is not None:
+            return verts
+
+        with self.forward_lock:
+            # the bake thread may have computed the frame meanwhile
+            if bake_thread is not None:
+                verts = bake_thread.get(frame_idx)
+            if verts is None:
+                with self.metrics.time(StageEnum.FORWARD):
+                    verts = self.forward(frame_idx)
+                verts = np.ascontiguousarray(verts, dtype=np.float32)
+                if bake_thread is not None:
+                    bake_thread.put(frame_idx, verts)
+                elif frame_cache is not None:
+                    frame_cache.put(frame_idx, verts, generation)
+
+        return verts
 
     @abstractmethod
-    def forward(self, frame_idx: int) -> List[List[float]]:
+    def forward(self, frame_idx: int) -> np.ndarray:
         """Get mesh vertices by the given frame index.
 
         Args:
             frame_idx (int): frame index in infer
 
         Returns:
-            List[List[float]]:
-                A nested list for inferred vertices,
+            np.ndarray:
+                A contiguous float32 array for inferred vertices,
                 shape: [n_verts, 3].
         """
         pass
@@ -134,44 +483,309 @@ class Pipeline:
         """
         pass
 
+    def update_stream_data_from_file(self, file_path: str) -> int:
+        """Set stream data from the file uploaded by the viewer.
+
+        Reads the whole file and calls `update_stream_data` by default.
+        Pipelines whose SDK reads files should override it to load the file
+        directly, which stays available until the next stream data is
+        loaded.
+
+        Args:
+            file_path (str): path to the stream data uploaded from the
+                viewer.
+
+        Returns:
+            int: number of frames in the stream data
+        """
+        with open(file_path, 'rb') as stream_file:
+            return self.update_stream_data(stream_file.read())
+
     @abstractmethod
-    def get_faces(self) -> List[int]:
+    def get_faces(self) -> np.ndarray:
         """Get face indices.
 
         Returns:
-            List[int]: the requested face indices, organized as a [|F|, 3] list
+            np.ndarray: the requested int32 face indices of the triangles,
+                organized as a [|F|, 3] array. Polygons can be split with
+                `xrviewer.server.utils.triangulate_polygons`.
         """
         pass
 
+    def get_frame_topologies(self) -> Optional[np.ndarray]:
+        """Get the topology of each frame, for the stream data whose
+        topology changes over time, e.g. fluid simulations.
+
+        Each topology is sent to the viewer once, along with its first
+        frame, and the following frames only reference it.
+
+        Returns:
+            Optional[np.ndarray]: int id of the topology of each frame, whose
+                faces are given by `get_topology_faces`. None if every frame
+                has the faces of `get_faces`.
+        """
+        return None
+
+    def get_topology_faces(self, topology: int) -> np.ndarray:
+        """Get the face indices of a topology of `get_frame_topologies`.
+
+        Args:
+            topology (int): id of the topology.
+
+        Returns:
+            np.ndarray: int32 face indices, organized as a [|F|, 3] array.
+        """
+        return self.faces
+
+    def get_frame_rate(self) -> Optional[float]:
+        """Get the frame rate of the current stream data, which the
+        playback clock plays the frames at.
+
+        Returns:
+            Optional[float]: frames per second, None if unknown.
+        """
+        return None
+
+    def get_cache_params(self) -> Dict[str, Any]:
+        """Get the parameters that change how the stream data is parsed,
+        which are part of the disk cache key along with the stream data.
+
+        Returns:
+            Dict[str, Any]: json serializable parameters.
+        """
+        return {}
+
+    def receive_stream_data(self, upload_path: Optional[str]) -> None:
+        """Take over the file of the stream data spooled by the websocket
+        server, which is linked into the temporary directory of the
+        pipeline, or copied if it is on another file system.
+
+        Args:
+            upload_path (Optional[str]): path to the file spooled by the
+                websocket server. `self.stream_data_path` is None if it is
+                None or cannot be read.
+        """
+        if self.stream_data_path is not None:
+            # the bake workers may not have loaded the file yet
+            self.stop_bake()
+            # still readable by the libraries that keep it open
+            os.unlink(self.stream_data_path)
+            self.stream_data_path = None
+        if upload_path is None:
+            return
+
+        file_path = os.path.join(self.tmp_dir.name, f'{str(uuid.uuid4())}.sd')
+        try:
+            try:
+                os.link(upload_path, file_path)
+            except OSError:
+                shutil.copyfile(upload_path, file_path)
+        except OSError as e:
+            self.logger.error(f'[Pipeline] Failed to receive the stream data '
+                              f'from the websocket server: {e}')
+            return
+        self.stream_data_path = file_path
+
+    def load_stream_data(self, file_path: Optional[str]) -> int:
+        """Load the stream data from the disk cache if possible, otherwise
+        by `update_stream_data_from_file`, and set `self.faces` and
+        `self.frame_rate`.
+
+        Args:
+            file_path (Optional[str]): path to the stream data uploaded
+                from the viewer, None only unloads the current stream data
+
+        Returns:
+            int: number of frames in the stream data
+        """
+        # the frames belong to the previous stream data, wait for the frames
+        # being computed before the stream data is replaced
+        if self.prefetcher is not None:
+            self.prefetcher.reset(wait_running=True)
+        self.stop_bake()
+        if self.frame_cache is not None:
+            self.frame_cache.new_generation()
+        self.cached_frames = None
+        self.faces = None
+        self.frame_topologies = None
+        self.frame_rate = None
+        if file_path is None:
+            return 0
+
+        if self.disk_cache is not None:
+            params = self.get_cache_params()
+            params['pipeline'] = self.__class__.__name__
+            self.cache_key = DiskFrameCache.make_key(file_path, params)
+            entry = self.disk_cache.load(self.cache_key)
+            if entry is not None:
+                self.logger.info('[Pipeline] Loaded the stream data from '
+                                 f'the disk cache: {self.cache_key}')
+                self.faces, self.cached_frames = entry
+                self.frame_rate = self.disk_cache.load_meta(
+                    self.cache_key).get('frame_rate')
+                return len(self.cached_frames)
+
+        n_frames = self.update_stream_data_from_file(file_path)
+        if n_frames > 0:
+            self.faces = np.ascontiguousarray(
+                self.get_faces(), dtype=np.int32).reshape((-1, 3))
+            self.frame_topologies = self.get_frame_topologies()
+            self.frame_rate = self.get_frame_rate()
+
+        return n_frames
+
+    def start_bake(self) -> None:
+        """Start baking the frames of the current stream data."""
+        self.stop_bake()
+        if self.disk_cache is not None:
+            self.bake_staging_dir = self.disk_cache.create_staging_dir()
+            file_path = os.path.join(self.bake_staging_dir, 'verts.npy')
+        else:
+            file_path = os.path.join(self.tmp_dir.name,
+                                     f'{str(uuid.uuid4())}.npy')
+        self.bake_thread = self.create_bake_thread(file_path)
+        self.reported_n_baked = -1
+        self.bake_report_time = 0
+        self.bake_thread.start()
+
+    def create_bake_thread(self, file_path: str) -> BakeThread:
+        """Create the thread baking the frames of the current stream data,
+        which calls `forward` in order by default.
+
+        Args:
+            file_path (str): path to the memory mapped .npy file.
+
+        Returns:
+            BakeThread: the thread, not started yet.
+        """
+        return BakeThread(
+            forward=self.forward,
+            n_frames=self.n_frames,
+            file_path=file_path,
+            forward_lock=self.forward_lock,
+            logger=self.logger)
+
+    def stop_bake(self) -> None:
+        """Stop baking and drop the baked frames."""
+        if self.bake_thread is not None:
+            self.bake_thread.stop()
+            self.bake_thread = None
+        if self.bake_staging_dir is not None:
+            shutil.rmtree(self.bake_staging_dir, ignore_errors=True)
+            self.bake_staging_dir = None
+
+    def commit_bake(self) -> None:
+        """Move the frames into the disk cache once they are all baked."""
+        if self.bake_staging_dir is None or not self.bake_thread.done:
+            return
+
+        self.bake_thread.flush()
+        committed = self.disk_cache.commit(
+            self.cache_key, self.bake_staging_dir, self.faces, {
+                'pipeline': self.__class__.__name__,
+                'n_frames': self.n_frames,
+                'n_verts': self.bake_thread.frames.shape[1],
+                'frame_rate': self.frame_rate,
+            })
+        # the staging directory has been either moved or removed
+        self.bake_staging_dir = None
+        if committed:
+            self.logger.info('[Pipeline] Stored the baked frames in the '
+                             f'disk cache: {self.cache_key}')
+
+        # serve the frames from the cache, unless it has been evicted
+        entry = self.disk_cache.load(self.cache_key)
+        if entry is not None:
+            _, self.cached_frames = entry
+            self.stop_bake()
+
+    def is_baking(self) -> bool:
+        return self.bake_thread is not None and \
+            self.bake_thread.is_alive()
+
+    def check_bake(self) -> None:
+        """Drop the bake thread once baking has stopped before every frame
+        is baked, e.g. on an error, so that the frames are computed by
+        `forward` and kept in the frame cache instead, and notify the
+        viewer."""
+        if self.bake_thread is None or not self.bake_thread.stopped:
+            return
+
+        n_baked = self.bake_thread.n_baked
+        self.zmq_handler.write(PipelineActionsEnum.UPDATE_BAKE_PROGRESS, {
+            'n_baked': n_baked,
+            'n_frames': self.n_frames,
+            'stopped': True
+        })
+        self.stop_bake()
+
+    def report_bake_progress(self) -> None:
+        """Send the number of baked frames to the viewer, at most once per
+        `bake_progress_interval` except for the last report."""
+        if self.bake_thread is None:
+            return
+        n_baked = self.bake_thread.n_baked
+        if n_baked == self.reported_n_baked:
+            return
+        if not self.bake_thread.done and self.is_baking() and \
+                time.time() - self.bake_report_time < \
+                self.bake_progress_interval:
+            return
+
+        self.zmq_handler.write(PipelineActionsEnum.UPDATE_BAKE_PROGRESS, {
+            'n_baked': n_baked,
+            'n_frames': self.n_frames
+        })
+        self.reported_n_baked = n_baked
+        self.bake_report_time = time.time()
+
+    def report_metrics(self, force: bool = False) -> None:
+        """Send the stage latencies to the websocket server, at most once
+        per `metrics_report_interval` unless forced, and only if they
+        changed.
+
+        Args:
+            force (bool, optional): whether to ignore the interval, e.g.
+                before waiting for the viewer. Defaults to False.
+        """
+        if not self.metrics.dirty:
+            return
+        if not force and time.time() - self.metrics_report_time < \
+                self.metrics_report_interval:
+            return
+
+        self.zmq_handler.write(PipelineActionsEnum.UPDATE_METRICS,
+                               self.metrics.snapshot())
+        self.metrics_report_time = time.time()
+
     def event_loop(self) -> None:
         """Enter the event loop, which continually checks the viewer state
-        change and gives appropriate response."""
+        change and gives appropriate response.
+
+        The state changes are pushed by the websocket server, so that the
+        loop blocks without any cost while there is nothing to do.
+        """
         while True:
             iter_begin = time.time()
-            # fetch state from the websocket server
-            serialized_state = umsgpack.unpackb(
-                self.zmq_handler.read(PipelineActionsEnum.REQUEST_STATE))
-
-            self.state: State = pickle.loads(serialized_state)
+            # apply the state changes pushed by the websocket server
+            with self.metrics.time(StageEnum.STATE_POLLING):
+                self.zmq_handler.poll_state()
 
             if self.state.relief_flag:
-                diff = self.state_relief_time - (time.time() - iter_begin)
-                if diff > 0:
-                    time.sleep(diff)
-                self.zmq_handler.write(PipelineActionsEnum.UPDATE_RELIEF_FLAG,
-                                       False)
+                self.state.relief_flag = False
+                if self.state_relief_time is not None:
+                    diff = self.state_relief_time - (time.time() - iter_begin)
+                    if diff > 0:
+                        time.sleep(diff)
 
             # When the viewer uploaded some stream data, the pipeline
             # loads it and sets it as the current playing animation.
             if self.state.should_update_stream_data:
-                serialized_stream_data = umsgpack.unpackb(
-                    self.zmq_handler.read(
-                        PipelineActionsEnum.REQUEST_STREAM_DATA))
-
-                self.n_frames = self.update_stream_data(serialized_stream_data)
-
-                self.zmq_handler.write(
-                    PipelineActionsEnum.UPDATE_STREAM_DATA_FLAG, False)
+                self.state.should_update_stream_data = False
+                self.receive_stream_data(
+                    self.zmq_handler.request_stream_data())
+                self.n_frames = self.load_stream_data(self.stream_data_path)
+                self.state.n_frames = self.n_frames
 
                 self.zmq_handler.write(PipelineActionsEnum.UPDATE_NUM_FRAMES,
                                        self.n_frames)
@@ -183,29 +797,100 @@ class Pipeline:
                     self.logger.info('[Pipeline] The sequence has '
                                      f'{self.n_frames} frames')
 
-                faces = self.get_faces()
-
                 # Since the stream data has changed, the mesh topology
                 # may change, we need to resend faces to the viewer.
                 self.zmq_handler.write(PipelineActionsEnum.UPDATE_MESH_FACES,
-                                       faces)
+                                       self.faces)
                 self.zmq_handler.write(
                     PipelineActionsEnum.UPDATE_STREAM_DATA_SUCCESS, True)
 
-                self.n_cached_frames = 0
+                self.n_cached_frames.clear()
+                self.sent_topologies.clear()
+                if self.flow_controller is not None:
+                    self.flow_controller.forget()
+                if self.playback_clock is not None:
+                    self.playback_clock.reset(self.playback_fps
+                                              or self.frame_rate)
 
-            if self.state.is_buffer_open and self.state.n_frames != 0:
-                if self.state.buffer_frame_idx_reload_flag:
-                    self.n_cached_frames = 0
+                if self.cached_frames is not None:
                     self.zmq_handler.write(
-                        PipelineActionsEnum.
-                        UPDATE_BUFFER_FRAME_IDX_RELOAD_FLAG, False)
-
-                self.step()
-            else:
-                diff = self.buffer_relief_time - (time.time() - iter_begin)
-                if diff > 0:
-                    time.sleep(diff)
+                        PipelineActionsEnum.UPDATE_BAKE_PROGRESS, {
+                            'n_baked': self.n_frames,
+                            'n_frames': self.n_frames
+                        })
+                elif self.bake and self.frame_topologies is not None:
+                    self.logger.info('[Pipeline] The topology changes over '
+                                     'time, the frames are not baked.')
+                elif self.bake:
+                    self.start_bake()
+
+            self.check_bake()
+            self.report_bake_progress()
+            self.commit_bake()
+            self.report_metrics()
+
+            time_elapsed = None
+            if self.state.n_frames != 0:
+                # forget the playheads of the detached viewers
+                detached_playhead_ids = set(self.n_cached_frames) - set(
+                    self.state.playheads)
+                for playhead_id in detached_playhead_ids:
+                    del self.n_cached_frames[playhead_id]
+                if self.flow_controller is not None:
+                    self.flow_controller.forget(detached_playhead_ids)
+                if self.playback_clock is not None:
+                    self.playback_clock.forget(detached_playhead_ids)
+                for playhead_id, playhead in self.state.playheads.items():
+                    if playhead['buffer_frame_idx_reload_flag']:
+                        playhead['buffer_frame_idx_reload_flag'] = False
+                        self.n_cached_frames[playhead_id] = 0
+                        if self.flow_controller is not None:
+                            self.flow_controller.reload(
+                                playhead_id, playhead['buffer_frame_idx'],
+                                time.time())
+                        if self.playback_clock is not None:
+                            self.playback_clock.reload(
+                                playhead_id, playhead['buffer_frame_idx'],
+                                time.time())
+                    elif not playhead['is_buffer_open']:
+                        if self.flow_controller is not None:
+                            self.flow_controller.close(playhead_id)
+                        if self.playback_clock is not None:
+                            self.playback_clock.close(playhead_id)
+
+                time_elapsed = self.step()
+
+            if time_elapsed is None:
+                # nothing to infer, wait until the viewer changes the state,
+                # the next frame of a paced or clocked playhead is due, or
+                # the bake progress has to be reported
+                timeouts = []
+                if self.is_baking():
+                    timeouts.append(self.bake_progress_interval)
+                if self.flow_controller is not None:
+                    wait_time = self.flow_controller.get_wait_time(
+                        self.state.playheads, time.time(),
+                        self.zmq_handler.round_trip_time)
+                    if wait_time is not None:
+                        timeouts.append(wait_time)
+                if self.playback_clock is not None:
+                    wait_time = self.playback_clock.get_wait_time(
+                        self.state.playheads, time.time())
+                    if wait_time is not None:
+                        timeouts.append(wait_time)
+                timeout_in_sec = min(timeouts) if timeouts else None
+                self.report_metrics(force=True)
+                self.zmq_handler.poll_state(timeout_in_sec)
+                if self.buffer_relief_time is not None:
+                    diff = self.buffer_relief_time - (time.time() - iter_begin)
+                    if diff > 0:
+                        time.sleep(diff)
 
     def __del__(self):
+        if self.prefetcher is not None:
+            self.prefetcher.shutdown()
+        self.stop_bake()
+        self.zmq_handler.close()
+        if self.websocket_server_thread is not None:
+            self.websocket_server_thread.stop()
         self.tmp_dir.cleanup()
@@ -0,0 +1,212 @@
+import hashlib
+import json
+import logging
+import os
+import shutil
+import time
+import uuid
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+
+class DiskFrameCache:
+    """Content addressed cache of the faces and baked vertices of stream
+    data, persisted on disk and shared by the pipelines on the host.
+
+    Each entry is a directory named by the hash of the stream data and the
+    parameters used to parse it, holding `faces.npy`, `verts.npy` (a
+    [n_frames, n_verts, 3] float32 array read with memory mapping) and
+    `meta.json`. Entries are written in a staging directory first and
+    renamed into place, so that other processes never see partial entries.
+    The modification time of an entry is updated whenever it is loaded, and
+    the least recently used entries are evicted once the cache exceeds
+    `max_size` bytes.
+    """
+
+    # bump when the layout of the entries changes
+    VERSION = 1
+    STAGING_PREFIX = '.staging-'
+    TRASH_PREFIX = '.trash-'
+    # staging directories older than this are left by dead processes
+    STAGING_EXPIRE_TIME = 24 * 3600
+    # bytes of the stream data hashed at once
+    READ_CHUNK_SIZE = 1024 * 1024
+
+    def __init__(self,
+                 cache_dir: str,
+                 max_size: int = 4 * 1024**3,
+                 logger: Optional[logging.Logger] = None) -> None:
+        """
+        Args:
+            cache_dir (str): root directory of the cache, created if it
+                does not exist.
+            max_size (int, optional): maximum size of the cache in bytes.
+                Defaults to 4 GiB.
+            logger (Optional[logging.Logger], optional): Logger for logging.
+                If None, root logger will be selected. Defaults to None.
+        """
+        self.cache_dir = cache_dir
+        self.max_size = max_size
+        self.logger = logging.getLogger() if logger is None else logger
+        os.makedirs(cache_dir, exist_ok=True)
+
+    @classmethod
+    def make_key(cls, file_path: str, params: Dict[str, Any]) -> str:
+        """Hash the stream data and the parameters used to parse it.
+
+        Args:
+            file_path (str): path to the stream data uploaded from the
+                viewer, read in chunks.
+            params (Dict[str, Any]): json serializable parameters that
+                change the parsed frames, e.g. the frame rate.
+
+        Returns:
+            str: key of the cache entry.
+        """
+        digest = hashlib.blake2b(digest_size=20)
+        digest.update(
+            json.dumps({
+                'version': cls.VERSION,
+                'params': params
+            },
+                       sort_keys=True).encode('utf-8'))
+        with open(file_path, 'rb') as stream_file:
+            while True:
+                chunk = stream_file.read(cls.READ_CHUNK_SIZE)
+                if not chunk:
+                    break
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def entry_dir(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key)
+
+    def load(self, key: str) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        """Load an entry and mark it as recently used.
+
+        Args:
+            key (str): key of the entry.
+
+        Returns:
+            Optional[Tuple[np.ndarray, np.ndarray]]: faces and memory mapped
+                vertices of the entry, None if the entry does not exist.
+        """
+        entry_dir = self.entry_dir(key)
+        try:
+            os.utime(entry_dir)
+            faces = np.load(os.path.join(entry_dir, 'faces.npy'))
+            verts = np.load(
+                os.path.join(entry_dir, 'verts.npy'), mmap_mode='r')
+        except (OSError, ValueError):
+            # missing, or evicted by another process meanwhile
+            return None
+
+        return faces, verts
+
+    def load_meta(self, key: str) -> Dict[str, Any]:
+        """Load the description of an entry, given to `commit`.
+
+        Args:
+            key (str): key of the entry.
+
+        Returns:
+            Dict[str, Any]: the description, empty if the entry does not
+                exist.
+        """
+        try:
+            with open(os.path.join(self.entry_dir(key), 'meta.json')) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def create_staging_dir(self) -> str:
+        """Create a directory to write an entry into before committing it.
+
+        Returns:
+            str: path to the staging directory.
+        """
+        staging_dir = os.path.join(self.cache_dir,
+                                   f'{self.STAGING_PREFIX}{uuid.uuid4()}')
+        os.makedirs(staging_dir)
+        return staging_dir
+
+    def commit(self, key: str, staging_dir: str, faces: np.ndarray,
+               meta: Dict[str, Any]) -> bool:
+        """Move a staging directory holding `verts.npy` into the cache.
+
+        Args:
+            key (str): key of the entry.
+            staging_dir (str): directory created by `create_staging_dir`.
+            faces (np.ndarray): faces of the entry.
+            meta (Dict[str, Any]): json serializable description of the
+                entry.
+
+        Returns:
+            bool: whether the entry is committed, False if another process
+                committed the same entry first.
+        """
+        np.save(os.path.join(staging_dir, 'faces.npy'), faces)
+        with open(os.path.join(staging_dir, 'meta.json'), 'w') as f:
+            json.dump(meta, f)
+
+        try:
+            os.rename(staging_dir, self.entry_dir(key))
+        except OSError:
+            shutil.rmtree(staging_dir, ignore_errors=True)
+            return False
+
+        self.evict()
+        return True
+
+    def remove(self, path: str) -> None:
+        """Remove a directory of the cache, which is renamed first so that
+        it disappears at once for the other processes."""
+        trash_dir = os.path.join(self.cache_dir,
+                                 f'{self.TRASH_PREFIX}{uuid.uuid4()}')
+        try:
+            os.rename(path, trash_dir)
+        except OSError:
+            return
+        shutil.rmtree(trash_dir, ignore_errors=True)
+
+    def list_entries(self) -> List[Tuple[float, int, str]]:
+        """List the entries of the cache.
+
+        Returns:
+            List[Tuple[float, int, str]]: last used time, size in bytes and
+                path of each entry.
+        """
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, name)
+            try:
+                if name.startswith(self.STAGING_PREFIX):
+                    if time.time() - os.path.getmtime(path) > \
+                            self.STAGING_EXPIRE_TIME:
+                        self.remove(path)
+                    continue
+                if name.startswith(self.TRASH_PREFIX):
+                    continue
+                size = sum(
+                    os.path.getsize(os.path.join(path, file_name))
+                    for file_name in os.listdir(path))
+                entries.append((os.path.getmtime(path), size, path))
+            except OSError:
+                # removed by another process meanwhile
+                continue
+
+        return entries
+
+    def evict(self) -> None:
+        """Remove the least recently used entries until the cache fits in
+        `max_size` bytes."""
+        entries = sorted(self.list_entries())
+        total_size = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total_size <= self.max_size:
+                break
+            self.logger.info(f'[DiskFrameCache] Evicting {path}, '
+                             f'{round(size / 1024 / 1024, 2)} MiB')
+            self.remove(path)
+            total_size -= size
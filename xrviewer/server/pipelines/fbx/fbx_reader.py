@@ -1,47 +1,67 @@
 import logging
-from typing import List
+import os
+import uuid
+from typing import Callable, Optional, Tuple
 
 import fbx
 import numpy as np
 
+from ...utils import triangulate_polygons
 from . import FbxCommon
+from .fbx_skin import FbxSkin
 
 
-def get_mesh_faces(node) -> List[int]:
-    """Recursively get the mesh faces of a node.
+def get_mesh_topology(root_node) -> Tuple[np.ndarray, np.ndarray]:
+    """Get the triangulated faces of the meshes under a node.
+
+    The meshes are visited in the same order as their vertices are
+    concatenated by `traverse_node` and `FbxSkin`, and their faces are
+    shifted by the number of vertices of the previous meshes.
 
     Args:
-        node: fbx node to be traverserd. The entry point
-            is the root node.
+        root_node: root node of the imported fbx object.
 
     Returns:
-        List[int]: faces of the mesh, organized as a list.
+        Tuple[np.ndarray, np.ndarray]: int32 face indices organized as a
+            [|F|, 3] array, and the index of the first vertex of each mesh.
     """
     faces = []
+    vert_offsets = []
+    n_verts = 0
 
-    mesh = node.GetNodeAttribute()
-    if mesh and mesh.GetAttributeType() == fbx.FbxNodeAttribute.EType.eMesh:
-        # Extracting faces
-        for polygon_index in range(mesh.GetPolygonCount()):
-            polygon_size = mesh.GetPolygonSize(polygon_index)
-            face = []
-            for vert_index in range(polygon_size):
-                control_point_index = mesh.GetPolygonVertex(
-                    polygon_index, vert_index)
-                face.append(control_point_index)
-            faces.append(face)
+    def traverse(node) -> None:
+        nonlocal n_verts
+        mesh = node.GetNodeAttribute()
+        mesh_type = fbx.FbxNodeAttribute.EType.eMesh
+        if mesh and mesh.GetAttributeType() == mesh_type:
+            polygon_sizes = [
+                mesh.GetPolygonSize(polygon_index)
+                for polygon_index in range(mesh.GetPolygonCount())
+            ]
+            # indices of the control points of all the polygons
+            polygon_verts = mesh.GetPolygonVertices()
+            faces.append(
+                triangulate_polygons(polygon_sizes, polygon_verts) + n_verts)
+            vert_offsets.append(n_verts)
+            n_verts += mesh.GetControlPointsCount()
+
+        for child_index in range(node.GetChildCount()):
+            traverse(node.GetChild(child_index))
+
+    traverse(root_node)
 
-    for child_index in range(node.GetChildCount()):
-        child_node = node.GetChild(child_index)
-        child_faces = get_mesh_faces(child_node)
-        faces.extend(child_faces)
+    faces = np.concatenate(faces) \
+        if faces else np.zeros((0, 3), dtype=np.int32)
 
-    return faces
+    return faces.astype(np.int32), np.array(vert_offsets, dtype=np.int64)
 
 
 def traverse_node(node, time) -> list[fbx.FbxVector4]:
     """process each node and get deformed vertices.
 
+    This per-vertex implementation is kept as the reference of `FbxSkin`,
+    which is used by `FbxReader`.
+
     Args:
         node: node to be traversed. The entry point
             is the root node of fbx object.
@@ -103,7 +123,7 @@ def traverse_node(node, time) -> list[fbx.FbxVector4]:
     return deformed_points
 
 
-def get_mesh_verts(root_node, time_mode, frame_idx: int) -> list[list[float]]:
+def get_mesh_verts(root_node, time_mode, frame_idx: int) -> np.ndarray:
     """Compute the mesh vertices at a specific frame using the rigging weights
     of the skeletal mesh.
 
@@ -113,8 +133,8 @@ def get_mesh_verts(root_node, time_mode, frame_idx: int) -> list[list[float]]:
         frame_idx: index of the frame to be processed.
 
     Returns:
-        list[list[float]]: resulting vertex coordinates,
-            organized as a [|V|, 3] list.
+        np.ndarray: resulting float32 vertex coordinates,
+            organized as a [|V|, 3] array.
     """
 
     # Set the desired time based on the frame index
@@ -124,8 +144,24 @@ def get_mesh_verts(root_node, time_mode, frame_idx: int) -> list[list[float]]:
     # Process the FBX hierarchy starting from the root node
     vertices = traverse_node(root_node, time)
 
-    # Convert the results to a more convenient format, e.g., list of tuples
-    return [(v[0], v[1], v[2]) for v in vertices]
+    # Convert the results to a contiguous [|V|, 3] array
+    return np.array([(v[0], v[1], v[2]) for v in vertices],
+                    dtype=np.float32).reshape((-1, 3))
+
+
+def load_reader_forward(file_path: str, frame_rate: int) -> Callable:
+    """Load a fbx file in a worker process of `FramePool`.
+
+    Args:
+        file_path (str): path to the fbx file.
+        frame_rate (int): frame rate of the sampled animation.
+
+    Returns:
+        Callable: `FbxReader.forward` of the loaded file.
+    """
+    fbx_reader = FbxReader(logger=logging.getLogger(), frame_rate=frame_rate)
+    fbx_reader.load(file_path)
+    return fbx_reader.forward
 
 
 class FbxReader:
@@ -136,7 +172,30 @@ class FbxReader:
         120: fbx.FbxTime.EMode.eFrames120
     }
 
-    def __init__(self, logger: logging.Logger, frame_rate: int = 60) -> None:
+    def __init__(self,
+                 logger: logging.Logger,
+                 frame_rate: int = 60,
+                 bake_bones: bool = False,
+                 bake_dir: Optional[str] = None,
+                 bake_memmap_size: int = 64 * 1024 * 1024) -> None:
+        """
+        Args:
+            logger (logging.Logger): Logger for logging.
+            frame_rate (int, optional): frame rate of the sampled animation.
+                Defaults to 60.
+            bake_bones (bool, optional): whether to evaluate the global
+                transforms of the bones for every frame at load, so that
+                each frame only looks them up. Defaults to False.
+            bake_dir (Optional[str], optional): directory of the memory
+                mapped file holding the baked transforms when they are
+                large. None means always keeping them in memory. Defaults
+                to None.
+            bake_memmap_size (int, optional): size in bytes above which the
+                baked transforms are memory mapped. Defaults to 64 MiB.
+
+        Raises:
+            ValueError: raises when the frame rate is not supported.
+        """
         self.logger = logger
         available_frame_rates = (30, 60, 120)
 
@@ -146,11 +205,23 @@ class FbxReader:
             self.logger.error(msg)
             raise ValueError(msg)
 
+        self.frame_rate = frame_rate
         self.time_mode = self.__class__.FRAME_RATE_MODE[frame_rate]
         self.root_node = None
+        self.skin = None
+        self.faces: Optional[np.ndarray] = None
+        # index of the first vertex of each mesh
+        self.mesh_vert_offsets: Optional[np.ndarray] = None
         self.n_frames = 0
         self.scale_factor = 0.01
 
+        self.bake_bones = bake_bones
+        self.bake_dir = bake_dir
+        self.bake_memmap_size = bake_memmap_size
+        # [n_frames, n_bones, 4, 4] global transforms of the bones
+        self.bone_table: Optional[np.ndarray] = None
+        self.bone_table_path: Optional[str] = None
+
     def load(self, file_path: str) -> int:
         """Load fbx file and setup animation params.
 
@@ -163,6 +234,8 @@ class FbxReader:
         Returns:
             int: frame number of the animation.
         """
+        self.release_bone_table()
+
         manager, scene = FbxCommon.InitializeSdkObjects()
         load_success = FbxCommon.LoadScene(manager, scene, file_path)
         if not load_success:
@@ -202,28 +275,73 @@ class FbxReader:
 
         n_frames = stop_frame - start_frame + 1
 
+        # Extract the skinning data once, so that each frame only
+        # evaluates the bone transforms
+        self.skin = FbxSkin(self.root_node)
+        self.faces, self.mesh_vert_offsets = get_mesh_topology(self.root_node)
+        self.n_frames = n_frames
+        if self.bake_bones:
+            self.bake_bone_table()
+
         return n_frames
 
-    def forward(self, frame_idx: int) -> list[list[float]]:
+    def bake_bone_table(self) -> None:
+        """Evaluate the global transforms of the bones for every frame into
+        `self.bone_table`, which is memory mapped in `self.bake_dir` when it
+        is larger than `self.bake_memmap_size`."""
+        shape = (self.n_frames, len(self.skin.bones), 4, 4)
+        n_bytes = int(np.prod(shape)) * np.dtype(np.float32).itemsize
+        if self.bake_dir is not None and n_bytes > self.bake_memmap_size:
+            self.bone_table_path = os.path.join(self.bake_dir,
+                                                f'{str(uuid.uuid4())}.npy')
+            bone_table = np.lib.format.open_memmap(
+                self.bone_table_path, mode='w+', dtype=np.float32, shape=shape)
+        else:
+            bone_table = np.empty(shape, dtype=np.float32)
+
+        time = fbx.FbxTime()
+        for frame_idx in range(self.n_frames):
+            time.SetFrame(frame_idx, self.time_mode)
+            bone_table[frame_idx] = self.skin.evaluate_bones(time)
+
+        self.bone_table = bone_table
+        self.logger.info(
+            f'[FbxReader] Baked {shape[1]} bones over {shape[0]} frames, '
+            f'{round(n_bytes / 1024 / 1024, 2)} MiB'
+            f'{" memory mapped" if self.bone_table_path else ""}')
+
+    def release_bone_table(self) -> None:
+        """Drop the baked transforms and remove their memory mapped file."""
+        self.bone_table = None
+        if self.bone_table_path is not None:
+            os.unlink(self.bone_table_path)
+            self.bone_table_path = None
+
+    def forward(self, frame_idx: int) -> np.ndarray:
         """Simulate a LBS forward procedure at a specific frame.
 
         Args:
             frame_idx (int): index of frame to be processed.
 
         Returns:
-            list[list[float]]: resulting vertex coordinates, organized
-                as a [|V|, 3] list.
+            np.ndarray: resulting float32 vertex coordinates, organized
+                as a [|V|, 3] array.
         """
-        verts = get_mesh_verts(self.root_node, self.time_mode, frame_idx)
+        if self.bone_table is not None and frame_idx < len(self.bone_table):
+            bone_transforms = self.bone_table[frame_idx].astype(np.float64)
+        else:
+            time = fbx.FbxTime()
+            time.SetFrame(frame_idx, self.time_mode)
+            bone_transforms = self.skin.evaluate_bones(time)
+        verts = self.skin.deform(bone_transforms)
 
         return verts
 
-    def get_faces(self) -> list[int]:
-        """Get faces of the mesh in the fbx object.
+    def get_faces(self) -> np.ndarray:
+        """Get faces of the meshes in the fbx object, extracted at load.
 
         Returns:
-            list[int]: resulting face indices, organzied as a flattened list.
+            np.ndarray: resulting int32 face indices, organized as a
+                [|F|, 3] array.
         """
-        faces = get_mesh_faces(self.root_node)
-        faces = np.array(faces, dtype=np.int32).reshape((-1, 3)).tolist()
-        return faces
+        return self.faces
@@ -0,0 +1,194 @@
+from typing import List, Tuple
+
+import fbx
+import numpy as np
+
+# flattened identity matrix
+IDENTITY = np.eye(4, dtype=np.float64).reshape(16)
+
+
+def get_matrix(fbx_matrix: fbx.FbxAMatrix) -> np.ndarray:
+    """Convert a fbx matrix to an array.
+
+    Fbx matrices transform row vectors, i.e. the translation is stored in
+    the last row, and `FbxAMatrix.MultT(v)` equals `[x, y, z, 1] @ matrix`.
+
+    Args:
+        fbx_matrix (fbx.FbxAMatrix): matrix to be converted.
+
+    Returns:
+        np.ndarray: the converted matrix, shape: [4, 4].
+    """
+    return np.array([[fbx_matrix.Get(row, col) for col in range(4)]
+                     for row in range(4)],
+                    dtype=np.float64)
+
+
+def pad_influences(vert_indices: np.ndarray, cluster_indices: np.ndarray,
+                   weights: np.ndarray,
+                   n_verts: int) -> Tuple[List, List, List]:
+    """Organize the skin influences as slots: slot `k` holds the `k`-th
+    influence of every vertex that has more than `k` influences, so that the
+    matrices can be blended with one gather per slot.
+
+    Args:
+        vert_indices (np.ndarray): vertex index of each influence.
+        cluster_indices (np.ndarray): cluster index of each influence.
+        weights (np.ndarray): weight of each influence.
+        n_verts (int): number of vertices.
+
+    Returns:
+        Tuple[List, List, List]: vertex indices, cluster indices and weights
+            of the influences in each slot.
+    """
+    order = np.argsort(vert_indices, kind='stable')
+    vert_indices = vert_indices[order]
+    cluster_indices = cluster_indices[order]
+    weights = weights[order]
+
+    # rank of each influence among the influences of its vertex
+    counts = np.bincount(vert_indices, minlength=n_verts)
+    starts = np.cumsum(counts) - counts
+    ranks = np.arange(len(vert_indices)) - starts[vert_indices]
+
+    slot_verts, slot_clusters, slot_weights = [], [], []
+    for rank in range(counts.max() if n_verts > 0 else 0):
+        mask = ranks == rank
+        slot_verts.append(vert_indices[mask])
+        slot_clusters.append(cluster_indices[mask])
+        slot_weights.append(weights[mask])
+
+    return slot_verts, slot_clusters, slot_weights
+
+
+class FbxSkin:
+    """Skinning data of the meshes in a fbx scene, extracted once into arrays
+    so that deforming the meshes at a specific time only evaluates the global
+    transforms of the bones, followed by batched matrix products.
+
+    The vertices of all the meshes are concatenated in the order they are
+    traversed from the root node, with the same linear blend skinning as the
+    per-vertex `traverse_node`:
+    `v' = v + sum_c w_c * (v @ inv(bind_c) @ global_c - v)`.
+    """
+
+    def __init__(self, root_node) -> None:
+        """
+        Args:
+            root_node: root node of the imported fbx object.
+        """
+        rest_verts: List[np.ndarray] = []
+        # (global vertex index, cluster index, weight) of the influences
+        influences: List[np.ndarray] = []
+        inv_bind_matrices: List[np.ndarray] = []
+        cluster_bones: List[int] = []
+        # bones are shared by the clusters that link to the same node
+        self.bones = []
+        bone_ids = {}
+
+        def traverse(node) -> None:
+            mesh = node.GetNodeAttribute()
+            mesh_type = fbx.FbxNodeAttribute.EType.eMesh
+            if mesh and mesh.GetAttributeType() == mesh_type:
+                vert_offset = sum(len(verts) for verts in rest_verts)
+                control_points = mesh.GetControlPoints()
+                rest_verts.append(
+                    np.array([(p[0], p[1], p[2]) for p in control_points],
+                             dtype=np.float64).reshape((-1, 3)))
+
+                for deformer_idx in range(mesh.GetDeformerCount()):
+                    deformer = mesh.GetDeformer(deformer_idx)
+                    if deformer.GetDeformerType(
+                    ) != fbx.FbxDeformer.EDeformerType.eSkin:
+                        continue
+
+                    for cluster_idx in range(deformer.GetClusterCount()):
+                        cluster = deformer.GetCluster(cluster_idx)
+                        link = cluster.GetLink()
+                        if link is None:
+                            continue
+                        bone_id = link.GetUniqueID()
+                        if bone_id not in bone_ids:
+                            bone_ids[bone_id] = len(self.bones)
+                            self.bones.append(link)
+
+                        init_cluster_transform = fbx.FbxAMatrix()
+                        cluster.GetTransformLinkMatrix(init_cluster_transform)
+                        inv_bind_matrices.append(
+                            get_matrix(init_cluster_transform.Inverse()))
+
+                        indices = np.asarray(
+                            cluster.GetControlPointIndices(), dtype=np.int64)
+                        weights = np.asarray(
+                            cluster.GetControlPointWeights(), dtype=np.float64)
+                        influences.append(
+                            np.stack([
+                                indices + vert_offset,
+                                np.full_like(indices, len(cluster_bones)),
+                                weights
+                            ],
+                                     axis=1))
+                        cluster_bones.append(bone_ids[bone_id])
+
+            for child_idx in range(node.GetChildCount()):
+                traverse(node.GetChild(child_idx))
+
+        traverse(root_node)
+
+        self.rest_verts = np.concatenate(rest_verts) \
+            if rest_verts else np.zeros((0, 3), dtype=np.float64)
+        self.n_verts = len(self.rest_verts)
+        self.inv_bind_matrices = np.array(
+            inv_bind_matrices, dtype=np.float64).reshape((-1, 4, 4))
+        self.cluster_bones = np.array(cluster_bones, dtype=np.int64)
+
+        influences = np.concatenate(influences) \
+            if influences else np.zeros((0, 3), dtype=np.float64)
+        self.influence_verts, self.influence_clusters, self.influence_weights \
+            = pad_influences(influences[:, 0].astype(np.int64),
+                             influences[:, 1].astype(np.int64),
+                             influences[:, 2], self.n_verts)
+
+    def evaluate_bones(self, time: fbx.FbxTime) -> np.ndarray:
+        """Evaluate the global transforms of the bones.
+
+        Args:
+            time (fbx.FbxTime): the desired time.
+
+        Returns:
+            np.ndarray: global transforms, shape: [n_bones, 4, 4].
+        """
+        transforms = [
+            get_matrix(bone.EvaluateGlobalTransform(time))
+            for bone in self.bones
+        ]
+        return np.array(transforms, dtype=np.float64).reshape((-1, 4, 4))
+
+    def deform(self, bone_transforms: np.ndarray) -> np.ndarray:
+        """Apply linear blend skinning to the rest vertices.
+
+        Args:
+            bone_transforms (np.ndarray): global transforms of the bones,
+                shape: [n_bones, 4, 4].
+
+        Returns:
+            np.ndarray: deformed float32 vertices, shape: [n_verts, 3].
+        """
+        cluster_transforms = np.matmul(
+            self.inv_bind_matrices,
+            bone_transforms[self.cluster_bones]).reshape((-1, 16))
+
+        # blend the matrices of the influences of each vertex, the remaining
+        # weight keeps the vertex at its rest position
+        blended = np.tile(IDENTITY, (self.n_verts, 1))
+        for verts, clusters, weights in zip(self.influence_verts,
+                                            self.influence_clusters,
+                                            self.influence_weights):
+            blended[verts] += weights[:, None] * (
+                cluster_transforms[clusters] - IDENTITY)
+
+        deformed = np.einsum('vi,vij->vj', self.rest_verts,
+                             blended.reshape((-1, 4, 4))[:, :3, :3])
+        deformed += blended.reshape((-1, 4, 4))[:, 3, :3]
+
+        return deformed.astype(np.float32)
@@ -1,10 +1,14 @@
 import logging
 import os
 import uuid
-from typing import List, Optional, Union
+from typing import Any, Dict, Optional, Union
 
+import numpy as np
+
+from ..bake import BakeThread, PoolBakeThread
 from ..base import Pipeline
-from .fbx_reader import FbxReader
+from ..frame_pool import FramePool
+from .fbx_reader import FbxReader, load_reader_forward
 
 
 class FBXStreamPipeline(Pipeline):
@@ -13,26 +17,96 @@ class FBXStreamPipeline(Pipeline):
                  websocket_port: int = 4567,
                  zmq_port: Optional[int] = None,
                  websocket_server_ip: str = '127.0.0.1',
-                 state_relief_time: float = 0.5,
-                 buffer_relief_time: float = 0.05,
+                 state_relief_time: Optional[float] = None,
+                 buffer_relief_time: Optional[float] = None,
                  logger: Union[None, str, logging.Logger] = None,
-                 frame_rate: int = 60) -> None:
+                 frame_rate: int = 60,
+                 bake_bones: bool = False,
+                 eval_workers: int = 0,
+                 eval_chunk_size: int = 16,
+                 **kwargs) -> None:
+        """
+        Args:
+            frame_rate (int, optional): frame rate of the sampled animation.
+                Defaults to 60.
+            bake_bones (bool, optional): whether to evaluate the bone
+                transforms of every frame at load. Defaults to False.
+            eval_workers (int, optional): number of worker processes baking
+                the frames in parallel, each loading the uploaded fbx file
+                once, which implies `bake`. 0 bakes the frames in a thread
+                of the pipeline process. Defaults to 0.
+            eval_chunk_size (int, optional): number of consecutive frames
+                evaluated by a worker process at once. Defaults to 16.
+
+        See `Pipeline` for the other arguments.
+        """
         super().__init__(websocket_port, zmq_port, websocket_server_ip,
-                         state_relief_time, buffer_relief_time, logger)
-        self.fbx_reader = FbxReader(frame_rate=frame_rate, logger=self.logger)
+                         state_relief_time, buffer_relief_time, logger,
+                         **kwargs)
+        self.fbx_reader = FbxReader(
+            frame_rate=frame_rate,
+            logger=self.logger,
+            bake_bones=bake_bones,
+            bake_dir=self.tmp_dir.name)
+
+        self.frame_pool = FramePool(eval_workers) \
+            if eval_workers > 0 else None
+        self.eval_chunk_size = eval_chunk_size
+        if self.frame_pool is not None:
+            self.bake = True
+        # the uploaded fbx file, loaded by the worker processes
+        self.file_path: Optional[str] = None
+
+    def get_frame_rate(self) -> Optional[float]:
+        return self.fbx_reader.frame_rate
+
+    def get_cache_params(self) -> Dict[str, Any]:
+        return {
+            'frame_rate': self.fbx_reader.frame_rate,
+            'scale_factor': self.fbx_reader.scale_factor,
+        }
 
     def update_stream_data(self, stream_data: bytes) -> int:
         file_path = os.path.join(self.tmp_dir.name, f'{str(uuid.uuid4())}.sd')
         with open(file_path, 'wb') as binary_file:
             binary_file.write(stream_data)
+        n_frames = self.update_stream_data_from_file(file_path)
+        if self.file_path != file_path:
+            os.unlink(file_path)
+        return n_frames
+
+    def update_stream_data_from_file(self, file_path: str) -> int:
         n_frames = self.fbx_reader.load(file_path)
-        os.unlink(file_path)
+        # the file stays available until the next stream data is loaded
+        self.file_path = file_path \
+            if self.frame_pool is not None and n_frames > 0 else None
         return n_frames
 
-    def get_faces(self) -> List[int]:
+    def get_faces(self) -> np.ndarray:
         faces = self.fbx_reader.get_faces()
         return faces
 
-    def forward(self, frame_idx: int) -> List[List[float]]:
+    def forward(self, frame_idx: int) -> np.ndarray:
         verts = self.fbx_reader.forward(frame_idx=frame_idx)
         return verts
+
+    def create_bake_thread(self, file_path: str) -> BakeThread:
+        if self.frame_pool is None or self.file_path is None:
+            return super().create_bake_thread(file_path)
+
+        return PoolBakeThread(
+            frame_pool=self.frame_pool,
+            load=load_reader_forward,
+            load_args=(self.file_path, self.fbx_reader.frame_rate),
+            n_verts=self.fbx_reader.skin.n_verts,
+            n_frames=self.n_frames,
+            file_path=file_path,
+            forward_lock=self.forward_lock,
+            logger=self.logger,
+            forward=self.forward,
+            chunk_size=self.eval_chunk_size)
+
+    def __del__(self):
+        super().__del__()
+        if self.frame_pool is not None:
+            self.frame_pool.shutdown()
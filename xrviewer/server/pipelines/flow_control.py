@@ -0,0 +1,224 @@
+from typing import Any, Dict, Iterable, Optional
+
+
+class FlowController:
+    """Decides when the pipeline sends the frames of each playhead, instead
+    of sleeping a fixed time after every change of the viewer buffer.
+
+    The viewer drops the frame overflowing its buffer and closes it, then
+    opens it again at the dropped frame as soon as it has played one, so
+    that a pipeline sending faster than the playback overflows the buffer
+    at every frame, and the frames sent meanwhile arrive out of order and
+    make the viewer roll back. Such a reopening is told from a seek by its
+    index, which continues the frames sent.
+
+    The consumption rate of the viewer is measured between two consecutive
+    reopenings, the buffer being full at both, and the frames of the
+    playhead are then paced slightly below this rate, sent ahead by the
+    drain time, the time a frame takes to be acknowledged by the websocket
+    server, which grows with slow viewers. After a while, at most half the
+    time the buffer lasts, the frames are paced at twice the rate for as
+    long, then no longer paced, so that the buffer overflows and the rate is
+    measured again, e.g. if the viewer plays faster or the rate was
+    underestimated. A seek is served at once.
+    """
+
+    # smoothing factor of the moving average of the consumption rate
+    smoothing = 0.3
+    # factor of the consumption rate the frames are paced at, below 1 so
+    # that the frames never overflow the buffer
+    pacing_factor = 0.98
+    # minimum number of frames played between the reopenings the rate is
+    # measured from, shorter intervals being dominated by the latency
+    min_rate_frames = 8
+
+    def __init__(self,
+                 max_frames_in_flight: int = 24,
+                 max_pacing_time: float = 5.0) -> None:
+        """
+        Args:
+            max_frames_in_flight (int, optional): maximum number of frames
+                sent but not received by the viewer yet, which may be sent
+                again when the buffer is opened. Defaults to 24.
+            max_pacing_time (float, optional): maximum time in seconds after
+                a reopening beyond which the buffer is overflowed to measure
+                the rate again. Defaults to 5.0.
+        """
+        self.max_frames_in_flight = max_frames_in_flight
+        self.max_pacing_time = max_pacing_time
+        # flow of each playhead, see `new_playhead`
+        self.playheads: Dict[str, Dict[str, Any]] = {}
+
+    @staticmethod
+    def new_playhead() -> Dict[str, Any]:
+        return {
+            # frames per second played by the viewer
+            'rate': None,
+            # number of frames the viewer buffers
+            'capacity': None,
+            # time and index of the last reopening following a full buffer
+            'reopen_time': None,
+            'reopen_frame_idx': None,
+            # time and index of the reopening the rate is measured from
+            'rate_time': None,
+            'rate_frame_idx': None,
+            # whether the buffer has been closed since the last reload
+            'is_closed': False,
+            # whether the last reload was a seek, whose first closing
+            # measures the capacity
+            'is_seek': True,
+            # frames sent since the last reload
+            'n_sent': 0,
+            # index of the frame following the last one sent
+            'next_frame_idx': None,
+        }
+
+    def get_playhead(self, playhead_id: str) -> Dict[str, Any]:
+        playhead = self.playheads.get(playhead_id)
+        if playhead is None:
+            playhead = self.playheads[playhead_id] = self.new_playhead()
+        return playhead
+
+    def reload(self, playhead_id: str, frame_idx: int, now: float) -> bool:
+        """Handle a new buffer frame index of a playhead.
+
+        Args:
+            playhead_id (str): id of the playhead.
+            frame_idx (int): the new buffer frame index.
+            now (float): current time in seconds.
+
+        Returns:
+            bool: whether the playhead seeked, otherwise it continues the
+                frames sent, either after its buffer was full or after
+                frames were received out of order.
+        """
+        playhead = self.get_playhead(playhead_id)
+        next_frame_idx = playhead['next_frame_idx']
+        is_seek = next_frame_idx is None or \
+            not next_frame_idx - self.max_frames_in_flight <= frame_idx <= \
+            next_frame_idx
+        is_closed = playhead['is_closed']
+        playhead['is_closed'] = False
+        if is_seek:
+            playhead['is_seek'] = True
+            playhead['n_sent'] = 0
+            playhead['reopen_time'] = None
+            playhead['reopen_frame_idx'] = None
+            playhead['rate_time'] = None
+            playhead['rate_frame_idx'] = None
+            return True
+        if not is_closed:
+            # the viewer rolls back to the frames it expects, keep pacing
+            # them from the last reopening
+            if playhead['reopen_frame_idx'] is not None:
+                playhead['n_sent'] = max(
+                    frame_idx - playhead['reopen_frame_idx'], 0)
+            return False
+
+        playhead['is_seek'] = False
+        playhead['n_sent'] = 0
+
+        is_anchored = playhead['rate_time'] is not None and \
+            now > playhead['rate_time'] and \
+            frame_idx > playhead['rate_frame_idx']
+        if is_anchored and playhead['rate'] is not None and \
+                playhead['capacity'] is not None and \
+                now - playhead['rate_time'] >= \
+                playhead['capacity'] / playhead['rate']:
+            # a full buffer lasting longer than its frames at the current
+            # rate means that the viewer paused
+            is_anchored = False
+        if not is_anchored:
+            playhead['rate_time'] = now
+            playhead['rate_frame_idx'] = frame_idx
+        elif frame_idx - playhead['rate_frame_idx'] >= self.min_rate_frames:
+            rate = (frame_idx - playhead['rate_frame_idx']) / \
+                (now - playhead['rate_time'])
+            if playhead['rate'] is None:
+                playhead['rate'] = rate
+            else:
+                playhead['rate'] += self.smoothing * (rate - playhead['rate'])
+            playhead['rate_time'] = now
+            playhead['rate_frame_idx'] = frame_idx
+        playhead['reopen_time'] = now
+        playhead['reopen_frame_idx'] = frame_idx
+        return False
+
+    def close(self, playhead_id: str) -> None:
+        """Record that the buffer of a playhead is closed."""
+        playhead = self.get_playhead(playhead_id)
+        if playhead['is_closed']:
+            return
+        playhead['is_closed'] = True
+        if playhead['is_seek'] and playhead['n_sent'] > 0:
+            playhead['capacity'] = playhead['n_sent']
+
+    def sent(self, playhead_id: str, frame_idx: int) -> None:
+        """Record that a frame was sent to a playhead."""
+        playhead = self.get_playhead(playhead_id)
+        playhead['n_sent'] += 1
+        playhead['next_frame_idx'] = frame_idx + 1
+
+    def get_send_time(self, playhead: Dict[str, Any],
+                      drain_time: float) -> Optional[float]:
+        """Time the next frame of a playhead is due, None if its frames are
+        not paced, i.e. until its rate is measured and once the buffer is
+        probed."""
+        if playhead['reopen_time'] is None or playhead['rate'] is None:
+            return None
+        # the viewer has room for one frame when it reopens its buffer, and
+        # for one more each time it plays one
+        pacing_rate = self.pacing_factor * playhead['rate']
+        elapsed = playhead['n_sent'] / pacing_rate
+        max_pacing_time = self.max_pacing_time
+        if playhead['capacity'] is not None:
+            max_pacing_time = min(max_pacing_time,
+                                  playhead['capacity'] / playhead['rate'] / 2)
+        if elapsed > max_pacing_time:
+            n_probe_frames = playhead['n_sent'] - \
+                pacing_rate * max_pacing_time
+            elapsed = max_pacing_time + \
+                n_probe_frames / (2 * playhead['rate'])
+            if elapsed > 2 * max_pacing_time:
+                return None
+        return playhead['reopen_time'] + elapsed - drain_time
+
+    def is_ready(self, playhead_id: str, now: float,
+                 drain_time: float) -> bool:
+        """Whether the next frame of a playhead can be sent.
+
+        Args:
+            playhead_id (str): id of the playhead.
+            now (float): current time in seconds.
+            drain_time (float): time in seconds the frames take to be
+                acknowledged by the websocket server.
+
+        Returns:
+            bool: False if the frame would overflow the buffer of the
+                viewer.
+        """
+        send_time = self.get_send_time(
+            self.get_playhead(playhead_id), drain_time)
+        return send_time is None or now >= send_time
+
+    def get_wait_time(self, playhead_ids: Iterable[str], now: float,
+                      drain_time: float) -> Optional[float]:
+        """Time in seconds until the next frame of a paced playhead is due,
+        None if no playhead is waiting."""
+        send_times = []
+        for playhead_id in playhead_ids:
+            playhead = self.playheads.get(playhead_id)
+            send_time = None if playhead is None else \
+                self.get_send_time(playhead, drain_time)
+            if send_time is not None and send_time > now:
+                send_times.append(send_time)
+        return min(send_times) - now if send_times else None
+
+    def forget(self, playhead_ids: Optional[Iterable[str]] = None) -> None:
+        """Drop the flow of some playheads, every playhead if None, e.g.
+        when the stream data changes."""
+        if playhead_ids is None:
+            self.playheads.clear()
+            return
+        for playhead_id in playhead_ids:
+            self.playheads.pop(playhead_id, None)
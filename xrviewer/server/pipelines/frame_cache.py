@@ -0,0 +1,99 @@
+from collections import OrderedDict
+from threading import Lock
+from typing import Hashable, Optional
+
+import numpy as np
+
+
+class FrameCache:
+    """Least recently used cache of frame vertices bounded by their total
+    size in bytes.
+
+    The frames are keyed by `(generation, frame_idx)`, where the generation
+    is bumped by `new_generation` whenever new stream data is loaded, which
+    drops the frames of the previous stream data.
+    """
+
+    def __init__(self, max_size: int) -> None:
+        """
+        Args:
+            max_size (int): maximum total size in bytes of the cached frames.
+                Frames larger than it are not cached.
+        """
+        self.max_size = max_size
+        self.size = 0
+        self.generation = 0
+        self.n_hits = 0
+        self.n_misses = 0
+        self.frames: 'OrderedDict[Hashable, np.ndarray]' = OrderedDict()
+        self.lock = Lock()
+
+    def __len__(self) -> int:
+        return len(self.frames)
+
+    @property
+    def hit_rate(self) -> float:
+        n_requests = self.n_hits + self.n_misses
+        return self.n_hits / n_requests if n_requests > 0 else 0
+
+    def new_generation(self) -> int:
+        """Drop the cached frames, which belong to the previous stream data.
+
+        Returns:
+            int: the new generation.
+        """
+        with self.lock:
+            self.frames.clear()
+            self.size = 0
+            self.generation += 1
+            return self.generation
+
+    def get(self, frame_idx: int) -> Optional[np.ndarray]:
+        """Get the vertices of a frame of the current generation.
+
+        Args:
+            frame_idx (int): index of the frame.
+
+        Returns:
+            Optional[np.ndarray]: the cached vertices, None on cache miss.
+        """
+        with self.lock:
+            key = (self.generation, frame_idx)
+            verts = self.frames.get(key)
+            if verts is None:
+                self.n_misses += 1
+                return None
+            self.frames.move_to_end(key)
+            self.n_hits += 1
+            return verts
+
+    def put(self,
+            frame_idx: int,
+            verts: np.ndarray,
+            generation: Optional[int] = None) -> None:
+        """Cache the vertices of a frame, evicting the least recently used
+        frames beyond `max_size`.
+
+        Args:
+            frame_idx (int): index of the frame.
+            verts (np.ndarray): vertices of the frame, which must not be
+                modified afterwards.
+            generation (Optional[int], optional): generation of the stream
+                data the frame was computed from, the frame is dropped if it
+                is not the current one. None means the current generation.
+                Defaults to None.
+        """
+        if verts.nbytes > self.max_size:
+            return
+
+        with self.lock:
+            if generation is None:
+                generation = self.generation
+            key = (generation, frame_idx)
+            if generation != self.generation or key in self.frames:
+                return
+            self.frames[key] = verts
+            self.size += verts.nbytes
+            while self.size > self.max_size:
+                _, evicted = self.frames.popitem(last=False)
+                self.size -= evicted.nbytes
@@ -0,0 +1,132 @@
+import multiprocessing
+from typing import Any, Callable, Dict, Iterator, List, Sequence
+
+import numpy as np
+
+# state of a worker process, see `init_worker`
+worker_state: Dict[str, Any] = {}
+
+
+def init_worker(generation) -> None:
+    """Initialize a worker process of `FramePool`.
+
+    Args:
+        generation: shared counter bumped by `FramePool.cancel`.
+    """
+    worker_state['generation'] = generation
+    worker_state['loader_key'] = None
+    worker_state['forward'] = None
+    worker_state['file_path'] = None
+    worker_state['frames'] = None
+
+
+def evaluate_frames(load: Callable[..., Callable[[int], np.ndarray]],
+                    load_args: tuple, file_path: str, generation: int,
+                    frame_indices: Sequence[int]) -> List[int]:
+    """Evaluate frames in a worker process, writing them to the memory
+    mapped file of the frames.
+
+    The stream data is loaded by `load(*load_args)` once per worker process,
+    and loaded again only when `load_args` change.
+
+    Args:
+        load (Callable[..., Callable[[int], np.ndarray]]): picklable
+            function loading the stream data, which returns the function
+            computing the [n_verts, 3] vertices of a frame.
+        load_args (tuple): picklable arguments of `load`.
+        file_path (str): path to the memory mapped [n_frames, n_verts, 3]
+            float32 .npy file.
+        generation (int): generation of the pool when the frames are
+            submitted, the frames are skipped once it is cancelled.
+        frame_indices (Sequence[int]): indices of the frames.
+
+    Returns:
+        List[int]: indices of the frames written to the file.
+    """
+    written = []
+    for frame_idx in frame_indices:
+        if worker_state['generation'].value != generation:
+            break
+        loader_key = (load, load_args)
+        if worker_state['loader_key'] != loader_key:
+            # release the previous stream data first
+            worker_state['forward'] = None
+            worker_state['forward'] = load(*load_args)
+            worker_state['loader_key'] = loader_key
+        if worker_state['file_path'] != file_path:
+            worker_state['frames'] = np.load(file_path, mmap_mode='r+')
+            worker_state['file_path'] = file_path
+
+        worker_state['frames'][frame_idx] = worker_state['forward'](frame_idx)
+        written.append(frame_idx)
+
+    if worker_state['frames'] is not None:
+        worker_state['frames'].flush()
+    return written
+
+
+def evaluate_chunk(task: tuple) -> List[int]:
+    """Unpack the arguments of `evaluate_frames` for `Pool.imap`."""
+    return evaluate_frames(*task)
+
+
+class FramePool:
+    """Pool of worker processes evaluating disjoint frames in parallel into
+    a memory mapped file shared with the pipeline.
+
+    Each worker loads the stream data on its own, so that the evaluation is
+    not bound by the GIL of the pipeline process, e.g. for the fbx sdk. The
+    workers are started with 'spawn', since the state of the libraries of
+    the pipeline may not survive a fork.
+    """
+
+    def __init__(self, n_workers: int) -> None:
+        """
+        Args:
+            n_workers (int): number of worker processes.
+        """
+        self.n_workers = n_workers
+        context = multiprocessing.get_context('spawn')
+        self.generation = context.Value('i', 0)
+        self.pool = context.Pool(
+            n_workers, initializer=init_worker, initargs=(self.generation, ))
+
+    def evaluate(self,
+                 load: Callable[..., Callable[[int], np.ndarray]],
+                 load_args: tuple,
+                 file_path: str,
+                 frame_indices: Sequence[int],
+                 chunk_size: int = 16) -> Iterator[List[int]]:
+        """Evaluate frames into a memory mapped file, in chunks of
+        consecutive frames submitted in order.
+
+        Args:
+            load (Callable[..., Callable[[int], np.ndarray]]): picklable
+                function loading the stream data in the workers, see
+                `evaluate_frames`.
+            load_args (tuple): picklable arguments of `load`.
+            file_path (str): path to the memory mapped [n_frames, n_verts, 3]
+                float32 .npy file, which must exist.
+            frame_indices (Sequence[int]): indices of the frames.
+            chunk_size (int, optional): number of frames evaluated by a
+                worker at once. Defaults to 16.
+
+        Returns:
+            Iterator[List[int]]: indices of the frames written to the file,
+                for each chunk as soon as it is done.
+        """
+        generation = self.generation.value
+        chunks = [(load, load_args, file_path, generation,
+                   frame_indices[begin:begin + chunk_size])
+                  for begin in range(0, len(frame_indices), chunk_size)]
+        return self.pool.imap_unordered(evaluate_chunk, chunks)
+
+    def cancel(self) -> None:
+        """Skip the frames submitted so far that are not evaluated yet."""
+        with self.generation.get_lock():
+            self.generation.value += 1
+
+    def shutdown(self) -> None:
+        self.cancel()
+        self.pool.terminate()
+        self.pool.join()
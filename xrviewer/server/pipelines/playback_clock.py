@@ -0,0 +1,171 @@
+import math
+from typing import Any, Dict, Iterable, Optional
+
+
+class PlaybackClock:
+    """Plays the frames of each playhead at a fixed frame rate on the clock
+    of the pipeline, instead of sending them as fast as the viewer buffers
+    them.
+
+    A seek starts the timeline of the playhead at the requested frame, once
+    it is sent, each following frame being due one frame interval after the
+    previous one. The frames are sent `lead_time` before they are due, so
+    that the viewer receives them ahead of time at a steady rate, and are
+    timestamped with their time in the sequence for the viewer to present
+    them at the frame rate. A frame whose interval is over before it is
+    sent would be presented late, it is skipped without being computed and
+    the timeline resumes at the frame due at that time.
+
+    The viewer closes its buffer when it pauses, which pauses the timeline
+    until the buffer is opened again. The timeline then restarts at the
+    frame following the buffered ones, sent at once, as when the viewer
+    rolls back to the frame it expects.
+    """
+
+    # frame rate of the stream data whose frame rate is unknown
+    default_frame_rate = 30.0
+
+    def __init__(self,
+                 frame_rate: Optional[float] = None,
+                 lead_time: float = 0.25,
+                 max_frames_in_flight: int = 24) -> None:
+        """
+        Args:
+            frame_rate (Optional[float], optional): frames per second of the
+                timeline. None uses `default_frame_rate`. Defaults to None.
+            lead_time (float, optional): time in seconds the frames are sent
+                before they are due. Defaults to 0.25.
+            max_frames_in_flight (int, optional): maximum number of frames
+                sent but not received by the viewer yet, which may be sent
+                again when the buffer is opened. Defaults to 24.
+        """
+        self.frame_rate = self.default_frame_rate \
+            if frame_rate is None else frame_rate
+        self.lead_time = lead_time
+        self.max_frames_in_flight = max_frames_in_flight
+        # timeline of each playhead, see `new_playhead`
+        self.playheads: Dict[str, Dict[str, Any]] = {}
+
+    @staticmethod
+    def new_playhead() -> Dict[str, Any]:
+        return {
+            # time the anchor frame is due, None until the first frame of the
+            # timeline is sent, and its index
+            'anchor_time': None,
+            'anchor_frame_idx': None,
+            # whether the buffer is closed, which pauses the timeline
+            'is_closed': False,
+            # index of the next frame to send
+            'next_frame_idx': None,
+        }
+
+    def reset(self, frame_rate: Optional[float] = None) -> None:
+        """Drop the timeline of every playhead and set the frame rate, e.g.
+        when the stream data changes.
+
+        Args:
+            frame_rate (Optional[float], optional): frames per second of the
+                timeline. None uses `default_frame_rate`. Defaults to None.
+        """
+        self.playheads.clear()
+        self.frame_rate = self.default_frame_rate \
+            if frame_rate is None else frame_rate
+
+    def get_playhead(self, playhead_id: str) -> Dict[str, Any]:
+        playhead = self.playheads.get(playhead_id)
+        if playhead is None:
+            playhead = self.playheads[playhead_id] = self.new_playhead()
+        return playhead
+
+    def get_timestamp(self, frame_idx: int) -> float:
+        """Time of a frame in the sequence, in seconds."""
+        return frame_idx / self.frame_rate
+
+    def get_due_time(self, playhead: Dict[str, Any], frame_idx: int) -> float:
+        return playhead['anchor_time'] + \
+            (frame_idx - playhead['anchor_frame_idx']) / self.frame_rate
+
+    def reload(self, playhead_id: str, frame_idx: int, now: float) -> bool:
+        """Handle a new buffer frame index of a playhead.
+
+        Args:
+            playhead_id (str): id of the playhead.
+            frame_idx (int): the new buffer frame index.
+            now (float): current time in seconds.
+
+        Returns:
+            bool: whether the playhead seeked, which starts its timeline
+                once the frame is sent. Otherwise it continues the frames
+                sent, and its timeline restarts at the frame, due
+                `lead_time` from now.
+        """
+        playhead = self.get_playhead(playhead_id)
+        next_frame_idx = playhead['next_frame_idx']
+        is_seek = playhead['anchor_time'] is None or \
+            next_frame_idx is None or \
+            not next_frame_idx - self.max_frames_in_flight <= frame_idx <= \
+            next_frame_idx
+        playhead['anchor_time'] = None if is_seek else now + self.lead_time
+        playhead['anchor_frame_idx'] = frame_idx
+        playhead['is_closed'] = False
+        playhead['next_frame_idx'] = frame_idx
+        return is_seek
+
+    def close(self, playhead_id: str) -> None:
+        """Pause the timeline of a playhead whose buffer is closed."""
+        self.get_playhead(playhead_id)['is_closed'] = True
+
+    def get_frame_idx(self, playhead_id: str, frame_idx: int,
+                      now: float) -> Optional[int]:
+        """Get the frame of a playhead to send now.
+
+        Args:
+            playhead_id (str): id of the playhead.
+            frame_idx (int): index of the next frame expected by the
+                viewer.
+            now (float): current time in seconds.
+
+        Returns:
+            Optional[int]: `frame_idx`, or the frame due now if the
+                interval of `frame_idx` is over, the frames in between
+                being skipped. None if `frame_idx` is not due yet.
+        """
+        playhead = self.get_playhead(playhead_id)
+        if playhead['anchor_time'] is None:
+            # start the timeline, the first frame is never late
+            playhead['anchor_time'] = now
+            playhead['anchor_frame_idx'] = frame_idx
+            return frame_idx
+        if now >= self.get_due_time(playhead, frame_idx + 1):
+            return playhead['anchor_frame_idx'] + math.floor(
+                (now - playhead['anchor_time']) * self.frame_rate)
+        if now < self.get_due_time(playhead, frame_idx) - self.lead_time:
+            return None
+        return frame_idx
+
+    def sent(self, playhead_id: str, frame_idx: int) -> None:
+        """Record that a frame was sent to a playhead."""
+        self.get_playhead(playhead_id)['next_frame_idx'] = frame_idx + 1
+
+    def get_wait_time(self, playhead_ids: Iterable[str],
+                      now: float) -> Optional[float]:
+        """Time in seconds until the next frame of a playing playhead is
+        due to be sent, None if no playhead is waiting."""
+        send_times = []
+        for playhead_id in playhead_ids:
+            playhead = self.playheads.get(playhead_id)
+            if playhead is None or playhead['anchor_time'] is None or \
+                    playhead['is_closed'] or \
+                    playhead['next_frame_idx'] is None:
+                continue
+            send_time = self.get_due_time(
+                playhead, playhead['next_frame_idx']) - self.lead_time
+            if send_time > now:
+                send_times.append(send_time)
+        return min(send_times) - now if send_times else None
+
+    def forget(self, playhead_ids: Iterable[str]) -> None:
+        """Drop the timeline of some playheads, e.g. of the detached
+        viewers."""
+        for playhead_id in playhead_ids:
+            self.playheads.pop(playhead_id, None)
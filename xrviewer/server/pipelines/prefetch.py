@@ -0,0 +1,92 @@
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from typing import Callable, Dict, Iterable
+
+import numpy as np
+
+
+class PrefetchScheduler:
+    """Compute the frames ahead of the one being sent on a thread pool, so
+    that the time spent in `forward` varying from frame to frame does not
+    stall the stream.
+
+    The frames are requested in order with `get`, and `schedule` submits the
+    frames that follow, up to `depth` frames ahead of each playhead. The
+    frames that are not ahead of any playhead anymore, e.g. after seeking,
+    are cancelled by the next `schedule`, and every scheduled frame is
+    cancelled by `reset` when new stream data is loaded.
+    """
+
+    def __init__(self,
+                 compute: Callable[[int], np.ndarray],
+                 depth: int,
+                 n_workers: int = 1) -> None:
+        """
+        Args:
+            compute (Callable[[int], np.ndarray]): function computing the
+                vertices of a frame, called from the worker threads.
+            depth (int): number of frames computed ahead.
+            n_workers (int, optional): number of worker threads. Defaults
+                to 1.
+        """
+        self.compute = compute
+        self.depth = depth
+        self.executor = ThreadPoolExecutor(
+            max_workers=n_workers, thread_name_prefix='xrviewer_prefetch')
+        self.futures: Dict[int, Future] = {}
+
+    def schedule(self, frame_indices: Iterable[int], n_frames: int) -> None:
+        """Submit the frames from each of `frame_indices` up to `depth`
+        frames ahead, and cancel the other scheduled frames.
+
+        Args:
+            frame_indices (Iterable[int]): indices of the next frame to be
+                requested by each playhead.
+            n_frames (int): number of frames in the stream data.
+        """
+        wanted = []
+        for frame_idx in sorted(frame_indices):
+            wanted.extend(
+                range(frame_idx, min(frame_idx + self.depth, n_frames)))
+
+        wanted_set = set(wanted)
+        for idx in [idx for idx in self.futures if idx not in wanted_set]:
+            self.futures.pop(idx).cancel()
+
+        for idx in wanted:
+            if idx not in self.futures:
+                self.futures[idx] = self.executor.submit(self.compute, idx)
+
+    def get(self, frame_idx: int) -> np.ndarray:
+        """Get the vertices of a frame, waiting for it if it is scheduled,
+        otherwise computing it at once.
+
+        Args:
+            frame_idx (int): index of the frame.
+
+        Returns:
+            np.ndarray: vertices of the frame.
+        """
+        future = self.futures.pop(frame_idx, None)
+        if future is None or future.cancelled():
+            return self.compute(frame_idx)
+
+        return future.result()
+
+    def reset(self, wait_running: bool = False) -> None:
+        """Cancel the scheduled frames.
+
+        Args:
+            wait_running (bool, optional): whether to wait for the frames
+                being computed, e.g. before the stream data is replaced.
+                Defaults to False.
+        """
+        futures = list(self.futures.values())
+        self.futures.clear()
+        for future in futures:
+            future.cancel()
+        if wait_running:
+            wait(futures)
+
+    def shutdown(self) -> None:
+        self.reset()
+        self.executor.shutdown(wait=True)
@@ -1,6 +1,7 @@
 import logging
-from typing import List, Optional, Union
+from typing import Optional, Union
 
+import numpy as np
 from xrmocap.client.smpl_stream_client import SMPLStreamClient
 
 from ...actions import PipelineActionsEnum
@@ -13,13 +14,15 @@ class SMPLStreamPipeline(Pipeline):
                  websocket_port: int = 4567,
                  zmq_port: Optional[int] = None,
                  websocket_server_ip: str = '127.0.0.1',
-                 state_relief_time: float = 0.5,
-                 buffer_relief_time: float = 0.05,
+                 state_relief_time: Optional[float] = None,
+                 buffer_relief_time: Optional[float] = None,
                  smpl_stream_server_ip: str = '127.0.0.1',
                  smpl_stream_server_port: int = 29091,
-                 logger: Union[None, str, logging.Logger] = None) -> None:
+                 logger: Union[None, str, logging.Logger] = None,
+                 **kwargs) -> None:
         super().__init__(websocket_port, zmq_port, websocket_server_ip,
-                         state_relief_time, buffer_relief_time, logger)
+                         state_relief_time, buffer_relief_time, logger,
+                         **kwargs)
 
         self.smpl_client = SMPLStreamClient(
             server_ip=smpl_stream_server_ip,
@@ -30,10 +33,11 @@ class SMPLStreamPipeline(Pipeline):
     def update_stream_data(self, stream_data: bytes) -> int:
         return self.smpl_client.upload_smpl_data(stream_data)
 
-    def get_faces(self) -> List[int]:
+    def get_faces(self) -> np.ndarray:
         faces = self.smpl_client.get_faces()
         return faces
 
-    def forward(self, frame_idx: int) -> List[List[float]]:
-        verts = self.smpl_client.forward(frame_idx)
+    def forward(self, frame_idx: int) -> np.ndarray:
+        verts = np.asarray(
+            self.smpl_client.forward(frame_idx), dtype=np.float32)
         return verts
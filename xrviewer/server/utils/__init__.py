@@ -0,0 +1,15 @@
+# yapf: disable
+from .metrics import Histogram, StageEnum, StageMetrics, render_prometheus
+from .serialization import pack_ndarray, unpack_ndarray
+from .topology import triangulate_polygons
+
+# yapf: enable
+__all__ = [
+    'Histogram',
+    'StageEnum',
+    'StageMetrics',
+    'render_prometheus',
+    'pack_ndarray',
+    'unpack_ndarray',
+    'triangulate_polygons',
+]
@@ -0,0 +1,223 @@
+import bisect
+import time
+from contextlib import contextmanager
+from enum import Enum
+from threading import Lock
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+
+class StageEnum(str, Enum):
+    # pipeline: `forward` computing the vertices of a frame
+    FORWARD = 'forward'
+    # pipeline: packing a message sent to the websocket server
+    SERIALIZATION = 'serialization'
+    # pipeline: from sending a message to the websocket server until it is
+    # acknowledged, which includes the time the websocket server holds the
+    # acknowledgements of a session whose send queues are full
+    ZMQ_ROUND_TRIP = 'zmq_round_trip'
+    # pipeline: applying the state changes pushed by the websocket server
+    STATE_POLLING = 'state_polling'
+    # websocket server: handling a message of a pipeline
+    SERVER_HANDLING = 'server_handling'
+    # websocket server: encoding a message for a viewer and writing it until
+    # it is flushed to the socket
+    WEBSOCKET_WRITE = 'websocket_write'
+
+
+class Histogram:
+    """Histogram of durations in seconds, with cumulative buckets as in
+    Prometheus."""
+
+    # upper bounds of the buckets in seconds, finer than the Prometheus
+    # defaults below 5 ms, the duration of most stages for small meshes
+    BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025,
+               0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+    def __init__(self, buckets: Sequence[float] = BUCKETS) -> None:
+        """
+        Args:
+            buckets (Sequence[float], optional): sorted upper bounds of the
+                buckets in seconds. Defaults to `BUCKETS`.
+        """
+        self.buckets = list(buckets)
+        # the last count is the +Inf bucket
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, seconds: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+
+    @property
+    def mean(self) -> float:
+        """Mean duration in seconds, 0 without observations."""
+        return self.sum / self.count if self.count > 0 else 0.0
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Estimate a quantile by linear interpolation within its bucket,
+        as `histogram_quantile` in Prometheus.
+
+        Args:
+            q (float): the quantile, between 0 and 1.
+
+        Returns:
+            Optional[float]: the duration in seconds, None without
+                observations. The quantiles beyond the last bucket are
+                reported as its upper bound.
+        """
+        if self.count == 0:
+            return None
+        rank = q * self.count
+        cumulative = 0
+        for bucket_idx, count in enumerate(self.counts[:-1]):
+            if count > 0 and cumulative + count >= rank:
+                lower = self.buckets[bucket_idx - 1] if bucket_idx > 0 else 0
+                upper = self.buckets[bucket_idx]
+                return lower + (upper - lower) * (rank - cumulative) / count
+            cumulative += count
+        return self.buckets[-1]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'buckets': list(self.buckets),
+            'counts': list(self.counts),
+            'count': self.count,
+            'sum': self.sum,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'Histogram':
+        histogram = cls(data['buckets'])
+        histogram.counts = list(data['counts'])
+        histogram.count = data['count']
+        histogram.sum = data['sum']
+        return histogram
+
+
+class StageMetrics:
+    """Latency histograms of the stages of the stream, see `StageEnum`.
+
+    The durations may be observed from several threads, e.g. the prefetch
+    workers calling `forward`.
+    """
+
+    def __init__(self) -> None:
+        self.histograms: Dict[str, Histogram] = {}
+        self.lock = Lock()
+        # whether durations were observed since the last snapshot
+        self.dirty = False
+
+    def observe(self, stage: str, seconds: float) -> None:
+        """Record the duration of a stage.
+
+        Args:
+            stage (str): name of the stage, see `StageEnum`.
+            seconds (float): duration in seconds.
+        """
+        stage = str(getattr(stage, 'value', stage))
+        with self.lock:
+            histogram = self.histograms.get(stage)
+            if histogram is None:
+                histogram = self.histograms[stage] = Histogram()
+            histogram.observe(seconds)
+            self.dirty = True
+
+    @contextmanager
+    def time(self, stage: str) -> Iterator[None]:
+        """Record the duration of the enclosed block as a stage."""
+        begin = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - begin)
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """Copy the histograms, keyed by stage, as plain dicts which can be
+        sent to the websocket server, see `Histogram.from_dict`."""
+        with self.lock:
+            self.dirty = False
+            return {
+                stage: histogram.to_dict()
+                for stage, histogram in self.histograms.items()
+            }
+
+    def summary(self) -> str:
+        """Mean duration of each stage, for the logs."""
+        with self.lock:
+            return ', '.join(
+                f'{stage} {round(histogram.mean * 1000, 2)} ms'
+                for stage, histogram in sorted(self.histograms.items()))
+
+
+def read_rss(pid: Union[int, str] = 'self') -> Optional[int]:
+    """Resident set size of a process in bytes, read from /proc.
+
+    Args:
+        pid (Union[int, str], optional): id of the process. Defaults to the
+            current process.
+
+    Returns:
+        Optional[int]: the size, None if unknown, e.g. on other platforms
+            than Linux.
+    """
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+def format_labels(labels: Dict[str, str]) -> str:
+    """Format the labels of a sample, escaping their values."""
+    formatted = []
+    for key, value in labels.items():
+        value = str(value).replace('\\',
+                                   '\\\\').replace('"',
+                                                   '\\"').replace('\n', '\\n')
+        formatted.append(f'{key}="{value}"')
+    return ','.join(formatted)
+
+
+def render_prometheus(
+        name: str, description: str,
+        series: List[Tuple[Dict[str, str], Dict[str, Dict[str, Any]]]]) -> str:
+    """Render the histograms of stages in the Prometheus text format.
+
+    Args:
+        name (str): name of the metric, e.g. 'xrviewer_stage_seconds'.
+        description (str): help text of the metric.
+        series (List[Tuple[Dict[str, str], Dict[str, Dict[str, Any]]]]):
+            labels and histograms returned by `StageMetrics.snapshot` of
+            each source, e.g. the websocket server and every pipeline
+            worker. The stage is added to the labels.
+
+    Returns:
+        str: the metric in the Prometheus text format.
+    """
+    lines = [f'# HELP {name} {description}', f'# TYPE {name} histogram']
+    for labels, histograms in series:
+        for stage, data in sorted(histograms.items()):
+            histogram = Histogram.from_dict(data)
+            stage_labels = format_labels({**labels, 'stage': stage})
+            cumulative = 0
+            bounds = [repr(float(bound))
+                      for bound in histogram.buckets] + ['+Inf']
+            for bound, count in zip(bounds, histogram.counts):
+                cumulative += count
+                lines.append(f'{name}_bucket{{{stage_labels},le="{bound}"}} '
+                             f'{cumulative}')
+            lines.append(f'{name}_sum{{{stage_labels}}} {histogram.sum!r}')
+            lines.append(f'{name}_count{{{stage_labels}}} {histogram.count}')
+
+    return '\n'.join(lines) + '\n'
+
+
+def render_gauge(name: str, description: str, value: float) -> str:
+    """Render a gauge without labels in the Prometheus text format."""
+    return f'# HELP {name} {description}\n# TYPE {name} gauge\n' \
+        f'{name} {value!r}\n'
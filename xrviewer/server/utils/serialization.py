@@ -0,0 +1,52 @@
+from typing import Any, Dict
+
+import numpy as np
+
+# dtypes that the viewer is able to view as a typed array
+SUPPORTED_DTYPES = ('float32', 'int32', 'uint32', 'int16', 'uint16', 'int8',
+                    'uint8')
+
+
+def pack_ndarray(array: np.ndarray) -> Dict[str, Any]:
+    """Pack an array into a small header followed by its raw buffer.
+
+    The packed array is a plain dict, so that it can be embedded in any
+    msgpack message and decoded by the viewer without per-element boxing.
+
+    Args:
+        array (np.ndarray): array to be packed.
+
+    Raises:
+        ValueError: raises when the dtype of the array is not supported.
+
+    Returns:
+        Dict[str, Any]: a dict that contains the dtype, the shape and the
+            little-endian raw bytes of the array.
+    """
+    if array.dtype.name not in SUPPORTED_DTYPES:
+        raise ValueError(f'dtype {array.dtype.name} is not supported, '
+                         f'available dtypes: {SUPPORTED_DTYPES}')
+
+    array = np.ascontiguousarray(array, dtype=array.dtype.newbyteorder('<'))
+
+    return {
+        'dtype': array.dtype.name,
+        'shape': list(array.shape),
+        'buffer': array.tobytes(),
+    }
+
+
+def unpack_ndarray(packed: Dict[str, Any]) -> np.ndarray:
+    """Unpack an array packed by `pack_ndarray`.
+
+    Args:
+        packed (Dict[str, Any]): the packed array.
+
+    Returns:
+        np.ndarray: a read-only array that views the packed buffer.
+    """
+    dtype = np.dtype(packed['dtype']).newbyteorder('<')
+
+    array = np.frombuffer(packed['buffer'], dtype=dtype)
+
+    return array.reshape(packed['shape'])
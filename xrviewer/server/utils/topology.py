@@ -0,0 +1,39 @@
+import numpy as np
+
+
+def triangulate_polygons(polygon_sizes: np.ndarray,
+                         polygon_verts: np.ndarray) -> np.ndarray:
+    """Triangulate polygons as fans around their first vertex.
+
+    The polygon `[v0, v1, ..., vn]` is split into the triangles
+    `[v0, v1, v2], [v0, v2, v3], ..., [v0, vn-1, vn]`, which keeps the
+    winding order of the polygon and is exact for convex polygons.
+    Polygons with less than 3 vertices are dropped.
+
+    Args:
+        polygon_sizes (np.ndarray): number of vertices of each polygon.
+        polygon_verts (np.ndarray): vertex indices of the polygons,
+            concatenated.
+
+    Returns:
+        np.ndarray: int32 vertex indices of the triangles, shape: [|F|, 3].
+    """
+    polygon_sizes = np.asarray(polygon_sizes, dtype=np.int64)
+    polygon_verts = np.asarray(polygon_verts, dtype=np.int32)
+
+    starts = np.cumsum(polygon_sizes) - polygon_sizes
+    n_triangles = np.maximum(polygon_sizes - 2, 0)
+
+    # index of each triangle inside its polygon's fan
+    triangle_starts = np.repeat(starts, n_triangles)
+    fan_idx = np.arange(len(triangle_starts)) - np.repeat(
+        np.cumsum(n_triangles) - n_triangles, n_triangles)
+
+    corners = np.stack([
+        triangle_starts,
+        triangle_starts + fan_idx + 1,
+        triangle_starts + fan_idx + 2,
+    ],
+                       axis=1)
+
+    return polygon_verts[corners]
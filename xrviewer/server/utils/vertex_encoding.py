@@ -0,0 +1,160 @@
+from enum import Enum
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+from .serialization import pack_ndarray, unpack_ndarray
+
+
+class VertexEncodingEnum(str, Enum):
+    # float32 absolute positions
+    RAW = 'raw'
+    # int16 quantized positions, sent as keyframes plus per-frame deltas
+    QUANTIZED_DELTA = 'quantized_delta'
+
+
+class QuantizedDeltaEncoder:
+    """Quantize vertex positions to 16 bits inside a bounding box and encode
+    consecutive frames as deltas of the quantized positions.
+
+    A keyframe carries the bounding box and the quantized positions of a
+    frame, the following frames only carry the difference to the previous
+    frame, stored as int8 or int16 depending on the largest delta. Since the
+    deltas are computed on the quantized positions, the decoder reconstructs
+    exactly what the encoder quantized and no error is accumulated.
+
+    The bounding box is grown to cover every frame seen since the last reset,
+    so that it converges to the bounding box of the whole sequence.
+    """
+
+    N_LEVELS = 65535
+
+    def __init__(self,
+                 keyframe_interval: int = 60,
+                 bbox_margin: float = 0.1) -> None:
+        """
+        Args:
+            keyframe_interval (int, optional): maximum number of frames
+                between two keyframes. Defaults to 60.
+            bbox_margin (float, optional): margin added to each side of the
+                bounding box, relative to its extent, so that small motions
+                do not force a new keyframe. Defaults to 0.1.
+        """
+        self.keyframe_interval = keyframe_interval
+        self.bbox_margin = bbox_margin
+        self.reset()
+
+    def reset(self) -> None:
+        """Forget the previous frames, the next frame will be a keyframe."""
+        self.origin: Optional[np.ndarray] = None
+        self.step: Optional[np.ndarray] = None
+        self.prev_q: Optional[np.ndarray] = None
+        self.n_since_keyframe = 0
+
+    def _fit_bbox(self, verts: np.ndarray) -> None:
+        lower = verts.min(axis=0)
+        upper = verts.max(axis=0)
+        if self.origin is not None:
+            lower = np.minimum(lower, self.origin)
+            upper = np.maximum(upper, self.origin + self.step * self.N_LEVELS)
+
+        margin = (upper - lower) * self.bbox_margin
+        # avoid a degenerated box on flat meshes
+        margin = np.maximum(margin, 1e-6)
+        lower = lower - margin
+        upper = upper + margin
+
+        self.origin = lower.astype(np.float64)
+        self.step = ((upper - lower) / self.N_LEVELS).astype(np.float64)
+
+    def _quantize(self, verts: np.ndarray) -> Optional[np.ndarray]:
+        q = np.rint((verts - self.origin) / self.step)
+        if q.min() < 0 or q.max() > self.N_LEVELS:
+            return None
+        return q.astype(np.int32)
+
+    def encode(self, verts: np.ndarray) -> Dict[str, Any]:
+        """Encode the vertices of a frame.
+
+        Args:
+            verts (np.ndarray): vertex coordinates, shape: [n_verts, 3].
+
+        Returns:
+            Dict[str, Any]: the encoded frame.
+        """
+        q = None
+        if self.prev_q is not None and \
+                self.prev_q.shape == verts.shape and \
+                self.n_since_keyframe < self.keyframe_interval:
+            q = self._quantize(verts)
+
+        if q is not None:
+            delta = q - self.prev_q
+            max_delta = np.abs(delta).max() if delta.size > 0 else 0
+            if max_delta <= np.iinfo(np.int8).max:
+                delta = delta.astype(np.int8)
+            elif max_delta <= np.iinfo(np.int16).max:
+                delta = delta.astype(np.int16)
+            else:
+                delta = None
+
+            if delta is not None:
+                self.prev_q = q
+                self.n_since_keyframe += 1
+                return {
+                    'encoding': VertexEncodingEnum.QUANTIZED_DELTA.value,
+                    'kind': 'delta',
+                    'q': pack_ndarray(delta),
+                }
+
+        # keyframe
+        if self.prev_q is None or self.prev_q.shape != verts.shape:
+            self.origin = None
+        q = None if self.origin is None else self._quantize(verts)
+        if q is None:
+            self._fit_bbox(verts)
+            q = self._quantize(verts)
+
+        self.prev_q = q
+        self.n_since_keyframe = 0
+        return {
+            'encoding': VertexEncodingEnum.QUANTIZED_DELTA.value,
+            'kind': 'key',
+            'origin': self.origin.tolist(),
+            'step': self.step.tolist(),
+            'q': pack_ndarray(q.astype(np.uint16)),
+        }
+
+
+class QuantizedDeltaDecoder:
+    """Decode frames encoded by `QuantizedDeltaEncoder`, which must be fed
+    in the order they are encoded."""
+
+    def __init__(self) -> None:
+        self.origin: Optional[np.ndarray] = None
+        self.step: Optional[np.ndarray] = None
+        self.q: Optional[np.ndarray] = None
+
+    def decode(self, encoded: Dict[str, Any]) -> np.ndarray:
+        """Decode a frame.
+
+        Args:
+            encoded (Dict[str, Any]): the encoded frame.
+
+        Raises:
+            ValueError: raises when a delta arrives before any keyframe.
+
+        Returns:
+            np.ndarray: float32 vertex coordinates, shape: [n_verts, 3].
+        """
+        q = unpack_ndarray(encoded['q'])
+        if encoded['kind'] == 'key':
+            self.origin = np.asarray(encoded['origin'], dtype=np.float64)
+            self.step = np.asarray(encoded['step'], dtype=np.float64)
+            self.q = q.astype(np.int32)
+        else:
+            if self.q is None:
+                raise ValueError('Received a delta frame before any keyframe')
+            self.q = self.q + q
+
+        return (self.origin + self.q * self.step).astype(np.float32)
@@ -0,0 +1,417 @@
+import asyncio
+import time
+from collections import deque
+from enum import Enum
+from typing import Any, Callable, Deque, Dict, Optional, Tuple
+
+import umsgpack
+from tornado.websocket import WebSocketClientConnection, websocket_connect
+
+from ..actions import PipelineActionsEnum, ViewerActionsEnum
+from ..utils import StageMetrics
+
+
+class ViewerMetricEnum(str, Enum):
+    # time between two frames received
+    FRAME_INTERVAL = 'frame_interval'
+    # time the playback waits for a frame that is due, while playing
+    STALL = 'stall'
+    # from a seek until the requested frame is received
+    SEEK_TO_FIRST_FRAME = 'seek_to_first_frame'
+    # round trip of a heart check
+    HEART_CHECK = 'heart_check'
+
+
+class HeadlessViewer:
+    """A viewer without rendering, speaking the websocket protocol of the
+    browser viewer, for the benchmarks and load tests.
+
+    The frames are buffered as by `StreamedVertexBuffer`: they are played at
+    `playback_fps`, a frame received once `buffer_size` frames are buffered
+    or the end of the sequence is buffered is dropped and closes the buffer,
+    which is opened again at the frame following the buffered ones. Once
+    the last frame is played, the playback rolls back to the first frame.
+    The frames timestamped by the playback clock of the pipeline are played
+    at their timestamps instead, and the last buffered frame is held in
+    place of the frames skipped by the pipeline. Only the indices and
+    timestamps of the frames are kept, `on_frame` is called with every frame
+    received.
+
+    The durations experienced by the viewer, see `ViewerMetricEnum`, are
+    recorded in `self.metrics`, which may be shared by several viewers.
+    """
+
+    # bytes of the stream data sent at once, as the browser viewer
+    UPLOAD_CHUNK_SIZE = 4 * 1024 * 1024
+
+    def __init__(self,
+                 url: str,
+                 buffer_size: int = 256,
+                 playback_fps: Optional[float] = 30.0,
+                 on_frame: Optional[Callable[[Dict[str, Any], int, float],
+                                             None]] = None,
+                 metrics: Optional[StageMetrics] = None) -> None:
+        """
+        Args:
+            url (str): url of the websocket server, e.g.
+                'ws://127.0.0.1:4567/session/alice'.
+            buffer_size (int, optional): maximum number of buffered frames,
+                as `StreamedVertexBuffer.max_buffer_size`. Defaults to 256.
+            playback_fps (Optional[float], optional): rate at which the
+                buffered frames are played. None plays the frames as soon as
+                they are received. Defaults to 30.0.
+            on_frame (Optional[Callable[[Dict[str, Any], int, float], None]],
+                optional): called with the data of each frame received, the
+                size of its message in bytes and the time it was received,
+                as returned by `time.perf_counter`. Defaults to None.
+            metrics (Optional[StageMetrics], optional): histograms recording
+                the durations experienced by the viewer. None creates them.
+                Defaults to None.
+        """
+        self.url = url
+        self.buffer_size = buffer_size
+        self.playback_fps = playback_fps
+        self.on_frame = on_frame
+        self.metrics = StageMetrics() if metrics is None else metrics
+        self.ws: Optional[WebSocketClientConnection] = None
+        # read of the next message, kept across timeouts so that no message
+        # is lost
+        self.pending_read: Optional[asyncio.Future] = None
+        # whether the websocket server closed the connection
+        self.is_closed = False
+        self.close_code: Optional[int] = None
+
+        # number of frames of the sequence, 0 until the stream data is loaded
+        self.n_frames = 0
+        # index of the next frame to play
+        self.head_frame_idx = 0
+        # indices and timestamps of the buffered frames, the timestamps are
+        # None unless the pipeline plays the frames on its clock
+        self.buffer: Deque[Tuple[int, Optional[float]]] = deque()
+        self.is_buffer_open = True
+        # time the head frame is due, None until the first frame is received
+        # after a seek
+        self.play_time: Optional[float] = None
+        # time the timestamp 0 is due, for the timestamped frames
+        self.clock_origin: Optional[float] = None
+        self.is_paused = False
+        # frame requested by the last seek, until it is received
+        self.seek_frame_idx: Optional[int] = None
+        self.seek_time = 0.0
+        self.heart_check_time: Optional[float] = None
+        self.receive_time: Optional[float] = None
+        # interarrival jitter of the frames in seconds, estimated as in
+        # RFC 3550
+        self.jitter = 0.0
+        self.frame_interval: Optional[float] = None
+
+        self.n_received_frames = 0
+        self.n_received_bytes = 0
+        # frames received while another frame was expected
+        self.n_unexpected_frames = 0
+        # frames received while the buffer was full, which are dropped
+        self.n_overflowed_frames = 0
+        # frames skipped by the playback clock of the pipeline
+        self.n_skipped_frames = 0
+        self.n_played_frames = 0
+        self.n_sent_messages = 0
+
+    async def connect(self, timeout: float = 10.0) -> None:
+        """Connect to the websocket server, waiting until it accepts the
+        connections, and reply to the handshake with raw vertices only.
+
+        Args:
+            timeout (float, optional): maximum time in seconds to wait for
+                the websocket server. Defaults to 10.0.
+        """
+        deadline = time.time() + timeout
+        while True:
+            try:
+                self.ws = await websocket_connect(
+                    self.url, max_message_size=2**31)
+                break
+            except OSError:
+                if time.time() > deadline:
+                    raise
+                await asyncio.sleep(0.05)
+        await self.send(ViewerActionsEnum.CONFIRM_WEBSOCKET_CONNECTED,
+                        {'vertex_encodings': []})
+
+    def close(self) -> None:
+        if self.ws is not None:
+            self.ws.close()
+            self.ws = None
+
+    async def send(self, msg_type: str, msg_data: Any) -> None:
+        self.n_sent_messages += 1
+        await self.ws.write_message(
+            umsgpack.packb({
+                'type': msg_type,
+                'data': msg_data
+            }), binary=True)
+
+    def reset_buffer(self, frame_idx: int) -> None:
+        self.buffer.clear()
+        self.head_frame_idx = frame_idx
+        self.is_buffer_open = True
+        self.play_time = None
+        self.clock_origin = None
+        self.seek_frame_idx = frame_idx
+        self.seek_time = time.perf_counter()
+
+    async def upload(self, stream_data: bytes) -> None:
+        """Upload stream data in chunks of `UPLOAD_CHUNK_SIZE` bytes, as
+        the browser viewer.
+
+        Args:
+            stream_data (bytes): the stream data.
+        """
+        self.reset_buffer(0)
+        # the first frame is recorded as the end of a seek otherwise
+        self.seek_frame_idx = None
+        self.n_frames = 0
+        await self.send(ViewerActionsEnum.UPLOAD_STREAM_DATA_BEGIN,
+                        {'size': len(stream_data)})
+        for offset in range(0, len(stream_data), self.UPLOAD_CHUNK_SIZE):
+            await self.send(
+                ViewerActionsEnum.UPLOAD_STREAM_DATA_CHUNK,
+                stream_data[offset:offset + self.UPLOAD_CHUNK_SIZE])
+        await self.send(ViewerActionsEnum.UPLOAD_STREAM_DATA_END, None)
+
+    async def seek(self, frame_idx: int) -> None:
+        """Clear the buffer and request the frames from `frame_idx`.
+
+        Args:
+            frame_idx (int): index of the frame.
+        """
+        self.reset_buffer(frame_idx)
+        await self.send(ViewerActionsEnum.UPDATE_IS_BUFFER_OPEN, True)
+        await self.send(ViewerActionsEnum.UPDATE_BUFFER_FRAME_INDEX, frame_idx)
+
+    def pause(self) -> None:
+        """Stop playing the frames, the buffer closes once full."""
+        self.is_paused = True
+
+    def resume(self) -> None:
+        self.is_paused = False
+        now = time.perf_counter()
+        if self.play_time is not None:
+            self.play_time = now
+        if len(self.buffer) > 0 and self.buffer[0][1] is not None:
+            self.clock_origin = now - self.buffer[0][1]
+
+    async def heart_check(self) -> None:
+        """Check the connection, the round trip is recorded when the
+        reply is received."""
+        self.heart_check_time = time.perf_counter()
+        await self.send(ViewerActionsEnum.HEART_CHECK, 'ping')
+
+    def is_pushable(self) -> bool:
+        """Whether the buffer has room for the next frame of the sequence,
+        as `StreamedVertexBuffer.isPushable`."""
+        return len(self.buffer) < self.buffer_size and \
+            self.head_frame_idx + len(self.buffer) < self.n_frames
+
+    async def receive(self,
+                      timeout: Optional[float] = None
+                      ) -> Optional[Dict[str, Any]]:
+        """Receive the next message, playing the frames due meanwhile.
+
+        Args:
+            timeout (Optional[float], optional): maximum time in seconds to
+                wait for the message. None waits until a message is received.
+                Defaults to None.
+
+        Returns:
+            Optional[Dict[str, Any]]: the unpacked message, None once the
+                connection is closed.
+
+        Raises:
+            asyncio.TimeoutError: raises when no message is received in
+                time, the next call receives it.
+        """
+        if self.pending_read is None:
+            self.pending_read = asyncio.ensure_future(self.ws.read_message())
+        done, _ = await asyncio.wait([self.pending_read], timeout=timeout)
+        if len(done) == 0:
+            raise asyncio.TimeoutError()
+        message = self.pending_read.result()
+        self.pending_read = None
+        if message is None:
+            self.is_closed = True
+            self.close_code = self.ws.close_code
+            return None
+        receive_time = time.perf_counter()
+        msg = umsgpack.unpackb(message)
+        if msg['type'] == PipelineActionsEnum.UPDATE_NUM_FRAMES:
+            self.n_frames = msg['data']
+        elif msg['type'] == ViewerActionsEnum.HEART_CHECK and \
+                self.heart_check_time is not None:
+            self.metrics.observe(ViewerMetricEnum.HEART_CHECK,
+                                 receive_time - self.heart_check_time)
+            self.heart_check_time = None
+        elif msg['type'] == PipelineActionsEnum.UPDATE_MESH_VERTICES:
+            self.n_received_frames += 1
+            self.n_received_bytes += len(message)
+            self.record_interval(receive_time)
+            if self.on_frame is not None:
+                self.on_frame(msg['data'], len(message), receive_time)
+            await self.buffer_frame(msg['data']['frame_idx'],
+                                    msg['data'].get('timestamp'),
+                                    msg['data'].get('skipped', False))
+        await self.play()
+
+        return msg
+
+    def record_interval(self, receive_time: float) -> None:
+        """Record the time since the previous frame and update the
+        jitter."""
+        if self.receive_time is not None:
+            interval = receive_time - self.receive_time
+            self.metrics.observe(ViewerMetricEnum.FRAME_INTERVAL, interval)
+            if self.frame_interval is not None:
+                diff = abs(interval - self.frame_interval)
+                self.jitter += (diff - self.jitter) / 16
+            self.frame_interval = interval
+        self.receive_time = receive_time
+
+    async def overflow(self) -> None:
+        """Drop a frame received while the buffer is full, and close the
+        buffer."""
+        self.n_overflowed_frames += 1
+        if self.is_buffer_open:
+            self.is_buffer_open = False
+            await self.send(ViewerActionsEnum.UPDATE_IS_BUFFER_OPEN, False)
+
+    def hold_skipped_frames(self, frame_idx: int,
+                            timestamp: Optional[float]) -> None:
+        """Buffer the last buffered frame in place of the frames skipped
+        by the pipeline before a frame, as many as the buffer has room
+        for, or move the head to the frame if the buffer is empty."""
+        expected_frame_idx = self.head_frame_idx + len(self.buffer)
+        n_skipped = frame_idx - expected_frame_idx
+        self.n_skipped_frames += n_skipped
+        if len(self.buffer) == 0:
+            self.head_frame_idx = frame_idx
+            return
+        tail_timestamp = self.buffer[-1][1]
+        for i in range(1, n_skipped + 1):
+            if not self.is_pushable():
+                return
+            hold_timestamp = None
+            if timestamp is not None and tail_timestamp is not None:
+                hold_timestamp = tail_timestamp + \
+                    (timestamp - tail_timestamp) * i / (n_skipped + 1)
+            self.buffer.append((expected_frame_idx + i - 1, hold_timestamp))
+
+    async def buffer_frame(self,
+                           frame_idx: int,
+                           timestamp: Optional[float] = None,
+                           skipped: bool = False) -> None:
+        """Buffer a frame, or drop it and close the buffer if it is full.
+
+        Args:
+            frame_idx (int): index of the frame.
+            timestamp (Optional[float], optional): time of the frame in
+                seconds, set by the playback clock of the pipeline. Defaults
+                to None.
+            skipped (bool, optional): whether the pipeline skipped the frames
+                preceding this one. Defaults to False.
+        """
+        if not self.is_pushable():
+            await self.overflow()
+            return
+
+        expected_frame_idx = self.head_frame_idx + len(self.buffer)
+        if skipped and frame_idx > expected_frame_idx:
+            self.hold_skipped_frames(frame_idx, timestamp)
+            if not self.is_pushable():
+                await self.overflow()
+                return
+            expected_frame_idx = self.head_frame_idx + len(self.buffer)
+        if frame_idx != expected_frame_idx:
+            self.n_unexpected_frames += 1
+            diff = expected_frame_idx - frame_idx
+            if diff < 0 or diff > 10:
+                # rollback, as the browser viewer
+                await self.send(ViewerActionsEnum.UPDATE_BUFFER_FRAME_INDEX,
+                                expected_frame_idx)
+            return
+
+        now = time.perf_counter()
+        if self.seek_frame_idx == frame_idx:
+            self.metrics.observe(ViewerMetricEnum.SEEK_TO_FIRST_FRAME,
+                                 now - self.seek_time)
+            self.seek_frame_idx = None
+        if timestamp is not None:
+            if self.clock_origin is None:
+                self.clock_origin = now - timestamp
+            elif len(self.buffer) == 0 and \
+                    now > self.clock_origin + timestamp:
+                # the frame was due already
+                if not self.is_paused:
+                    self.metrics.observe(ViewerMetricEnum.STALL,
+                                         now - self.clock_origin - timestamp)
+                self.clock_origin = now - timestamp
+        elif self.play_time is None or self.playback_fps is None:
+            self.play_time = now
+        elif len(self.buffer) == 0 and now > self.play_time:
+            # the frame was due already
+            if not self.is_paused:
+                self.metrics.observe(ViewerMetricEnum.STALL,
+                                     now - self.play_time)
+            self.play_time = now
+        self.buffer.append((frame_idx, timestamp))
+
+    def get_due_time(self) -> Optional[float]:
+        """Time the head frame is due, None if the buffer is empty."""
+        if len(self.buffer) == 0:
+            return None
+        timestamp = self.buffer[0][1]
+        if timestamp is not None and self.clock_origin is not None:
+            return self.clock_origin + timestamp
+        return self.play_time
+
+    async def play(self) -> None:
+        """Play the buffered frames that are due, opening the buffer again
+        once it has room, and rolling back to the first frame at the end of
+        the sequence."""
+        now = time.perf_counter()
+        while not self.is_paused and len(self.buffer) > 0 and \
+                now >= self.get_due_time():
+            _, timestamp = self.buffer.popleft()
+            self.head_frame_idx += 1
+            self.n_played_frames += 1
+            if timestamp is None and self.playback_fps is not None:
+                self.play_time += 1 / self.playback_fps
+
+        if self.n_frames > 0 and self.head_frame_idx >= self.n_frames:
+            await self.seek(0)
+        elif not self.is_buffer_open and self.is_pushable():
+            self.is_buffer_open = True
+            await self.send(ViewerActionsEnum.UPDATE_IS_BUFFER_OPEN, True)
+            await self.send(ViewerActionsEnum.UPDATE_BUFFER_FRAME_INDEX,
+                            self.head_frame_idx + len(self.buffer))
+
+    async def run(self, duration: float) -> None:
+        """Receive and play the frames for a while.
+
+        Args:
+            duration (float): time in seconds.
+        """
+        deadline = time.perf_counter() + duration
+        while True:
+            timeout = deadline - time.perf_counter()
+            if timeout <= 0:
+                return
+            due_time = self.get_due_time()
+            if due_time is not None and not self.is_paused:
+                # wake up when the head frame is due
+                timeout = min(timeout, max(due_time - time.perf_counter(), 0))
+            try:
+                msg = await self.receive(timeout)
+            except asyncio.TimeoutError:
+                await self.play()
+                continue
+            if msg is None:
+                return
@@ -0,0 +1,471 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from typing import Any, Dict, List, Optional, Union
+
+import numpy as np
+from tornado.httpclient import AsyncHTTPClient, HTTPClientError
+from tornado.websocket import WebSocketClosedError
+
+from ..utils import Histogram, StageMetrics
+from .headless_viewer import HeadlessViewer, ViewerMetricEnum
+
+# behavior of the simulated viewers, the intervals are the mean time in
+# seconds between two actions, drawn from an exponential distribution, and
+# None disables the action
+DEFAULT_BEHAVIOR = {
+    # rate at which the frames are played
+    'playback_fps': 30.0,
+    # maximum number of buffered frames
+    'buffer_size': 256,
+    # whether the viewer uploads the stream data once connected, otherwise
+    # it plays the stream data already loaded in its session
+    'upload': True,
+    # seeks to a random frame
+    'seek_interval': None,
+    # pauses of `pause_duration` seconds, during which the buffer fills up
+    # and closes
+    'pause_interval': None,
+    'pause_duration': 5.0,
+    # heart checks, at a fixed interval
+    'heart_check_interval': 5.0,
+    # disconnections, the viewer connects again at once
+    'reconnect_interval': None,
+}
+
+BEHAVIORS = {
+    # plays the sequence in a loop
+    'watch': {},
+    # seeks every few seconds
+    'scrub': {
+        'seek_interval': 5.0
+    },
+    # pauses regularly
+    'pause': {
+        'pause_interval': 20.0,
+        'pause_duration': 10.0
+    },
+    # disconnects regularly
+    'churn': {
+        'reconnect_interval': 30.0
+    },
+    # a bit of everything, for long soaks
+    'mixed': {
+        'seek_interval': 15.0,
+        'pause_interval': 60.0,
+        'pause_duration': 10.0,
+        'reconnect_interval': 300.0
+    },
+}
+
+
+def load_behavior(behavior: str) -> Dict[str, Any]:
+    """Load the behavior of the simulated viewers.
+
+    Args:
+        behavior (str): name of a behavior in `BEHAVIORS`, or path to a json
+            file overriding the keys of `DEFAULT_BEHAVIOR`.
+
+    Raises:
+        ValueError: raises when the behavior is unknown or has unknown keys.
+
+    Returns:
+        Dict[str, Any]: the behavior.
+    """
+    if behavior in BEHAVIORS:
+        overrides = BEHAVIORS[behavior]
+    elif os.path.isfile(behavior):
+        with open(behavior) as f:
+            overrides = json.load(f)
+    else:
+        raise ValueError(f'unknown behavior {behavior}, expected one of '
+                         f'{list(BEHAVIORS)} or a json file')
+    unknown_keys = set(overrides) - set(DEFAULT_BEHAVIOR)
+    if len(unknown_keys) > 0:
+        raise ValueError(f'unknown keys in the behavior: {unknown_keys}')
+
+    return {**DEFAULT_BEHAVIOR, **overrides}
+
+
+def summarize(histogram: Histogram) -> Dict[str, Optional[float]]:
+    """Count, total and quantiles in milliseconds of a histogram."""
+    quantiles = {
+        f'p{round(q * 100)}_ms': None if value is None else value * 1000
+        for q, value in ((q, histogram.quantile(q)) for q in (0.5, 0.9, 0.99))
+    }
+    return {
+        'count': histogram.count,
+        'total_s': histogram.sum,
+        **quantiles,
+    }
+
+
+def subtract(histogram: Dict[str, Any],
+             previous: Optional[Dict[str, Any]]) -> Histogram:
+    """Histogram of the durations observed since a previous snapshot."""
+    result = Histogram.from_dict(histogram)
+    if previous is not None:
+        result.counts = [
+            count - previous_count
+            for count, previous_count in zip(result.counts, previous['counts'])
+        ]
+        result.count -= previous['count']
+        result.sum -= previous['sum']
+    return result
+
+
+class LoadGenerator:
+    """Drive simulated viewers against a running websocket server, and
+    report what they experience over time: frame rate, jitter, stalls, seek
+    latency and heart check round trips, along with the memory of the
+    websocket server read from its /metrics route.
+
+    Each viewer follows the same behavior, see `DEFAULT_BEHAVIOR`, with its
+    own random schedule.
+    """
+
+    def __init__(self,
+                 websocket_url: str,
+                 n_viewers: int,
+                 behavior: Dict[str, Any],
+                 stream_data: Optional[bytes] = None,
+                 session_mode: str = 'per_viewer',
+                 metrics_url: Optional[str] = None,
+                 logger: Union[None, str, logging.Logger] = None,
+                 seed: int = 0) -> None:
+        """
+        Args:
+            websocket_url (str): url of the websocket server, e.g.
+                'ws://127.0.0.1:4567'.
+            n_viewers (int): number of simulated viewers.
+            behavior (Dict[str, Any]): behavior of the viewers, see
+                `load_behavior`.
+            stream_data (Optional[bytes], optional): stream data uploaded
+                by the viewers whose behavior uploads. Defaults to None.
+            session_mode (str, optional): 'per_viewer' opens a session for
+                each viewer, which requires as many pipeline workers,
+                whereas 'shared' attaches every viewer to the default
+                session, which requires `max_viewers` as large, and only the
+                first viewer uploads. Defaults to 'per_viewer'.
+            metrics_url (Optional[str], optional): url of the /metrics
+                route of the websocket server. None does not record its
+                memory. Defaults to None.
+            logger (Union[None, str, logging.Logger], optional): Logger for
+                logging. Defaults to None.
+            seed (int, optional): seed of the schedules of the viewers.
+                Defaults to 0.
+
+        Raises:
+            ValueError: raises when the session mode is unknown.
+        """
+        if session_mode not in ('per_viewer', 'shared'):
+            raise ValueError(f'unknown session mode {session_mode}')
+        self.websocket_url = websocket_url.rstrip('/')
+        self.n_viewers = n_viewers
+        self.behavior = behavior
+        self.stream_data = stream_data
+        self.session_mode = session_mode
+        self.metrics_url = metrics_url
+        if logger is None or isinstance(logger, str):
+            self.logger = logging.getLogger(logger)
+        else:
+            self.logger = logger
+        self.seed = seed
+
+        # shared by the viewers
+        self.metrics = StageMetrics()
+        self.viewers: Dict[int, HeadlessViewer] = {}
+        # counters of the viewers that disconnected
+        self.n_closed_frames = 0
+        self.n_closed_played_frames = 0
+        self.n_closed_bytes = 0
+        self.n_closed_unexpected_frames = 0
+        self.n_closed_viewers = 0
+        self.closed_jitter_sum = 0.0
+        self.n_connections = 0
+        self.n_connect_errors = 0
+        self.n_disconnects = 0
+        # (elapsed time, resident memory in bytes) of the websocket server
+        self.memory: List[List[float]] = []
+
+    def get_url(self, viewer_idx: int) -> str:
+        if self.session_mode == 'shared':
+            return f'{self.websocket_url}/'
+        return f'{self.websocket_url}/session/load-{viewer_idx}'
+
+    def is_uploader(self, viewer_idx: int) -> bool:
+        """Whether the viewer uploads the stream data, only the first one
+        does in a shared session."""
+        return self.behavior['upload'] and self.stream_data is not None and \
+            (self.session_mode == 'per_viewer' or viewer_idx == 0)
+
+    def close_viewer(self, viewer_idx: int) -> None:
+        viewer = self.viewers.pop(viewer_idx, None)
+        if viewer is None:
+            return
+        self.n_closed_frames += viewer.n_received_frames
+        self.n_closed_played_frames += viewer.n_played_frames
+        self.n_closed_bytes += viewer.n_received_bytes
+        self.n_closed_unexpected_frames += viewer.n_unexpected_frames
+        self.n_closed_viewers += 1
+        self.closed_jitter_sum += viewer.jitter
+        viewer.close()
+
+    def next_time(self, rng: np.random.Generator, key: str) -> Optional[float]:
+        """Time of the next action, None if disabled."""
+        interval = self.behavior[key]
+        if interval is None:
+            return None
+        if key == 'heart_check_interval':
+            return time.perf_counter() + interval
+        return time.perf_counter() + rng.exponential(interval)
+
+    async def follow(self, viewer: HeadlessViewer, rng: np.random.Generator,
+                     deadline: float) -> None:
+        """Play the frames and act on the schedule of the behavior until the
+        deadline, the scheduled reconnection or the viewer is
+        disconnected."""
+        schedule = {
+            key: self.next_time(rng, key)
+            for key in ('seek_interval', 'pause_interval',
+                        'heart_check_interval', 'reconnect_interval')
+        }
+        resume_time = None
+        while True:
+            times = [t for t in schedule.values() if t is not None]
+            if resume_time is not None:
+                times.append(resume_time)
+            await viewer.run(min(times + [deadline]) - time.perf_counter())
+            now = time.perf_counter()
+            if viewer.is_closed or now >= deadline:
+                return
+            if schedule['reconnect_interval'] is not None and \
+                    now >= schedule['reconnect_interval']:
+                return
+            if resume_time is not None and now >= resume_time:
+                viewer.resume()
+                resume_time = None
+            if schedule['seek_interval'] is not None and \
+                    now >= schedule['seek_interval']:
+                if viewer.n_frames > 0:
+                    await viewer.seek(int(rng.integers(viewer.n_frames)))
+                schedule['seek_interval'] = self.next_time(
+                    rng, 'seek_interval')
+            if schedule['pause_interval'] is not None and \
+                    now >= schedule['pause_interval']:
+                viewer.pause()
+                resume_time = now + self.behavior['pause_duration']
+                schedule['pause_interval'] = self.next_time(
+                    rng, 'pause_interval') + self.behavior['pause_duration']
+            if schedule['heart_check_interval'] is not None and \
+                    now >= schedule['heart_check_interval']:
+                await viewer.heart_check()
+                schedule['heart_check_interval'] = self.next_time(
+                    rng, 'heart_check_interval')
+
+    async def drive(self, viewer_idx: int, deadline: float) -> None:
+        """Drive a viewer until the deadline, connecting it again whenever
+        it is disconnected."""
+        rng = np.random.default_rng(self.seed + viewer_idx)
+        while time.perf_counter() < deadline:
+            viewer = HeadlessViewer(
+                self.get_url(viewer_idx),
+                buffer_size=self.behavior['buffer_size'],
+                playback_fps=self.behavior['playback_fps'],
+                metrics=self.metrics)
+            try:
+                await viewer.connect(
+                    timeout=min(10, deadline - time.perf_counter()))
+            except (OSError, HTTPClientError) as error:
+                self.n_connect_errors += 1
+                self.logger.warning(
+                    f'Viewer {viewer_idx} failed to connect: {error}')
+                await asyncio.sleep(1)
+                continue
+            self.viewers[viewer_idx] = viewer
+            self.n_connections += 1
+            try:
+                if self.is_uploader(viewer_idx):
+                    await viewer.upload(self.stream_data)
+                await self.follow(viewer, rng, deadline)
+            except WebSocketClosedError:
+                viewer.is_closed = True
+            if viewer.is_closed:
+                self.n_disconnects += 1
+                self.logger.warning(
+                    f'Viewer {viewer_idx} was disconnected, close code '
+                    f'{viewer.close_code}.')
+                self.close_viewer(viewer_idx)
+                # back off before connecting again
+                await asyncio.sleep(1)
+                continue
+            if time.perf_counter() >= deadline:
+                # closed by `run` once the summary is taken
+                return
+            self.close_viewer(viewer_idx)
+
+    async def read_memory(self) -> Optional[int]:
+        """Read the resident memory of the websocket server from its
+        /metrics route."""
+        if self.metrics_url is None:
+            return None
+        try:
+            response = await AsyncHTTPClient().fetch(
+                self.metrics_url, request_timeout=5)
+        except Exception as error:
+            self.logger.warning(f'Failed to read the metrics: {error}')
+            return None
+        for line in response.body.decode('utf-8').splitlines():
+            if line.startswith('process_resident_memory_bytes '):
+                return int(float(line.split()[1]))
+        return None
+
+    def snapshot(self,
+                 elapsed: float,
+                 interval: float,
+                 previous: Dict[str, Any],
+                 include_closed: bool = False) -> Dict[str, Any]:
+        """Report what the viewers experienced since the previous snapshot.
+
+        Args:
+            elapsed (float): time in seconds since the start.
+            interval (float): time in seconds since the previous snapshot.
+            previous (Dict[str, Any]): counters and histograms of the
+                previous snapshot, updated in place.
+            include_closed (bool, optional): whether the jitter is averaged
+                over the viewers disconnected meanwhile too, instead of the
+                connected ones only. Defaults to False.
+
+        Returns:
+            Dict[str, Any]: the report.
+        """
+        viewers = list(self.viewers.values())
+        n_frames = self.n_closed_frames + sum(viewer.n_received_frames
+                                              for viewer in viewers)
+        n_played_frames = self.n_closed_played_frames + sum(
+            viewer.n_played_frames for viewer in viewers)
+        n_bytes = self.n_closed_bytes + sum(viewer.n_received_bytes
+                                            for viewer in viewers)
+        jitter_sum = sum(viewer.jitter for viewer in viewers)
+        n_jitters = len(viewers)
+        if include_closed:
+            jitter_sum += self.closed_jitter_sum
+            n_jitters += self.n_closed_viewers
+        histograms = self.metrics.snapshot()
+        report = {
+            'elapsed_s':
+            elapsed,
+            'n_connected_viewers':
+            len(viewers),
+            'fps': (n_frames - previous.get('n_frames', 0)) / interval,
+            'played_fps':
+            (n_played_frames - previous.get('n_played_frames', 0)) / interval,
+            'mb_per_s':
+            (n_bytes - previous.get('n_bytes', 0)) / interval / 1e6,
+            'jitter_ms':
+            jitter_sum / n_jitters * 1000 if n_jitters > 0 else None,
+            'n_unexpected_frames':
+            self.n_closed_unexpected_frames + sum(viewer.n_unexpected_frames
+                                                  for viewer in viewers),
+            'n_connections':
+            self.n_connections,
+            'n_connect_errors':
+            self.n_connect_errors,
+            'n_disconnects':
+            self.n_disconnects,
+        }
+        for metric in ViewerMetricEnum:
+            histogram = histograms.get(metric.value)
+            if histogram is None:
+                report[metric.value] = summarize(Histogram())
+                continue
+            report[metric.value] = summarize(
+                subtract(histogram, previous.get(metric.value)))
+            previous[metric.value] = histogram
+        previous['n_frames'] = n_frames
+        previous['n_played_frames'] = n_played_frames
+        previous['n_bytes'] = n_bytes
+
+        return report
+
+    def memory_growth(self) -> Optional[float]:
+        """Growth of the memory of the websocket server in MiB per hour,
+        fitted over the samples, None without enough samples."""
+        if len(self.memory) < 2:
+            return None
+        elapsed, rss = np.array(self.memory).T
+        if elapsed[-1] == elapsed[0]:
+            return None
+        slope = np.polyfit(elapsed, rss, 1)[0]
+        return float(slope * 3600 / 2**20)
+
+    async def run(self,
+                  duration: float,
+                  report_interval: float = 60.0) -> Dict[str, Any]:
+        """Drive the viewers for a while, logging a report at every interval.
+
+        Args:
+            duration (float): time in seconds.
+            report_interval (float, optional): time in seconds between two
+                reports. Defaults to 60.0.
+
+        Returns:
+            Dict[str, Any]: the reports of every interval and a summary of
+                the whole run.
+        """
+        begin = time.perf_counter()
+        deadline = begin + duration
+        drivers = [
+            asyncio.ensure_future(self.drive(viewer_idx, deadline))
+            for viewer_idx in range(self.n_viewers)
+        ]
+
+        reports = []
+        previous: Dict[str, Any] = {}
+        report_time = begin
+        while time.perf_counter() < deadline:
+            await asyncio.sleep(
+                min(report_interval, deadline - time.perf_counter()))
+            now = time.perf_counter()
+            report = self.snapshot(now - begin, now - report_time, previous)
+            report_time = now
+            rss = await self.read_memory()
+            report['server_rss_mb'] = None if rss is None else rss / 2**20
+            if rss is not None:
+                self.memory.append([now - begin, rss])
+            reports.append(report)
+            self.log_report(report)
+
+        await asyncio.gather(*drivers)
+        # the viewers are still connected at the deadline
+        elapsed = time.perf_counter() - begin
+        summary = self.snapshot(elapsed, elapsed, {}, include_closed=True)
+        summary['server_rss_growth_mb_per_hour'] = self.memory_growth()
+        for viewer_idx in list(self.viewers):
+            self.close_viewer(viewer_idx)
+        return {
+            'behavior': self.behavior,
+            'n_viewers': self.n_viewers,
+            'session_mode': self.session_mode,
+            'reports': reports,
+            'summary': summary,
+        }
+
+    def log_report(self, report: Dict[str, Any]) -> None:
+        stall = report[ViewerMetricEnum.STALL.value]
+        seek = report[ViewerMetricEnum.SEEK_TO_FIRST_FRAME.value]
+        msg = f"[LoadGenerator] {report['elapsed_s']:.0f} s, " \
+            f"{report['n_connected_viewers']} viewers, " \
+            f"{report['fps']:.1f} fps received, " \
+            f"{report['played_fps']:.1f} fps played, " \
+            f"{report['n_disconnects']} disconnects, " \
+            f"{stall['count']} stalls ({stall['total_s']:.2f} s)"
+        if report['jitter_ms'] is not None:
+            msg += f", jitter {report['jitter_ms']:.1f} ms"
+        if seek['count'] > 0:
+            msg += f", seek to first frame p50 {seek['p50_ms']:.0f} ms"
+        if report.get('server_rss_mb') is not None:
+            msg += f", server rss {report['server_rss_mb']:.0f} MiB"
+        self.logger.info(msg)
@@ -0,0 +1,123 @@
+from collections import deque
+from enum import Enum
+from typing import Any, Deque, Dict, Optional, Tuple
+
+import tornado.locks
+
+
+class SendPolicyEnum(str, Enum):
+    # stop acknowledging the pipeline until the queue has room again
+    BLOCK = 'block'
+    # drop the oldest queued frame to make room for the new one
+    DROP_OLDEST = 'drop_oldest'
+    # only keep the latest queued frame
+    COALESCE = 'coalesce'
+
+
+class SendQueue:
+    """Bounded queue of the messages waiting to be written to a viewer.
+
+    Only the frames can be dropped, the other messages, e.g. the faces, are
+    always delivered in order. What happens to the frames of a full queue
+    depends on the policy, see `SendPolicyEnum`. With the 'block' policy the
+    queue itself is not bounded, the websocket server is expected to pause
+    the pipeline while `is_full` is True.
+    """
+
+    def __init__(self,
+                 max_size: int,
+                 policy: str = SendPolicyEnum.BLOCK) -> None:
+        """
+        Args:
+            max_size (int): maximum number of queued messages.
+            policy (str, optional): what to do with the frames of a full
+                queue, see `SendPolicyEnum`. Defaults to 'block'.
+        """
+        self.max_size = max_size
+        self.policy = SendPolicyEnum(policy)
+        # (is_frame, message) pairs
+        self.items: Deque[Tuple[bool, Any]] = deque()
+        self.n_queued_frames = 0
+        self.n_sent = 0
+        self.n_dropped = 0
+        self.max_depth = 0
+        self.closed = False
+        self.condition = tornado.locks.Condition()
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def is_full(self) -> bool:
+        return len(self.items) >= self.max_size
+
+    def put(self, message: Any, is_frame: bool = False) -> None:
+        """Queue a message, dropping frames according to the policy.
+
+        Args:
+            message (Any): the message.
+            is_frame (bool, optional): whether the message is a frame,
+                which can be dropped. Defaults to False.
+        """
+        if self.closed:
+            return
+
+        if is_frame and self.policy == SendPolicyEnum.COALESCE:
+            self.drop_frames(self.n_queued_frames)
+        elif is_frame and self.policy == SendPolicyEnum.DROP_OLDEST and \
+                self.is_full():
+            self.drop_frames(1)
+
+        self.items.append((is_frame, message))
+        self.n_queued_frames += is_frame
+        self.max_depth = max(self.max_depth, len(self.items))
+        self.condition.notify()
+
+    def drop_frames(self, n_frames: int) -> None:
+        """Drop the oldest queued frames.
+
+        Args:
+            n_frames (int): number of frames to drop.
+        """
+        if n_frames <= 0 or self.n_queued_frames == 0:
+            return
+
+        kept = deque()
+        for is_frame, message in self.items:
+            if is_frame and n_frames > 0:
+                n_frames -= 1
+                self.n_queued_frames -= 1
+                self.n_dropped += 1
+            else:
+                kept.append((is_frame, message))
+        self.items = kept
+
+    async def get(self) -> Optional[Any]:
+        """Wait for the next message.
+
+        Returns:
+            Optional[Any]: the message, None once the queue is closed.
+        """
+        while len(self.items) == 0 and not self.closed:
+            await self.condition.wait()
+        if self.closed:
+            return None
+
+        is_frame, message = self.items.popleft()
+        self.n_queued_frames -= is_frame
+        self.n_sent += 1
+        return message
+
+    def close(self) -> None:
+        """Drop the queued messages and wake up the consumer."""
+        self.closed = True
+        self.items.clear()
+        self.n_queued_frames = 0
+        self.condition.notify_all()
+
+    def get_stats(self) -> Dict[str, int]:
+        return {
+            'depth': len(self.items),
+            'max_depth': self.max_depth,
+            'n_sent': self.n_sent,
+            'n_dropped': self.n_dropped,
+        }
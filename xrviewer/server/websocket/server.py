@@ -1,8 +1,11 @@
 import argparse
+import itertools
 import logging
-import pickle
+import tempfile
+import time
+from collections import deque
 from enum import Enum
-from typing import List, Optional, Tuple
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
 
 import tornado.gen
 import tornado.ioloop
@@ -13,11 +16,19 @@ import zmq
 from zmq.eventloop.zmqstream import ZMQStream
 
 from ..actions import PipelineActionsEnum, ViewerActionsEnum
-from .state import State, StreamBuffer
+from ..utils import StageEnum, StageMetrics, render_prometheus, unpack_ndarray
+from ..utils.metrics import read_rss, render_gauge
+from ..utils.vertex_encoding import QuantizedDeltaEncoder, VertexEncodingEnum
+from ..zmq.in_process import frame_references
+from ..zmq.shared_memory import SharedMemoryReader, TransportEnum
+from .send_queue import SendPolicyEnum, SendQueue
+from .state import PlayheadModeEnum, State, StreamBuffer, StreamUpload
 
 
 class WebSocketErrorCodeEnum(int, Enum):
     SERVER_ALREADY_IN_USE = 8001
+    # no more session can be opened
+    SERVER_BUSY = 8002
 
 
 class WebSocketHandler(tornado.websocket.WebSocketHandler):
@@ -32,11 +43,11 @@ class WebSocketHandler(tornado.websocket.WebSocketHandler):
         Args:
             websocket_max_message_size (int, optional): maximum allowed
                 message size. If the remote peer sends a message larger
-                than this, the connection will be closed. Defaults to
-                1024*1024*1024.
+                than this, the connection will be closed. The stream data
+                uploaded in chunks is limited by the `max_upload_size` of the
+                websocket server instead. Defaults to 1024*1024*1024.
         """
         self.ws_server = kwargs.pop('ws_server')
-        self.pipeline_name = kwargs.pop('pipeline_name')
         self.logger: logging.Logger = kwargs.pop('logger')
         super().__init__(*args, **kwargs)
 
@@ -44,36 +55,135 @@ class WebSocketHandler(tornado.websocket.WebSocketHandler):
                                     websocket_max_message_size)
 
         self.interop_with_server_on_dispose = True
+        # None if the vertices are forwarded as raw float32 buffers
+        self.vertex_encoder: Optional[QuantizedDeltaEncoder] = None
+        # set once the viewer is attached to a session
+        self.session: Optional[Session] = None
+        self.viewer_id: Optional[str] = None
+        self.playhead_id: Optional[str] = None
+        # last buffer opening state sent by the viewer
+        self.is_buffer_open = True
+        # stream data being uploaded by the viewer
+        self.upload: Optional[StreamUpload] = None
+        # whether the chunks of the upload in progress are dropped, once it
+        # exceeds the maximum upload size
+        self.is_upload_rejected = False
+        # (message type, data, decoded frame) tuples waiting to be written
+        self.send_queue = SendQueue(
+            self.ws_server.send_queue_size, policy=self.ws_server.send_policy)
+
+    def get_compression_options(self) -> Optional[dict]:
+        # quantized deltas are mostly small integers, which permessage-deflate
+        # shrinks further at a low cpu cost
+        if self.ws_server.vertex_encoding == \
+                VertexEncodingEnum.QUANTIZED_DELTA:
+            return {'compression_level': 1}
+        return None
 
     def check_origin(self, origin: str) -> bool:
         self.logger.info(f'origin: {origin}')
         return True
 
-    def open(self, *args: str, **kwargs: str):
-        if (self.ws_server.websocket_pool.__len__() != 0):
+    def open(self, session_id: Optional[str] = None):
+        session_id = Session.DEFAULT_ID if session_id is None else session_id
+        session = self.ws_server.sessions.get(session_id)
+        if session is not None and \
+                len(session.websocket_pool) >= self.ws_server.max_viewers:
             self.logger.warning(
                 'A new viewer tries to connect to '
-                'the websocket server whereas it is already in use.')
+                f'the session {session_id} whereas it is already in use.')
             self.interop_with_server_on_dispose = False
             self.close(WebSocketErrorCodeEnum.SERVER_ALREADY_IN_USE,
                        'Websocket server is already in use')
             return
-        self.ws_server.websocket_pool.add(self)
-        self.ws_server.state = State()
+        if session is None:
+            session = self.ws_server.open_session(session_id)
+        if session is None:
+            self.interop_with_server_on_dispose = False
+            self.close(WebSocketErrorCodeEnum.SERVER_BUSY,
+                       'Websocket server is busy, too many sessions are open')
+            return
+
+        tornado.ioloop.IOLoop.current().spawn_callback(self.send_loop)
 
         cmd = {
             'type': ViewerActionsEnum.CONFIRM_WEBSOCKET_CONNECTED,
             'data': True
         }
-        self.write_message(message=umsgpack.packb(cmd), binary=True)
+        self.send(umsgpack.packb(cmd))
 
         cmd = {
             'type': ViewerActionsEnum.UPDATE_PIPELINE_NAME,
-            'data': self.pipeline_name
+            'data': session.pipeline_name
         }
-        self.write_message(message=umsgpack.packb(cmd), binary=True)
+        self.send(umsgpack.packb(cmd))
 
-        self.logger.info('Viewer connected.')
+        session.attach(self)
+        self.logger.info(
+            f'Viewer {self.viewer_id} connected to the session {session_id}.')
+
+    def send(self,
+             data: bytes,
+             msg_type: Optional[str] = None,
+             frame: Optional[Tuple[Dict[str, Any], Any]] = None) -> None:
+        """Queue a message to be written to the viewer.
+
+        Args:
+            data (bytes): the packed message.
+            msg_type (Optional[str], optional): type of the message, the
+                frames can be dropped by the send queue. Defaults to None.
+            frame (Optional[Tuple[Dict[str, Any], Any]], optional): the
+                unpacked message and vertices of a frame, shared by the
+                viewers encoding the vertices. Defaults to None.
+        """
+        self.send_queue.put(
+            (msg_type, data, frame),
+            is_frame=msg_type == PipelineActionsEnum.UPDATE_MESH_VERTICES)
+
+    def encode_message(self, msg_type: Optional[str], data: bytes,
+                       frame: Optional[Tuple[Dict[str, Any], Any]]) -> bytes:
+        """Encode the vertices of a frame for the viewer, in the order the
+        frames are written, so that dropped frames are never referenced by
+        the following deltas."""
+        if self.vertex_encoder is None:
+            return data
+        if msg_type == PipelineActionsEnum.UPDATE_MESH_FACES:
+            # new topology, the next frame has to be a keyframe
+            self.vertex_encoder.reset()
+        elif msg_type == PipelineActionsEnum.UPDATE_MESH_VERTICES:
+            if frame is None:
+                cmd = umsgpack.unpackb(data)
+                frame = cmd, unpack_ndarray(cmd['data']['verts'])
+            cmd, verts = frame
+            data = umsgpack.packb({
+                **cmd, 'data': {
+                    **cmd['data'], 'verts': self.vertex_encoder.encode(verts)
+                }
+            })
+        return data
+
+    async def send_loop(self) -> None:
+        """Write the queued messages one at a time, waiting for each write
+        to be flushed to the socket, so that a slow viewer fills its send
+        queue instead of the memory of the server."""
+        while True:
+            message = await self.send_queue.get()
+            if message is None:
+                return
+            begin = time.perf_counter()
+            try:
+                await self.write_message(
+                    self.encode_message(*message), binary=True)
+            except tornado.websocket.WebSocketClosedError:
+                return
+            self.ws_server.metrics.observe(StageEnum.WEBSOCKET_WRITE,
+                                           time.perf_counter() - begin)
+            self.session.release_replies()
+
+    def controls_playhead(self) -> bool:
+        """Whether the buffer state of the viewer drives its playhead."""
+        return self.ws_server.playhead_mode == \
+            PlayheadModeEnum.INDEPENDENT or self.session.leader is self
 
     async def on_message(self, message: bytearray):
         """Parse the message from the viewer and call the appropriate
@@ -84,114 +194,447 @@ class WebSocketHandler(tornado.websocket.WebSocketHandler):
         msg_data = unpacked_message['data']
 
         if msg_type == ViewerActionsEnum.UPDATE_BUFFER_FRAME_INDEX:
-            self.ws_server.state.buffer_frame_idx = int(msg_data)
-            self.ws_server.state.buffer_frame_idx_reload_flag = True
-            self.logger.info('The viewer set buffer frame index to: '
-                             f'{self.ws_server.state.buffer_frame_idx}')
-            self.ws_server.state.relief_flag = True
+            if not self.controls_playhead():
+                return
+            self.logger.info(f'The viewer {self.viewer_id} set buffer frame '
+                             f'index to: {int(msg_data)}')
+            self.session.publish_state(
+                playheads={
+                    self.playhead_id: {
+                        'buffer_frame_idx': int(msg_data),
+                        'buffer_frame_idx_reload_flag': True
+                    }
+                },
+                relief_flag=True)
         elif msg_type == ViewerActionsEnum.UPDATE_STREAM_DATA:
-            self.ws_server.state = State()
-            self.ws_server.state.should_update_stream_data = True
-            self.ws_server.buffer.stream_data = msg_data.data
-            self.logger.info('Received new stream data from the viewer')
+            # the whole stream data in a single message
+            stream_data = self.as_bytes(msg_data)
+            self.begin_upload(len(stream_data))
+            self.write_upload(stream_data)
+            self.finish_upload()
+        elif msg_type == ViewerActionsEnum.UPLOAD_STREAM_DATA_BEGIN:
+            size = msg_data.get('size') if isinstance(msg_data, dict) \
+                else None
+            self.logger.info('Receiving new stream data from the viewer '
+                             f'{self.viewer_id}, size: {size}')
+            self.begin_upload(size)
+        elif msg_type == ViewerActionsEnum.UPLOAD_STREAM_DATA_CHUNK:
+            self.write_upload(self.as_bytes(msg_data))
+        elif msg_type == ViewerActionsEnum.UPLOAD_STREAM_DATA_END:
+            self.finish_upload()
         elif msg_type == ViewerActionsEnum.UPDATE_IS_BUFFER_OPEN:
-            self.logger.info(
-                f'The viewer set buffer opening state to: {msg_data}')
-            self.ws_server.state.is_buffer_open = msg_data
+            self.is_buffer_open = msg_data
+            if not self.controls_playhead():
+                return
+            self.logger.info(f'The viewer {self.viewer_id} set buffer '
+                             f'opening state to: {msg_data}')
+            self.session.publish_state(
+                playheads={self.playhead_id: {
+                    'is_buffer_open': msg_data
+                }})
+        elif msg_type == ViewerActionsEnum.CONFIRM_WEBSOCKET_CONNECTED:
+            # the viewer replies the handshake with the vertex encodings
+            # it is able to decode
+            vertex_encodings = msg_data.get('vertex_encodings', []) \
+                if isinstance(msg_data, dict) else []
+            if self.ws_server.vertex_encoding in vertex_encodings and \
+                    self.ws_server.vertex_encoding == \
+                    VertexEncodingEnum.QUANTIZED_DELTA:
+                self.vertex_encoder = QuantizedDeltaEncoder()
+            else:
+                self.vertex_encoder = None
+            encoding = VertexEncodingEnum.RAW \
+                if self.vertex_encoder is None \
+                else VertexEncodingEnum.QUANTIZED_DELTA
+            self.logger.info(f'Vertex encoding negotiated: {encoding.value}')
         elif msg_type == ViewerActionsEnum.HEART_CHECK:
             cmd = {
                 'type': ViewerActionsEnum.HEART_CHECK,
                 'data': 'pong',
             }
-            self.write_message(message=umsgpack.packb(cmd), binary=True)
+            self.send(umsgpack.packb(cmd))
         else:
             self.logger.warning(f'unknown command:{msg_type}')
 
+    @staticmethod
+    def as_bytes(msg_data: Any) -> bytes:
+        # typed arrays are packed as extension types by the viewer
+        return msg_data.data if isinstance(msg_data, umsgpack.Ext) \
+            else msg_data
+
+    def begin_upload(self, size: Optional[int]) -> None:
+        """Start a new upload, dropping the one in progress if any.
+
+        Args:
+            size (Optional[int]): size of the stream data in bytes announced
+                by the viewer, None if unknown.
+        """
+        self.abort_upload()
+        self.is_upload_rejected = False
+        max_upload_size = self.ws_server.max_upload_size
+        if size is not None and size > max_upload_size:
+            self.reject_upload(size)
+            return
+        self.upload = self.session.buffer.begin(size, max_upload_size)
+
+    def write_upload(self, chunk: bytes) -> None:
+        """Append a chunk to the upload in progress, which is rejected once
+        it exceeds the maximum upload size."""
+        if self.upload is None:
+            if not self.is_upload_rejected:
+                self.logger.warning('Dropped a chunk of stream data sent '
+                                    'without starting an upload.')
+            return
+        if not self.upload.write(chunk):
+            self.reject_upload(self.upload.n_received + len(chunk))
+
+    def reject_upload(self, size: int) -> None:
+        """Drop the upload in progress and its next chunks, whose stream
+        data exceeds the maximum upload size, and alert the viewer.
+
+        Args:
+            size (int): size of the stream data in bytes, at least.
+        """
+        self.abort_upload()
+        self.is_upload_rejected = True
+        max_upload_size = self.ws_server.max_upload_size
+        self.logger.warning(
+            f'Rejected the stream data from the viewer {self.viewer_id}, '
+            f'{size} bytes exceed the maximum upload size of '
+            f'{max_upload_size} bytes.')
+        msg = 'The stream data exceeds the maximum upload size of ' \
+            f'{round(max_upload_size / 1024 / 1024, 2)} MiB.'
+        cmd = {'type': PipelineActionsEnum.UPDATE_ALERT_MESSAGE, 'data': msg}
+        self.send(umsgpack.packb(cmd))
+
+    def abort_upload(self) -> None:
+        """Drop the upload in progress if any."""
+        if self.upload is not None:
+            self.upload.abort()
+            self.upload = None
+
+    def finish_upload(self) -> None:
+        """Hand the uploaded stream data to the pipeline, replacing the
+        stream data of the session."""
+        upload = self.upload
+        self.upload = None
+        if upload is None:
+            if not self.is_upload_rejected:
+                self.logger.warning('Dropped the end of an upload that has '
+                                    'not been started.')
+            self.is_upload_rejected = False
+            return
+        n_received = upload.n_received
+        if not self.session.buffer.finish(upload):
+            self.logger.warning(
+                f'Dropped the stream data from the viewer {self.viewer_id}, '
+                f'received {n_received} of {upload.expected_size} bytes.')
+            return
+        self.logger.info('Received new stream data from the viewer '
+                         f'{self.viewer_id}, size: {n_received}')
+        self.session.stream_messages.clear()
+        self.session.reset_state(should_update_stream_data=True)
+
     def on_close(self) -> None:
-        self.logger.info('Viewer disconnected.')
+        self.logger.info(f'Viewer {self.viewer_id} disconnected.')
 
         if not self.interop_with_server_on_dispose:
             return
-        self.ws_server.websocket_pool.remove(self)
-        self.ws_server.state.is_buffer_open = False
+        self.abort_upload()
+        self.send_queue.close()
+        self.session.detach(self)
+        if len(self.session.websocket_pool) == 0:
+            self.ws_server.close_session(self.session)
 
 
-class WebSocketServer:
+class MetricsHandler(tornado.web.RequestHandler):
+    """Expose the stage latencies of the websocket server and of its
+    pipeline workers in the Prometheus text format."""
 
-    context = zmq.Context()  # pylint: disable=abstract-class-instantiated
+    def initialize(self, ws_server: 'WebSocketServer') -> None:
+        self.ws_server = ws_server
 
-    def __init__(self, pipeline_name: str, zmq_port: int, websocket_port: int,
-                 ip_address: str):
-        self.logger = logging.getLogger()
-        self.zmq_port = zmq_port
+    def get(self) -> None:
+        self.set_header('Content-Type', 'text/plain; version=0.0.4')
+        self.write(self.ws_server.render_metrics())
+
+
+class Session:
+    """Viewers sharing a pipeline worker, with their own state and stream
+    data.
+
+    A session is opened when its first viewer connects, using the session id
+    in the url path, and bound to an idle pipeline worker of the websocket
+    server, or to the next worker available. The state changes made
+    meanwhile are pushed to the worker once bound. The session is closed
+    when its last viewer disconnects, after which the worker is reset and
+    can be bound to another session.
+    """
+
+    # id of the session of the viewers connecting to the root url
+    DEFAULT_ID = 'default'
+
+    def __init__(self, ws_server: 'WebSocketServer', session_id: str) -> None:
+        """
+        Args:
+            ws_server (WebSocketServer): the websocket server.
+            session_id (str): id of the session.
+        """
+        self.ws_server = ws_server
+        self.logger = ws_server.logger
+        self.session_id = session_id
+        # zmq identity of the pipeline worker bound to the session
+        self.worker: Optional[bytes] = None
+        self.pipeline_name = ws_server.pipeline_name
+
+        self.state = State()
+        self.buffer = StreamBuffer(
+            ws_server.upload_dir.name, prefix=f'{session_id}-')
         self.websocket_pool = set()
-        self.app = tornado.web.Application([(r'/', WebSocketHandler, {
-            'ws_server': self,
-            'pipeline_name': pipeline_name,
-            'logger': self.logger
-        })])
-        self.ioloop = tornado.ioloop.IOLoop.current()
-        # zmq
-        zmq_url = f'tcp://{ip_address}:{self.zmq_port:d}'
-        self.zmq_socket, self.zmq_stream, self.zmq_url = \
-            self.setup_zmq(zmq_url)
+        self.viewer_ids = itertools.count()
+        # viewer controlling the shared playhead
+        self.leader: Optional[WebSocketHandler] = None
+        # last messages describing the stream data, replayed to the viewers
+        # attached afterwards, (type, data) pairs keyed by type, or by type
+        # and topology for the faces of each topology
+        self.stream_messages: Dict[str, Tuple[str, bytes]] = {}
+        # acknowledgements withheld from the pipeline while a send queue is
+        # full
+        self.deferred_replies: List[Callable[[], None]] = []
+        self.reported_n_dropped: Dict[str, int] = {}
 
-        # websocket
-        listen_kwargs = {'address': '0.0.0.0'}
-        self.app.listen(websocket_port, **listen_kwargs)
-        self.websocket_port = websocket_port
-        self.websocket_url = f'0.0.0.0:{self.websocket_port}'
+    def bind(self, worker: bytes, pipeline_name: Optional[str]) -> None:
+        """Bind a pipeline worker to the session.
+
+        Args:
+            worker (bytes): zmq identity of the worker.
+            pipeline_name (Optional[str]): name of the worker, None keeps the
+                name of the websocket server.
+        """
+        self.worker = worker
+        if pipeline_name is not None and pipeline_name != self.pipeline_name:
+            self.pipeline_name = pipeline_name
+            cmd = {
+                'type': ViewerActionsEnum.UPDATE_PIPELINE_NAME,
+                'data': pipeline_name
+            }
+            for websocket in self.websocket_pool:
+                websocket.send(umsgpack.packb(cmd))
+
+    def attach(self, websocket: WebSocketHandler) -> None:
+        """Attach a viewer to its playhead, and bring it up to date with the
+        stream data loaded by the pipeline.
+
+        Args:
+            websocket (WebSocketHandler): the viewer.
+        """
+        websocket.session = self
+        websocket.viewer_id = str(next(self.viewer_ids))
+        websocket.playhead_id = websocket.viewer_id \
+            if self.ws_server.playhead_mode == PlayheadModeEnum.INDEPENDENT \
+            else State.SHARED_PLAYHEAD
+
+        is_first = len(self.websocket_pool) == 0
+        self.websocket_pool.add(websocket)
+        if is_first:
+            self.stream_messages.clear()
+            self.reset_state()
+        else:
+            for msg_type, msg_data in self.stream_messages.values():
+                websocket.send(msg_data, msg_type)
+            if self.ws_server.playhead_mode == PlayheadModeEnum.INDEPENDENT:
+                self.publish_state(
+                    playheads={websocket.playhead_id: State.new_playhead()})
+
+        if self.ws_server.playhead_mode == PlayheadModeEnum.SHARED:
+            if self.leader is None:
+                self.set_leader(websocket)
+            else:
+                self.write_playhead_control(websocket, False)
+
+    def detach(self, websocket: WebSocketHandler) -> None:
+        """Detach a viewer from its playhead.
+
+        Args:
+            websocket (WebSocketHandler): the viewer.
+        """
+        self.websocket_pool.remove(websocket)
+        self.reported_n_dropped.pop(websocket.viewer_id, None)
+        self.release_replies()
+        if self.ws_server.playhead_mode == PlayheadModeEnum.INDEPENDENT:
+            self.publish_state(playheads={websocket.playhead_id: None})
+        elif self.leader is websocket:
+            self.leader = None
+            successor = next(iter(self.websocket_pool), None)
+            if successor is None:
+                self.publish_state(playheads={
+                    State.SHARED_PLAYHEAD: {
+                        'is_buffer_open': False
+                    }
+                })
+            else:
+                self.set_leader(successor)
+
+    def set_leader(self, websocket: WebSocketHandler) -> None:
+        """Give the control of the shared playhead to a viewer.
 
-        # state
+        Args:
+            websocket (WebSocketHandler): the viewer.
+        """
+        self.leader = websocket
+        self.write_playhead_control(websocket, True)
+        self.publish_state(playheads={
+            State.SHARED_PLAYHEAD: {
+                'is_buffer_open': websocket.is_buffer_open
+            }
+        })
+        self.logger.info(
+            f'Viewer {websocket.viewer_id} controls the shared playhead.')
+
+    @staticmethod
+    def write_playhead_control(websocket: WebSocketHandler,
+                               controls_playhead: bool) -> None:
+        cmd = {
+            'type': ViewerActionsEnum.UPDATE_PLAYHEAD_CONTROL,
+            'data': controls_playhead
+        }
+        websocket.send(umsgpack.packb(cmd))
+
+    def is_blocked(self) -> bool:
+        """Whether the pipeline has to wait for the viewers."""
+        return self.ws_server.send_policy == SendPolicyEnum.BLOCK and any(
+            websocket.send_queue.is_full()
+            for websocket in self.websocket_pool)
+
+    def reply_when_ready(self, reply: Callable[[], None]) -> None:
+        """Acknowledge a message of the pipeline, unless it has to wait for
+        the viewers, in which case the acknowledgement is withheld until
+        `release_replies`. The pipeline stops sending once it runs out of
+        credits."""
+        # keep the acknowledgements in order
+        self.deferred_replies.append(reply)
+        self.release_replies()
+
+    def release_replies(self) -> None:
+        """Send the withheld acknowledgements once every send queue has
+        room."""
+        if len(self.deferred_replies) == 0 or self.is_blocked():
+            return
+        replies = self.deferred_replies
+        self.deferred_replies = []
+        for reply in replies:
+            reply()
+        self.ws_server.watch_zmq()
+
+    def get_send_queue_stats(self) -> Dict[str, Dict[str, int]]:
+        """Get the depth and the number of sent and dropped messages of
+        the send queue of each viewer, keyed by viewer id."""
+        return {
+            websocket.viewer_id: websocket.send_queue.get_stats()
+            for websocket in self.websocket_pool
+        }
+
+    def log_send_queue_stats(self) -> None:
+        """Warn about the viewers whose frames have been dropped since the
+        last call."""
+        for viewer_id, stats in self.get_send_queue_stats().items():
+            n_dropped = stats['n_dropped'] - \
+                self.reported_n_dropped.get(viewer_id, 0)
+            if n_dropped > 0:
+                self.logger.warning(
+                    f'Dropped {n_dropped} frames of the slow viewer '
+                    f'{viewer_id} of the session {self.session_id}, '
+                    f'send queue depth: {stats["depth"]}, '
+                    f'max depth: {stats["max_depth"]}')
+            self.reported_n_dropped[viewer_id] = stats['n_dropped']
+
+    def publish_state(self, **changes) -> None:
+        """Update the state and push the changes to the pipeline worker.
+
+        Event flags are cleared once they are pushed, since the pipeline
+        consumes them by itself. Without a worker, or if the worker is lost,
+        the changes are pushed with the whole state once a worker is bound.
+        """
+        self.state.update(changes)
+        if self.worker is None:
+            return
+        if not self.ws_server.send_to_worker(self.worker, [
+                PipelineActionsEnum.PUBLISH_STATE.encode('utf-8'), b'',
+                umsgpack.packb(changes)
+        ]):
+            return
+        self.clear_event_flags()
+        self.ws_server.watch_zmq()
+
+    def reset_state(self, **changes) -> None:
+        """Reset the state to its initial values, then apply and push the
+        changes.
+
+        Each attached viewer gets a playhead back, and the playheads that do
+        not exist anymore are removed.
+        """
+        stale_playhead_ids = set(self.state.playheads)
         self.state = State()
+        for websocket in self.websocket_pool:
+            self.state.playheads[websocket.playhead_id] = \
+                State.new_playhead()
 
-        self.buffer = StreamBuffer()
+        values = self.state.to_dict()
+        for playhead_id in stale_playhead_ids - set(self.state.playheads):
+            values['playheads'][playhead_id] = None
+        self.publish_state(**{**values, **changes})
 
-    def handle_zmq(self, frames: List[bytes]):
-        """Handle messages from the backend.
+    def clear_event_flags(self) -> None:
+        for flag in State.EVENT_FLAGS:
+            setattr(self.state, flag, False)
+        for playhead in self.state.playheads.values():
+            for flag in State.PLAYHEAD_EVENT_FLAGS:
+                playhead[flag] = False
+
+    def handle_zmq(self, msg_type: str, msg_data: bytes,
+                   reply: Callable[[bytes], None]) -> None:
+        """Handle a message from the pipeline worker.
 
         Args:
-            frames (List[bytes]): data frame from the backend,
-                including message type and data
+            msg_type (str): type of the message.
+            msg_data (bytes): data of the message.
+            reply (Callable[[bytes], None]): function replying the message.
         """
-        msg_type = frames[0].decode('utf-8')
-        msg_data = frames[1]
+
+        def acknowledge():
+            reply(umsgpack.packb(b'ok'))
+
         if msg_type in [
                 PipelineActionsEnum.UPDATE_MESH_VERTICES,
                 PipelineActionsEnum.UPDATE_MESH_FACES,
                 PipelineActionsEnum.UPDATE_ALERT_MESSAGE,
-                PipelineActionsEnum.UPDATE_STREAM_DATA_SUCCESS
+                PipelineActionsEnum.UPDATE_STREAM_DATA_SUCCESS,
+                PipelineActionsEnum.UPDATE_BAKE_PROGRESS
         ]:
-            self.forward_to_websockets(frames)
-            self.zmq_socket.send(umsgpack.packb(b'ok'))
+            if msg_type in WebSocketServer.STREAM_MESSAGE_TYPES:
+                self.stream_messages[msg_type] = (msg_type, msg_data)
+            self.forward_to_websockets((msg_type, msg_data))
+            self.reply_when_ready(acknowledge)
+        elif msg_type == PipelineActionsEnum.UPDATE_TOPOLOGY_FACES:
+            # sent once per topology, every viewer attached later needs all
+            # of them
+            topology = umsgpack.unpackb(msg_data)['data']['topology']
+            self.stream_messages[f'{msg_type}/{topology}'] = (msg_type,
+                                                              msg_data)
+            self.forward_to_websockets((msg_type, msg_data))
+            self.reply_when_ready(acknowledge)
         elif msg_type == PipelineActionsEnum.UPDATE_NUM_FRAMES:
             unpacked_data = umsgpack.unpackb(msg_data)
             self.state.n_frames = unpacked_data['data']
-            self.forward_to_websockets(frames)
-            self.zmq_socket.send(umsgpack.packb(b'ok'))
-        elif msg_type == PipelineActionsEnum.REQUEST_STATE:
-            serialized = pickle.dumps(self.state)
-            self.zmq_socket.send(serialized)
+            self.stream_messages[msg_type] = (msg_type, msg_data)
+            self.forward_to_websockets((msg_type, msg_data))
+            self.reply_when_ready(acknowledge)
         elif msg_type == PipelineActionsEnum.REQUEST_STREAM_DATA:
-            self.zmq_socket.send(self.buffer.stream_data)
-        elif msg_type == PipelineActionsEnum.UPDATE_STREAM_DATA_FLAG:
-            unpacked_data = umsgpack.unpackb(msg_data)
-            self.state.should_update_stream_data = unpacked_data['data']
-            self.zmq_socket.send(b'ok')
-        elif msg_type == PipelineActionsEnum.PING:
-            self.zmq_socket.send(umsgpack.packb(b'ping received'))
-        elif msg_type == \
-                PipelineActionsEnum.UPDATE_BUFFER_FRAME_IDX_RELOAD_FLAG:
-            unpacked_data = umsgpack.unpackb(msg_data)
-            self.state.buffer_frame_idx_reload_flag = unpacked_data['data']
-            self.zmq_socket.send(umsgpack.packb(b'ok'))
-        elif msg_type == PipelineActionsEnum.UPDATE_RELIEF_FLAG:
-            unpacked_data = umsgpack.unpackb(msg_data)
-            self.state.relief_flag = unpacked_data['data']
-            self.zmq_socket.send(umsgpack.packb(b'ok'))
+            # the pipelines share the file system of the websocket server
+            reply(umsgpack.packb({'file_path': self.buffer.file_path}))
         else:
             self.logger.warning(f'unknown command:{msg_type}')
-            self.zmq_socket.send(umsgpack.packb(b'error: unknown command'))
+            reply(umsgpack.packb(b'error: unknown command'))
 
     def forward_to_websockets(
             self,
@@ -199,21 +642,489 @@ class WebSocketServer:
             websocket_to_skip: Optional[WebSocketHandler] = None):
         """forward a message from the zmq(backend) to all websockets(viewers).
 
+        Frames are sent once by the pipeline for all the playheads expecting
+        them, and only forwarded to the viewers of these playheads.
+
         Args:
-            frames (Tuple[str, str, bytes]): data frame from the zmq
+            frames (Tuple[str, bytes]): message type and data from the zmq
             websocket_to_skip (Optional[WebSocketHandler], optional): whether
                 forward to the websocket. Defaults to None.
         """
         _type, _data = frames  # cmd, data
-        for websocket in self.websocket_pool:
+        cmd = None
+        websockets = self.websocket_pool
+        if _type == PipelineActionsEnum.UPDATE_MESH_VERTICES and \
+                len(self.state.playheads) > 1:
+            cmd = umsgpack.unpackb(_data)
+            playhead_ids = cmd['data'].get('playheads')
+            if playhead_ids is not None:
+                websockets = [
+                    websocket for websocket in websockets
+                    if websocket.playhead_id in playhead_ids
+                ]
+
+        # decode the vertices once for all the viewers encoding them
+        frame = None
+        if _type == PipelineActionsEnum.UPDATE_MESH_VERTICES and any(
+                websocket.vertex_encoder is not None
+                for websocket in websockets):
+            if cmd is None:
+                cmd = umsgpack.unpackb(_data)
+            frame = cmd, unpack_ndarray(cmd['data']['verts'])
+
+        for websocket in websockets:
             if websocket_to_skip and websocket == websocket_to_skip:
-                pass
+                continue
+            websocket.send(_data, _type, frame)
+
+
+class WebSocketServer:
+    """Route the viewers to sessions by the url path, `/session/<id>`, or
+    to the default session for `/`, and each session to a pipeline worker
+    connected to the zmq port.
+
+    Pipelines register themselves as workers when they subscribe to the
+    state. The number of sessions opened at once is limited by
+    `max_sessions` and by the number of idle workers.
+
+    A worker is unregistered once its connection is closed, e.g. when the
+    pipeline exits or crashes, or when it misses the zmq heartbeats for
+    `worker_timeout` seconds, which the pipeline answers even while it is
+    busy. Its session waits for the next worker available, which reloads
+    the stream data of the session.
+    """
+
+    # shared with the pipelines running in the process, which connect to
+    # inproc urls
+    context = zmq.Context.instance()
+    # messages replayed to the viewers attached after the stream data has
+    # been loaded, in the order they are sent by the pipeline
+    STREAM_MESSAGE_TYPES = (
+        PipelineActionsEnum.UPDATE_NUM_FRAMES,
+        PipelineActionsEnum.UPDATE_MESH_FACES,
+        PipelineActionsEnum.UPDATE_STREAM_DATA_SUCCESS,
+        PipelineActionsEnum.UPDATE_BAKE_PROGRESS,
+    )
+
+    def __init__(self,
+                 pipeline_name: str,
+                 zmq_port: int,
+                 websocket_port: int,
+                 ip_address: str,
+                 vertex_encoding: str = VertexEncodingEnum.RAW,
+                 max_viewers: int = 1,
+                 playhead_mode: str = PlayheadModeEnum.SHARED,
+                 send_queue_size: int = 16,
+                 send_policy: str = SendPolicyEnum.BLOCK,
+                 max_sessions: int = 1,
+                 worker_timeout: float = 10.0,
+                 max_upload_size: int = 4 * 1024**3,
+                 zmq_url: Optional[str] = None):
+        """
+        Args:
+            pipeline_name (str): name of the pipeline, sent to the viewers
+                when the pipeline worker does not report its own.
+            zmq_port (int): port exposed to the pipeline.
+            websocket_port (int): port exposed to websocket clients.
+            ip_address (str): ip address of the websocket server.
+            vertex_encoding (str, optional): encoding of the vertices sent
+                to the viewers that support it, see `VertexEncodingEnum`.
+                Defaults to 'raw'.
+            max_viewers (int, optional): maximum number of viewers attached
+                at once, the others are rejected. Defaults to 1.
+            playhead_mode (str, optional): whether the viewers follow a
+                playhead controlled by the first viewer ('shared') or each
+                have their own ('independent'), see `PlayheadModeEnum`.
+                Defaults to 'shared'.
+            send_queue_size (int, optional): number of messages queued for
+                each viewer before `send_policy` applies. Defaults to 16.
+            send_policy (str, optional): what happens when the send queue of
+                a viewer is full, see `SendPolicyEnum`. 'block' pauses the
+                pipeline until every queue has room again, 'drop_oldest'
+                drops the oldest queued frame and 'coalesce' only keeps the
+                latest frame. Defaults to 'block'.
+            max_sessions (int, optional): maximum number of sessions opened
+                at once, the viewers opening more sessions are rejected.
+                Defaults to 1.
+            worker_timeout (float, optional): time in seconds after which
+                a pipeline worker that does not answer the zmq heartbeats is
+                lost, and unregistered. Defaults to 10.0.
+            max_upload_size (int, optional): maximum size in bytes of the
+                stream data uploaded by a viewer, the larger uploads are
+                rejected. Defaults to 4 GiB.
+            zmq_url (Optional[str], optional): url the zmq socket binds to,
+                which overrides `ip_address` and `zmq_port`, e.g. an inproc
+                url for the pipelines running in the process. Defaults to
+                None.
+        """
+        self.logger = logging.getLogger()
+        self.zmq_port = zmq_port
+        self.vertex_encoding = VertexEncodingEnum(vertex_encoding)
+        self.pipeline_name = pipeline_name
+        self.max_viewers = max_viewers
+        self.playhead_mode = PlayheadModeEnum(playhead_mode)
+        self.send_queue_size = send_queue_size
+        self.send_policy = SendPolicyEnum(send_policy)
+        self.max_sessions = max_sessions
+        self.worker_timeout = worker_timeout
+        self.max_upload_size = max_upload_size
+        self.sessions: Dict[str, Session] = {}
+        # pipeline workers keyed by zmq identity, with their name and the
+        # session they are bound to
+        self.workers: Dict[bytes, Dict[str, Any]] = {}
+        self.worker_ids = itertools.count()
+        # latencies of the stages handled by the websocket server
+        self.metrics = StageMetrics()
+        self.idle_workers: Deque[bytes] = deque()
+        # sessions waiting for a worker, in the order they are opened
+        self.pending_sessions: Deque[Session] = deque()
+        # stream data uploaded to the sessions
+        self.upload_dir = tempfile.TemporaryDirectory(
+            prefix='xrviewer_upload_')
+        handler_kwargs = {'ws_server': self, 'logger': self.logger}
+        self.app = tornado.web.Application([
+            (r'/', WebSocketHandler, handler_kwargs),
+            (r'/session/([^/]+)/?', WebSocketHandler, handler_kwargs),
+            (r'/metrics', MetricsHandler, {
+                'ws_server': self
+            }),
+        ])
+        self.ioloop = tornado.ioloop.IOLoop.current()
+        # zmq
+        if zmq_url is None:
+            zmq_url = f'tcp://{ip_address}:{self.zmq_port:d}'
+        self.zmq_socket, self.zmq_stream, self.zmq_url = \
+            self.setup_zmq(zmq_url)
+        # notified when the connection of a worker is closed
+        self.monitor_stream = ZMQStream(
+            self.zmq_socket.get_monitor_socket(zmq.EVENT_DISCONNECTED))
+        self.monitor_stream.on_recv(self.check_workers)
+
+        # websocket
+        listen_kwargs = {'address': '0.0.0.0'}
+        self.app.listen(websocket_port, **listen_kwargs)
+        self.websocket_port = websocket_port
+        self.websocket_url = f'0.0.0.0:{self.websocket_port}'
+
+    def open_session(self, session_id: str) -> Optional[Session]:
+        """Open a session, bound to an idle pipeline worker if any.
+
+        Args:
+            session_id (str): id of the session.
+
+        Returns:
+            Optional[Session]: the session, None if the session limit is
+                reached.
+        """
+        if len(self.sessions) >= self.max_sessions:
+            self.logger.warning(f'Rejected the session {session_id}, '
+                                f'{len(self.sessions)} sessions are open.')
+            return None
+
+        session = Session(self, session_id)
+        self.sessions[session_id] = session
+        self.logger.info(f'Opened the session {session_id}, '
+                         f'{len(self.sessions)} sessions are open.')
+        if len(self.idle_workers) > 0:
+            self.bind_worker(self.idle_workers.popleft(), session)
+        else:
+            self.pending_sessions.append(session)
+            self.logger.info(f'The session {session_id} waits for '
+                             'a pipeline worker.')
+        return session
+
+    def close_session(self, session: Session) -> None:
+        """Close a session without viewers and reset its pipeline worker,
+        which is bound to the next session waiting for a worker if any.
+
+        Args:
+            session (Session): the session.
+        """
+        self.sessions.pop(session.session_id, None)
+        session.buffer.discard()
+        self.logger.info(f'Closed the session {session.session_id}.')
+        if session.worker is None:
+            self.pending_sessions.remove(session)
+            return
+
+        # the pipeline goes back to its initial state, and stops waiting for
+        # the viewers
+        session.reset_state()
+        session.release_replies()
+        worker = session.worker
+        if worker is None:
+            # lost meanwhile
+            return
+        self.workers[worker]['session'] = None
+        if len(self.pending_sessions) > 0:
+            self.bind_worker(worker, self.pending_sessions.popleft())
+        else:
+            self.idle_workers.append(worker)
+
+    def bind_worker(self,
+                    worker: bytes,
+                    session: Session,
+                    subscribed: bool = True) -> None:
+        """Bind a pipeline worker to a session.
+
+        Args:
+            worker (bytes): zmq identity of the worker.
+            session (Session): the session.
+            subscribed (bool, optional): whether the worker has already
+                subscribed to the state, in which case the whole state of
+                the session is pushed to it. Defaults to True.
+        """
+        self.workers[worker]['session'] = session
+        session.bind(worker, self.workers[worker]['pipeline_name'])
+        if subscribed:
+            session.publish_state(**session.state.to_dict())
+        if session.worker != worker:
+            # lost meanwhile, the session has been bound to another worker
+            return
+        self.logger.info('Bound a pipeline worker to the session '
+                         f'{session.session_id}.')
+
+    def register_worker(
+            self,
+            worker: bytes,
+            pipeline_name: Optional[str],
+            transport: str = TransportEnum.ZMQ) -> Optional[Session]:
+        """Add a pipeline worker subscribing to the state, bound to the next
+        session waiting for a worker if any, otherwise idle.
+
+        Args:
+            worker (bytes): zmq identity of the worker.
+            pipeline_name (Optional[str]): name of the worker.
+            transport (str, optional): how the worker sends the frames, see
+                `TransportEnum`. Defaults to 'zmq'.
+
+        Returns:
+            Optional[Session]: the session bound to the worker.
+        """
+        # reads the frames that the worker does not send in the messages
+        frame_reader = None
+        if transport == TransportEnum.SHARED_MEMORY:
+            frame_reader = SharedMemoryReader()
+        elif transport == TransportEnum.IN_PROCESS:
+            frame_reader = frame_references
+        self.workers[worker] = {
+            'pipeline_name': pipeline_name,
+            'session': None,
+            'frame_reader': frame_reader,
+            'worker_id': next(self.worker_ids),
+            # stage latencies last reported by the worker
+            'metrics': {},
+        }
+        self.logger.info(f'Registered a {pipeline_name} pipeline worker, '
+                         f'{len(self.workers)} workers.')
+        if len(self.pending_sessions) == 0:
+            self.idle_workers.append(worker)
+            return None
+
+        session = self.pending_sessions.popleft()
+        self.bind_worker(worker, session, subscribed=False)
+        return session
+
+    def unregister_worker(self, worker: bytes) -> None:
+        """Remove a pipeline worker whose connection is closed. Its session,
+        if still open, is bound to an idle worker, or waits for the next
+        worker available first, and the stream data of the session is loaded
+        again from the start.
+
+        Args:
+            worker (bytes): zmq identity of the worker.
+        """
+        info = self.workers.pop(worker, None)
+        if info is None:
+            return
+        if worker in self.idle_workers:
+            self.idle_workers.remove(worker)
+        if isinstance(info['frame_reader'], SharedMemoryReader):
+            info['frame_reader'].close()
+        self.logger.warning(f'Lost a {info["pipeline_name"]} pipeline worker, '
+                            f'{len(self.workers)} workers.')
+
+        session = info['session']
+        if session is None:
+            return
+        session.worker = None
+        # the acknowledgements and the stream data of the lost worker
+        session.deferred_replies.clear()
+        session.stream_messages.clear()
+        session.reset_state(
+            should_update_stream_data=session.buffer.file_path is not None)
+        if self.sessions.get(session.session_id) is not session:
+            # closed meanwhile
+            return
+        if len(self.idle_workers) > 0:
+            self.bind_worker(self.idle_workers.popleft(), session)
+        else:
+            self.pending_sessions.appendleft(session)
+            self.logger.info(f'The session {session.session_id} waits for '
+                             'a pipeline worker.')
+
+    def send_to_worker(self, worker: bytes, frames: List[bytes]) -> bool:
+        """Send a message to a pipeline worker, which is unregistered if its
+        connection is closed.
+
+        Args:
+            worker (bytes): zmq identity of the worker.
+            frames (List[bytes]): frames of the message.
+
+        Returns:
+            bool: whether the message is sent.
+        """
+        try:
+            self.zmq_socket.send_multipart([worker] + frames, zmq.NOBLOCK)
+        except zmq.ZMQError as error:
+            if error.errno == zmq.EHOSTUNREACH:
+                self.unregister_worker(worker)
+            elif error.errno == zmq.EAGAIN:
+                self.logger.warning('Dropped a message to a pipeline worker '
+                                    'that does not receive its messages.')
             else:
-                websocket.write_message(_data, binary=True)
+                raise
+            return False
+        return True
+
+    def check_workers(self, _: Optional[List[bytes]] = None) -> None:
+        """Push an empty state change to every pipeline worker once a
+        connection is closed, so that the worker lost is unregistered."""
+        # process the pending commands of the socket first, which remove the
+        # peers whose connection is closed
+        self.zmq_socket.getsockopt(zmq.EVENTS)
+        for worker in list(self.workers):
+            self.send_to_worker(worker, [
+                PipelineActionsEnum.PUBLISH_STATE.encode('utf-8'), b'',
+                umsgpack.packb({})
+            ])
+        self.watch_zmq()
+
+    def watch_zmq(self) -> None:
+        """Handle the messages of the pipelines received meanwhile.
+
+        Sending on the zmq socket outside of `handle_zmq` may consume the
+        edge triggered event of the messages received meanwhile, which
+        would then wait until the next message.
+        """
+        self.ioloop.add_callback(self.zmq_stream.flush, zmq.POLLIN)
+
+    def get_send_queue_stats(self) -> Dict[str, Dict[str, int]]:
+        """Get the depth and the number of sent and dropped messages of
+        the send queue of each viewer, keyed by `<session id>/<viewer id>`.
+        """
+        return {
+            f'{session_id}/{viewer_id}': stats
+            for session_id, session in self.sessions.items()
+            for viewer_id, stats in session.get_send_queue_stats().items()
+        }
+
+    def log_send_queue_stats(self) -> None:
+        for session in self.sessions.values():
+            session.log_send_queue_stats()
+
+    def handle_zmq(self, frames: List[bytes]):
+        """Handle messages from the backend.
+
+        Every message is replied, either with the requested data or with an
+        acknowledgement that gives the pipeline a credit to send one more
+        message. Replies are tagged with the type and sequence number of the
+        message, as opposed to the state changes pushed by
+        `Session.publish_state`. The messages of a pipeline worker bound to
+        a session are handled by the session.
+
+        Args:
+            frames (List[bytes]): data frame from the backend,
+                including the identity of the sender, message type,
+                sequence number and data
+        """
+        begin = time.perf_counter()
+        identity, msg_type, seq, msg_data = frames
+        msg_type = msg_type.decode('utf-8')
+
+        def reply(data: bytes):
+            self.send_to_worker(identity,
+                                [msg_type.encode('utf-8'), seq, data])
+
+        worker = self.workers.get(identity)
+        session = None if worker is None else worker['session']
+        if msg_type == PipelineActionsEnum.UPDATE_MESH_VERTICES and \
+                worker is not None and worker['frame_reader'] is not None:
+            # release the frame before it is acknowledged, even if it is not
+            # forwarded
+            msg_data = worker['frame_reader'].read_message(
+                umsgpack.unpackb(msg_data))
+
+        if msg_type == PipelineActionsEnum.SUBSCRIBE_STATE:
+            # reply the whole state, then push the changes only
+            if worker is None:
+                unpacked_data = umsgpack.unpackb(msg_data).get('data')
+                if not isinstance(unpacked_data, dict):
+                    unpacked_data = {}
+                session = self.register_worker(
+                    identity, unpacked_data.get('pipeline_name'),
+                    unpacked_data.get('transport', TransportEnum.ZMQ))
+            state = State() if session is None else session.state
+            reply(umsgpack.packb(state.to_dict()))
+            if session is not None:
+                session.clear_event_flags()
+        elif msg_type == PipelineActionsEnum.PING:
+            reply(umsgpack.packb(b'ping received'))
+        elif msg_type == PipelineActionsEnum.UPDATE_METRICS:
+            if worker is not None:
+                worker['metrics'] = umsgpack.unpackb(msg_data)['data']
+            reply(umsgpack.packb(b'ok'))
+        elif session is not None:
+            session.handle_zmq(msg_type, msg_data, reply)
+        elif msg_type == PipelineActionsEnum.REQUEST_STREAM_DATA:
+            reply(umsgpack.packb({'file_path': None}))
+        else:
+            # left over by a closed session
+            reply(umsgpack.packb(b'ok'))
+
+        self.metrics.observe(StageEnum.SERVER_HANDLING,
+                             time.perf_counter() - begin)
+
+    def render_metrics(self) -> str:
+        """Render the stage latencies of the websocket server and the last
+        ones reported by each pipeline worker in the Prometheus text format,
+        along with the memory of the websocket server.
+
+        Returns:
+            str: the metrics.
+        """
+        series = [({'source': 'websocket_server'}, self.metrics.snapshot())]
+        for worker in self.workers.values():
+            labels = {
+                'source': 'pipeline',
+                'pipeline': worker['pipeline_name'] or self.pipeline_name,
+                'worker': worker['worker_id'],
+            }
+            series.append((labels, worker['metrics']))
+
+        metrics = render_prometheus('xrviewer_stage_duration_seconds',
+                                    'Time spent in each stage of the stream.',
+                                    series)
+        rss = read_rss()
+        if rss is not None:
+            metrics += render_gauge('process_resident_memory_bytes',
+                                    'Resident memory size in bytes.', rss)
+
+        return metrics
 
     def setup_zmq(self, url: str):
         """setup a zmq socket and connect it to the given url."""
-        zmq_socket = self.context.socket(zmq.REP)  # pylint: disable=no-member
+        # pylint: disable=no-member
+        zmq_socket = self.context.socket(zmq.ROUTER)
+        # fail instead of dropping the messages to the workers whose
+        # connection is closed, see `send_to_worker`
+        zmq_socket.setsockopt(zmq.ROUTER_MANDATORY, 1)
+        # close the connection of the workers that stop answering, e.g. when
+        # their host is down
+        heartbeat_timeout = int(self.worker_timeout * 1000)
+        heartbeat_interval = max(heartbeat_timeout // 5, 1)
+        zmq_socket.setsockopt(zmq.HEARTBEAT_IVL, heartbeat_interval)
+        zmq_socket.setsockopt(zmq.HEARTBEAT_TIMEOUT, heartbeat_timeout)
         zmq_socket.bind(url)
         zmq_stream = ZMQStream(zmq_socket)
         zmq_stream.on_recv(self.handle_zmq)
@@ -223,18 +1134,36 @@ class WebSocketServer:
     def run(self):
         """starts and runs the websocet server."""
         self.logger.warning('Start websocket server, '
-                            f'ZeroMQ port: {self.zmq_port}, '
+                            f'ZeroMQ url: {self.zmq_url}, '
                             f'websocket port: {self.websocket_port}')
+        tornado.ioloop.PeriodicCallback(self.log_send_queue_stats,
+                                        5000).start()
         self.ioloop.start()
 
 
 def setup_parser():
     parser = argparse.ArgumentParser(description='Start a websocket server.')
 
-    parser.add_argument('--pipeline_name', type=str, required=True)
+    parser.add_argument('--pipeline_name', type=str, default='unknown')
     parser.add_argument('--zmq_port', type=int, default=6000)
     parser.add_argument('--websocket_port', type=int, default=4567)
     parser.add_argument('--ip_address', type=str, default='127.0.0.1')
+    parser.add_argument('--vertex_encoding', type=str, default='raw')
+    parser.add_argument('--max_viewers', type=int, default=1)
+    parser.add_argument(
+        '--playhead_mode',
+        type=str,
+        default='shared',
+        choices=['shared', 'independent'])
+    parser.add_argument('--send_queue_size', type=int, default=16)
+    parser.add_argument(
+        '--send_policy',
+        type=str,
+        default='block',
+        choices=['block', 'drop_oldest', 'coalesce'])
+    parser.add_argument('--max_sessions', type=int, default=1)
+    parser.add_argument('--worker_timeout', type=float, default=10.0)
+    parser.add_argument('--max_upload_size', type=int, default=4 * 1024**3)
 
     args = parser.parse_args()
 
@@ -1,24 +1,205 @@
+import os
+import uuid
+from enum import Enum
+from typing import IO, Any, Dict, Optional
+
+
+class PlayheadModeEnum(str, Enum):
+    # the viewers follow a single playhead controlled by one of them
+    SHARED = 'shared'
+    # each viewer has its own playhead
+    INDEPENDENT = 'independent'
+
+
 class State:
     """A group of values that describes and controls the animation.
 
     Small memory usage but frequently queried and updated.
+
+    Each playhead follows the buffer of the viewers attached to it, either
+    every viewer when they share the playhead, or a single viewer. Playheads
+    are stored as dicts keyed by their id, see `new_playhead`.
     """
 
+    # flags that notify the pipeline of an event, they are cleared once the
+    # pipeline has been notified
+    EVENT_FLAGS = ('should_update_stream_data', 'relief_flag')
+    PLAYHEAD_EVENT_FLAGS = ('buffer_frame_idx_reload_flag', )
+    # id of the playhead shared by the viewers
+    SHARED_PLAYHEAD = 'shared'
+
     def __init__(self):
         self.is_playing = False
-        self.buffer_frame_idx = 0
         self.n_frames = 0
         self.should_update_stream_data = False
-        self.is_buffer_open = True
-        self.buffer_frame_idx_reload_flag = False
         self.relief_flag = False
+        self.playheads: Dict[str, Dict[str, Any]] = {}
+
+    @staticmethod
+    def new_playhead() -> Dict[str, Any]:
+        """Get the initial values of a playhead."""
+        return {
+            'buffer_frame_idx': 0,
+            'is_buffer_open': True,
+            'buffer_frame_idx_reload_flag': False,
+        }
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Get the values of the state."""
+        values = dict(vars(self))
+        values['playheads'] = {
+            playhead_id: dict(playhead)
+            for playhead_id, playhead in self.playheads.items()
+        }
+        return values
+
+    def update(self, changes: Dict[str, Any]) -> None:
+        """Set the values of the state.
+
+        The changes of the playheads are merged into the existing ones, and
+        a playhead set to None is removed.
+
+        Args:
+            changes (Dict[str, Any]): the values to be set, keyed by name.
+        """
+        for name, value in changes.items():
+            if name == 'playheads':
+                for playhead_id, playhead in value.items():
+                    if playhead is None:
+                        self.playheads.pop(playhead_id, None)
+                    else:
+                        self.playheads.setdefault(
+                            playhead_id, self.new_playhead()).update(playhead)
+            elif hasattr(self, name):
+                setattr(self, name, value)
+
+
+class StreamUpload:
+    """Spools the stream data uploaded by a viewer to a file, chunk by
+    chunk, so that it is never held in memory."""
+
+    def __init__(self,
+                 file_path: str,
+                 size: Optional[int] = None,
+                 max_size: Optional[int] = None) -> None:
+        """
+        Args:
+            file_path (str): path to the spooled file.
+            size (Optional[int], optional): size of the stream data in bytes,
+                checked by `finish`. Defaults to None.
+            max_size (Optional[int], optional): maximum size of the stream
+                data in bytes, None means unlimited. Defaults to None.
+        """
+        self.file_path = file_path
+        self.file: IO[bytes] = open(file_path, 'wb')
+        self.expected_size = size
+        self.max_size = max_size
+        self.n_received = 0
+
+    def write(self, chunk: bytes) -> bool:
+        """Append a chunk to the file.
+
+        Args:
+            chunk (bytes): the next bytes of the stream data.
+
+        Returns:
+            bool: False if the stream data exceeds `max_size`, in which case
+                the chunk is not written.
+        """
+        if self.max_size is not None and \
+                self.n_received + len(chunk) > self.max_size:
+            return False
+        self.file.write(chunk)
+        self.n_received += len(chunk)
+        return True
+
+    def finish(self) -> bool:
+        """Close the file once every chunk is written.
+
+        Returns:
+            bool: False if the size of the stream data is not the announced
+                one, in which case the upload is aborted.
+        """
+        if self.expected_size is not None and \
+                self.n_received != self.expected_size:
+            self.abort()
+            return False
+        self.file.close()
+        return True
+
+    def abort(self) -> None:
+        """Drop the upload."""
+        self.file.close()
+        StreamBuffer.remove(self.file_path)
 
 
 class StreamBuffer:
-    """Temporarily stores the stream data from the viewer.
+    """Keeps the file of the last complete upload of a session, until the
+    next upload completes or the buffer is discarded, the pipeline loads it
+    by path.
 
-    Occupies relatively large memory whereas not frequently queried or updated.
+    Each viewer uploads to its own `StreamUpload`, created by `begin`, so
+    that the concurrent uploads of the viewers do not mix, and the last
+    one completed replaces the file.
     """
 
-    def __init__(self):
-        self.stream_data = None
+    def __init__(self, upload_dir: str, prefix: str = '') -> None:
+        """
+        Args:
+            upload_dir (str): directory of the spooled files.
+            prefix (str, optional): prefix of the file names. Defaults to
+                ''.
+        """
+        self.upload_dir = upload_dir
+        self.prefix = prefix
+        # file of the last complete upload
+        self.file_path: Optional[str] = None
+
+    def begin(self,
+              size: Optional[int] = None,
+              max_size: Optional[int] = None) -> StreamUpload:
+        """Start a new upload.
+
+        Args:
+            size (Optional[int], optional): size of the stream data in bytes,
+                checked once the upload is finished. Defaults to None.
+            max_size (Optional[int], optional): maximum size of the stream
+                data in bytes, None means unlimited. Defaults to None.
+
+        Returns:
+            StreamUpload: the upload.
+        """
+        file_path = os.path.join(self.upload_dir,
+                                 f'{self.prefix}{uuid.uuid4()}.sd')
+        return StreamUpload(file_path, size=size, max_size=max_size)
+
+    def finish(self, upload: StreamUpload) -> bool:
+        """Complete an upload, whose file replaces the one of the previous
+        upload.
+
+        Args:
+            upload (StreamUpload): the upload started by `begin`.
+
+        Returns:
+            bool: False if the size of the stream data is not the announced
+                one, in which case the upload is dropped.
+        """
+        if not upload.finish():
+            return False
+        self.remove(self.file_path)
+        self.file_path = upload.file_path
+        return True
+
+    def discard(self) -> None:
+        """Drop the last complete upload."""
+        self.remove(self.file_path)
+        self.file_path = None
+
+    @staticmethod
+    def remove(file_path: Optional[str]) -> None:
+        if file_path is None:
+            return
+        try:
+            os.unlink(file_path)
+        except FileNotFoundError:
+            pass
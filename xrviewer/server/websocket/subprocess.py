@@ -51,7 +51,13 @@ class WebSocketServerSubprocess:
                  websocket_port: int,
                  zmq_port: Optional[int] = None,
                  ip_address: str = '127.0.0.1',
-                 logger: Union[None, str, logging.Logger] = None) -> None:
+                 logger: Union[None, str, logging.Logger] = None,
+                 vertex_encoding: str = 'raw',
+                 max_viewers: int = 1,
+                 playhead_mode: str = 'shared',
+                 send_queue_size: int = 16,
+                 send_policy: str = 'block',
+                 max_upload_size: int = 4 * 1024**3) -> None:
         """
 
         Args:
@@ -63,6 +69,18 @@ class WebSocketServerSubprocess:
                 Defaults to '127.0.0.1'.
             logger (Union[None, str, logging.Logger], optional): Logger for
                 logging. Defaults to None.
+            vertex_encoding (str, optional): encoding of the vertices sent
+                to the viewers that support it. Defaults to 'raw'.
+            max_viewers (int, optional): maximum number of viewers attached
+                at once. Defaults to 1.
+            playhead_mode (str, optional): whether the viewers share a
+                playhead. Defaults to 'shared'.
+            send_queue_size (int, optional): number of messages queued for
+                each viewer. Defaults to 16.
+            send_policy (str, optional): what happens when the send queue of
+                a viewer is full. Defaults to 'block'.
+            max_upload_size (int, optional): maximum size in bytes of the
+                stream data uploaded by a viewer. Defaults to 4 GiB.
 
         Raises:
             ValueError: raises when the zmq port is not available
@@ -83,6 +101,12 @@ class WebSocketServerSubprocess:
         self.pipeline_name = pipeline_name
         self.ip_address = ip_address
         self.logger = logger
+        self.vertex_encoding = vertex_encoding
+        self.max_viewers = max_viewers
+        self.playhead_mode = playhead_mode
+        self.send_queue_size = send_queue_size
+        self.send_policy = send_policy
+        self.max_upload_size = max_upload_size
 
         self.log_level_pattern = re.compile(
             r'\b(DEBUG|INFO|WARNING|ERROR|CRITICAL)\b')
@@ -151,7 +175,13 @@ class WebSocketServerSubprocess:
             f"pipeline_name='{self.pipeline_name}',"
             f'zmq_port={self.zmq_port},'
             f'websocket_port={self.websocket_port},'
-            f"ip_address='{self.ip_address}'); "
+            f"ip_address='{self.ip_address}',"
+            f"vertex_encoding='{self.vertex_encoding}',"
+            f'max_viewers={self.max_viewers},'
+            f"playhead_mode='{self.playhead_mode}',"
+            f'send_queue_size={self.send_queue_size},'
+            f"send_policy='{self.send_policy}',"
+            f'max_upload_size={self.max_upload_size}); '
             'ws_server.run()'
         ]
         self.ws_server_process = self.ws_server_process = Popen(
@@ -0,0 +1,121 @@
+import asyncio
+import logging
+import threading
+import uuid
+from typing import Optional, Union
+
+from .server import WebSocketServer
+
+
+class WebSocketServerThread:
+    """Run the websocket server on a thread of the pipeline process.
+
+    The pipeline connects to the server over an inproc zmq url, which skips
+    the websocket server subprocess and the tcp hop, and passes the frames
+    by reference with the 'in_process' transport. The server runs on its
+    own event loop, so that it keeps serving the viewers while the pipeline
+    computes the frames, the GIL being released by the socket and numpy
+    calls.
+    """
+
+    def __init__(self,
+                 pipeline_name: str,
+                 websocket_port: int,
+                 logger: Union[None, str, logging.Logger] = None,
+                 vertex_encoding: str = 'raw',
+                 max_viewers: int = 1,
+                 playhead_mode: str = 'shared',
+                 send_queue_size: int = 16,
+                 send_policy: str = 'block',
+                 max_upload_size: int = 4 * 1024**3) -> None:
+        """
+
+        Args:
+            pipeline_name (str): name of the pipeline.
+            websocket_port (int): port exposed to websocket clients.
+            logger (Union[None, str, logging.Logger], optional): Logger for
+                logging. Defaults to None.
+            vertex_encoding (str, optional): encoding of the vertices sent
+                to the viewers that support it. Defaults to 'raw'.
+            max_viewers (int, optional): maximum number of viewers attached
+                at once. Defaults to 1.
+            playhead_mode (str, optional): whether the viewers share a
+                playhead. Defaults to 'shared'.
+            send_queue_size (int, optional): number of messages queued for
+                each viewer. Defaults to 16.
+            send_policy (str, optional): what happens when the send queue of
+                a viewer is full. Defaults to 'block'.
+            max_upload_size (int, optional): maximum size in bytes of the
+                stream data uploaded by a viewer. Defaults to 4 GiB.
+        """
+        self.pipeline_name = pipeline_name
+        self.websocket_port = websocket_port
+        if logger is None or isinstance(logger, str):
+            self.logger = logging.getLogger(logger)
+        else:
+            self.logger = logger
+        self.vertex_encoding = vertex_encoding
+        self.max_viewers = max_viewers
+        self.playhead_mode = playhead_mode
+        self.send_queue_size = send_queue_size
+        self.send_policy = send_policy
+        self.max_upload_size = max_upload_size
+
+        self.zmq_url = f'inproc://xrviewer-{uuid.uuid4().hex}'
+        self.ws_server: Optional[WebSocketServer] = None
+        self.thread: Optional[threading.Thread] = None
+        self.started = threading.Event()
+        self.start_error: Optional[BaseException] = None
+
+    def serve(self) -> None:
+        """Create the websocket server on a new event loop and run it."""
+        asyncio.set_event_loop(asyncio.new_event_loop())
+        try:
+            self.ws_server = WebSocketServer(
+                pipeline_name=self.pipeline_name,
+                zmq_port=0,
+                websocket_port=self.websocket_port,
+                ip_address='127.0.0.1',
+                vertex_encoding=self.vertex_encoding,
+                max_viewers=self.max_viewers,
+                playhead_mode=self.playhead_mode,
+                send_queue_size=self.send_queue_size,
+                send_policy=self.send_policy,
+                max_upload_size=self.max_upload_size,
+                zmq_url=self.zmq_url)
+        except BaseException as error:
+            self.start_error = error
+            return
+        finally:
+            self.started.set()
+
+        self.ws_server.run()
+
+    def start(self) -> str:
+        """Start the websocket server on a daemon thread.
+
+        Returns:
+            str: inproc zmq url of the websocket server.
+
+        Raises:
+            Exception: the error raised when creating the websocket server,
+                e.g. when the websocket port is not available.
+        """
+        self.thread = threading.Thread(target=self.serve, daemon=True)
+        self.thread.start()
+        # the pipeline connects once the zmq socket is bound
+        self.started.wait()
+        if self.start_error is not None:
+            self.logger.error(
+                f'Failed to start the websocket server: {self.start_error}')
+            raise self.start_error
+
+        return self.zmq_url
+
+    def stop(self) -> None:
+        """Stop the event loop of the websocket server."""
+        if self.ws_server is None:
+            return
+        ioloop = self.ws_server.ioloop
+        ioloop.add_callback(ioloop.stop)
+        self.ws_server = None
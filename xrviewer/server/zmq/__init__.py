@@ -1,7 +1,13 @@
 # yapf: disable
 from .handler import ZMQHandler
+from .in_process import FrameReferences
+from .shared_memory import SharedMemoryReader, SharedMemoryRing, TransportEnum
 
 # yapf: enable
 __all__ = [
     'ZMQHandler',
+    'FrameReferences',
+    'SharedMemoryReader',
+    'SharedMemoryRing',
+    'TransportEnum',
 ]
@@ -1,11 +1,19 @@
 import logging
 import sys
+import time
 from threading import Thread
-from typing import Any, Dict, Union
+from typing import Any, Dict, Optional, Tuple, Union
 
+import numpy as np
 import umsgpack
 import zmq
 
+from ..actions import PipelineActionsEnum
+from ..utils import StageEnum, StageMetrics, pack_ndarray
+from ..websocket.state import State
+from .in_process import frame_references
+from .shared_memory import SharedMemoryRing, TransportEnum
+
 
 class PingThread(Thread):
 
@@ -23,37 +31,232 @@ class PingThread(Thread):
 
 
 class ZMQHandler:
-    """for pipeline interop with the websocket server."""
+    """for pipeline interop with the websocket server.
+
+    Messages are pipelined over a DEALER socket: every message is tagged with
+    a sequence number and acknowledged by the websocket server. Writes do not
+    wait for their acknowledgement as long as less than `window_size`
+    messages are in flight, so that the next frame can be computed while the
+    previous ones are still on their way. Reads wait for the reply to their
+    own request.
+
+    The handler subscribes to the state of the websocket server, which pushes
+    the changes made by the viewer over the same socket. They are applied to
+    `self.state` whenever a message is received, see `poll_state`.
+
+    With the 'shared_memory' transport, the vertices of the frames are
+    written to a `SharedMemoryRing` of `window_size` slots, and only their
+    location is sent over the socket. With the 'in_process' transport, they
+    are passed by reference to the websocket server running in the process,
+    see `FrameReferences`.
 
-    context = zmq.Context()  # pylint: disable=abstract-class-instantiated
+    The time spent packing the messages and the round trip of each message
+    until it is acknowledged are recorded in `self.metrics`.
+    """
+
+    # shared with the websocket servers running in the process, so that they
+    # can be reached over inproc urls
+    context = zmq.Context.instance()
 
     def __init__(self,
                  zmq_port: int,
                  ip_address: str,
-                 logger: Union[None, str, logging.Logger] = None):
-        self.logger = logger
+                 logger: Union[None, str, logging.Logger] = None,
+                 window_size: int = 8,
+                 pipeline_name: Optional[str] = None,
+                 transport: str = TransportEnum.ZMQ,
+                 zmq_url: Optional[str] = None,
+                 metrics: Optional[StageMetrics] = None):
+        """
+        Args:
+            zmq_port (int): port that the websocket server exposed to
+                interop with pipeline.
+            ip_address (str): ip address of the websocket server.
+            logger (Union[None, str, logging.Logger], optional): Logger for
+                logging. Defaults to None.
+            window_size (int, optional): maximum number of messages sent
+                without being acknowledged by the websocket server.
+                Defaults to 8.
+            pipeline_name (Optional[str], optional): name of the pipeline,
+                reported to the websocket server when subscribing to the
+                state. Defaults to None.
+            transport (str, optional): how the vertices of the frames are
+                sent to the websocket server, see `TransportEnum`.
+                Defaults to 'zmq'.
+            zmq_url (Optional[str], optional): url of the websocket server,
+                which overrides `ip_address` and `zmq_port`, e.g. the inproc
+                url of a websocket server running in the process. Defaults
+                to None.
+            metrics (Optional[StageMetrics], optional): histograms recording
+                the serialization and round trip time of the messages. None
+                creates them. Defaults to None.
 
+        Raises:
+            ValueError: raises when the window size is not positive.
+        """
         self.logger = logger
+        if window_size < 1:
+            msg = f'window size should be positive, got {window_size}'
+            self.logger.error(msg)
+            raise ValueError(msg)
+
         self.zmq_port = zmq_port
-        self.client = self.context.socket(zmq.REQ)
-        zmq_url = f'tcp://{ip_address}:{self.zmq_port}'
+        self.window_size = window_size
+        self.n_in_flight = 0
+        self.seq = 0
+        self.metrics = StageMetrics() if metrics is None else metrics
+        # time each message in flight was sent, keyed by sequence number
+        self.send_times: Dict[int, float] = {}
+        # moving average of the round trips in seconds, which grows when the
+        # websocket server withholds the acknowledgements of slow viewers
+        self.round_trip_time = 0.0
+        self.client = self.context.socket(zmq.DEALER)
+        if zmq_url is None:
+            zmq_url = f'tcp://{ip_address}:{self.zmq_port}'
         self.client.connect(zmq_url)
         self.assert_connected()
 
-    def send(self, command):
-        """Send a message to websocket server."""
+        self.transport = TransportEnum(transport)
+        self.ring = SharedMemoryRing(window_size) \
+            if self.transport == TransportEnum.SHARED_MEMORY else None
+
+        self.pipeline_name = pipeline_name
+        self.state = State()
+        self.subscribe_state()
+
+    def recv(self) -> Optional[Tuple[int, bytes]]:
+        """Receive the next message from the websocket server.
+
+        Returns:
+            Optional[Tuple[int, bytes]]: sequence number of the replied
+                message and the reply, None if the message is a state change,
+                which is applied to `self.state`.
+        """
+        msg_type, seq, data = self.client.recv_multipart()
+        if msg_type.decode('utf-8') == PipelineActionsEnum.PUBLISH_STATE:
+            self.state.update(umsgpack.unpackb(data))
+            return None
+
+        self.n_in_flight -= 1
+        seq = int.from_bytes(seq, 'big')
+        send_time = self.send_times.pop(seq, None)
+        if send_time is not None:
+            round_trip_time = time.perf_counter() - send_time
+            self.metrics.observe(StageEnum.ZMQ_ROUND_TRIP, round_trip_time)
+            self.round_trip_time += 0.1 * (
+                round_trip_time - self.round_trip_time)
+
+        return seq, data
+
+    def recv_reply(self) -> Tuple[int, bytes]:
+        """Receive the next reply or acknowledgement from the websocket
+        server, applying the state changes received meanwhile.
+
+        Returns:
+            Tuple[int, bytes]: sequence number of the replied message and
+                the reply.
+        """
+        while True:
+            res = self.recv()
+            if res is not None:
+                return res
+
+    def poll_state(self, timeout_in_sec: Optional[float] = 0) -> bool:
+        """Apply the state changes pushed by the websocket server.
+
+        Args:
+            timeout_in_sec (Optional[float], optional): maximum time in
+                seconds to wait for a state change. None means waiting
+                until the state changes. Defaults to 0.
+
+        Returns:
+            bool: whether the state has changed.
+        """
+        timeout = None if timeout_in_sec is None else timeout_in_sec * 1000
+        changed = False
+        while self.client.poll(timeout):
+            if self.recv() is None:
+                changed = True
+                # keep applying the pending changes without blocking
+                timeout = 0
+
+        return changed
+
+    def subscribe_state(self) -> None:
+        """Fetch the whole state of the websocket server, after which only
+        the changes are pushed.
+
+        The pipeline is registered as a worker of the websocket server, which
+        binds it to a session when a viewer opens one.
+        """
+        reply = self.send({
+            'type': PipelineActionsEnum.SUBSCRIBE_STATE,
+            'data': {
+                'pipeline_name': self.pipeline_name,
+                'transport': self.transport.value
+            }
+        })
+        self.state.update(umsgpack.unpackb(reply))
+
+    def send(self, command: Dict, wait_reply: bool = True) -> Optional[bytes]:
+        """Send a message to websocket server.
+
+        Args:
+            command (Dict): the message, with its type in `command['type']`.
+            wait_reply (bool, optional): whether to wait for the reply of
+                this message. If False, only wait until the number of
+                messages in flight is below the window size. Defaults to
+                True.
+
+        Returns:
+            Optional[bytes]: the reply if `wait_reply` is True.
+        """
+        return self.send_packed(command['type'], umsgpack.packb(command),
+                                wait_reply)
+
+    def send_packed(self,
+                    _type: str,
+                    payload: bytes,
+                    wait_reply: bool = True) -> Optional[bytes]:
+        """Send a message packed by the caller, see `send`.
+
+        Args:
+            _type (str): type of the message.
+            payload (bytes): the packed message.
+            wait_reply (bool, optional): whether to wait for the reply of
+                this message. Defaults to True.
+
+        Returns:
+            Optional[bytes]: the reply if `wait_reply` is True.
+        """
+        self.seq += 1
+        seq = self.seq
         self.client.send_multipart(
-            [command['type'].encode('utf-8'),
-             umsgpack.packb(command)])
+            [_type.encode('utf-8'),
+             seq.to_bytes(8, 'big'), payload])
+        self.n_in_flight += 1
+        self.send_times[seq] = time.perf_counter()
+
+        if wait_reply:
+            # replies may come back out of order, e.g. when the server
+            # withholds the acknowledgement of a frame queued for a slow
+            # viewer, so they are matched by their sequence number
+            while True:
+                reply_seq, reply = self.recv_reply()
+                if reply_seq == seq:
+                    return reply
+
+        while self.n_in_flight >= self.window_size:
+            self.recv_reply()
 
-        return umsgpack.packb(self.client.recv())
+    def flush(self) -> None:
+        """Wait until every message in flight is acknowledged."""
+        while self.n_in_flight > 0:
+            self.recv_reply()
 
     def send_ping(self):
         """Ping to the websocket server."""
-        msg_type = 'ping'
-        msg_data = umsgpack.packb({'type': msg_type})
-        self.client.send_multipart([msg_type.encode('utf-8'), msg_data])
-        res = self.client.recv()
+        res = self.send({'type': PipelineActionsEnum.PING})
 
         return umsgpack.unpackb(res)
 
@@ -89,10 +292,65 @@ class ZMQHandler:
             self.logger.error(e)
             sys.exit()
 
-    def write(self, _type: str, _data: Union[Dict, str, int, None] = None):
-        """write data to the websocket server."""
-        return self.send({'type': _type, 'data': _data})
+    def write(self,
+              _type: str,
+              _data: Union[Dict, np.ndarray, str, int, None] = None):
+        """write data to the websocket server.
 
-    def read(self, _type: str):
+        Arrays, either passed directly or as values of a dict, are sent as
+        raw buffers with a small dtype/shape header.
+        """
+        with self.metrics.time(StageEnum.SERIALIZATION):
+            if isinstance(_data, np.ndarray):
+                _data = pack_ndarray(_data)
+            elif isinstance(_data, dict):
+                _data = _data.copy()
+                if _type == PipelineActionsEnum.UPDATE_MESH_VERTICES:
+                    if self.ring is not None:
+                        _data['verts'] = self.write_shared(_data['verts'])
+                    elif self.transport == TransportEnum.IN_PROCESS:
+                        _data['verts'] = frame_references.put(_data['verts'])
+                for key, value in _data.items():
+                    if isinstance(value, np.ndarray):
+                        _data[key] = pack_ndarray(value)
+            payload = umsgpack.packb({'type': _type, 'data': _data})
+        self.send_packed(_type, payload, wait_reply=False)
+
+    def write_shared(self, array: np.ndarray) -> Dict[str, Any]:
+        """Write an array to the next slot of the shared memory ring.
+
+        Args:
+            array (np.ndarray): the array.
+
+        Returns:
+            Dict[str, Any]: location of the array in the ring.
+        """
+        if not self.ring.fits(array.nbytes):
+            # the websocket server reads the previous block until the frames
+            # in flight are received
+            self.flush()
+            self.ring.resize(array.nbytes)
+            self.logger.info('[ZMQHandler] Allocated shared memory slots of '
+                             f'{self.ring.slot_size} bytes.')
+
+        return self.ring.write(array)
+
+    def close(self) -> None:
+        """Release the shared memory ring."""
+        if self.ring is not None:
+            self.ring.close()
+
+    def read(self, _type: str) -> bytes:
         """read data from the websocket server."""
         return self.send({'type': _type})
+
+    def request_stream_data(self) -> Optional[str]:
+        """Request the stream data uploaded by the viewer.
+
+        Returns:
+            Optional[str]: path to the file spooled by the websocket server,
+                None if no stream data has been uploaded.
+        """
+        reply = self.read(PipelineActionsEnum.REQUEST_STREAM_DATA)
+
+        return umsgpack.unpackb(reply)['file_path']
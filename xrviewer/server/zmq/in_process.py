@@ -0,0 +1,64 @@
+import itertools
+from typing import Any, Dict
+
+import numpy as np
+
+from .shared_memory import pack_frame_message
+
+
+class FrameReferences:
+    """Frames passed by reference from the pipelines to the websocket
+    servers running in the same process, see `TransportEnum.IN_PROCESS`.
+
+    The pipeline puts the vertices of a frame before sending its message,
+    and the websocket server takes them when it receives the message, so
+    that the vertices are only copied once, into the message sent to the
+    viewers. The frames must not be modified afterwards, as for
+    `FrameCache.put`.
+    """
+
+    def __init__(self) -> None:
+        # dict operations are atomic, the pipeline and the websocket server
+        # run on different threads
+        self.frames: Dict[int, np.ndarray] = {}
+        self.frame_ids = itertools.count()
+
+    def __len__(self) -> int:
+        return len(self.frames)
+
+    def put(self, array: np.ndarray) -> Dict[str, Any]:
+        """Keep an array until the websocket server takes it.
+
+        Args:
+            array (np.ndarray): the array.
+
+        Returns:
+            Dict[str, Any]: reference of the array, which replaces the array
+                packed by `pack_ndarray` in the message.
+        """
+        frame_id = next(self.frame_ids)
+        self.frames[frame_id] = np.ascontiguousarray(
+            array, dtype=array.dtype.newbyteorder('<'))
+
+        return {'ref': frame_id}
+
+    def read_message(self, cmd: Dict[str, Any]) -> bytes:
+        """Pack a vertex message whose vertices are passed by reference, see
+        `pack_frame_message`.
+
+        Args:
+            cmd (Dict[str, Any]): the unpacked message, with the reference of
+                the vertices in `cmd['data']['verts']`.
+
+        Returns:
+            bytes: the packed message.
+        """
+        array = self.frames.pop(cmd['data']['verts']['ref'])
+
+        return pack_frame_message(cmd, array.dtype.name, list(array.shape),
+                                  memoryview(array).cast('B'))
+
+
+# frames in flight between the pipelines and the websocket servers of the
+# process
+frame_references = FrameReferences()
@@ -0,0 +1,183 @@
+import uuid
+from enum import Enum
+from multiprocessing import resource_tracker, shared_memory
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import umsgpack
+
+# msgpack of an empty binary, the placeholder of the vertices of a frame
+EMPTY_BIN = b'\xc4\x00'
+
+
+class TransportEnum(str, Enum):
+    # the frames are copied into the zmq messages
+    ZMQ = 'zmq'
+    # the frames are written to shared memory, and only their location is
+    # sent over zmq, for the pipelines on the host of the websocket server
+    SHARED_MEMORY = 'shared_memory'
+    # the websocket server runs on a thread of the pipeline process, and the
+    # frames are passed by reference
+    IN_PROCESS = 'in_process'
+
+
+def pack_frame_message(cmd: Dict[str, Any], dtype: str, shape: List[int],
+                       buffer: memoryview) -> bytes:
+    """Pack a vertex message whose vertices are not in the message, as if
+    they had been packed by `pack_ndarray`.
+
+    The vertices are copied once, from the buffer into the packed message.
+
+    Args:
+        cmd (Dict[str, Any]): the unpacked message, whose vertices in
+            `cmd['data']['verts']` are replaced.
+        dtype (str): little-endian dtype of the vertices.
+        shape (List[int]): shape of the vertices.
+        buffer (memoryview): raw bytes of the vertices.
+
+    Returns:
+        bytes: the packed message.
+    """
+    # the vertices are packed last, after a placeholder replaced with the
+    # binary header of the vertices
+    data = {key: value for key, value in cmd['data'].items() if key != 'verts'}
+    data['verts'] = {'dtype': dtype, 'shape': shape, 'buffer': b''}
+    head = umsgpack.packb({'type': cmd['type'], 'data': data})
+    n_bytes = buffer.nbytes
+    if n_bytes < 2**8:
+        bin_header = b'\xc4' + n_bytes.to_bytes(1, 'big')
+    elif n_bytes < 2**16:
+        bin_header = b'\xc5' + n_bytes.to_bytes(2, 'big')
+    else:
+        bin_header = b'\xc6' + n_bytes.to_bytes(4, 'big')
+
+    return b''.join([head[:-len(EMPTY_BIN)], bin_header, buffer])
+
+
+class SharedMemoryRing:
+    """Ring of slots in shared memory, written by the pipeline with the
+    vertices of the frames sent to the websocket server.
+
+    A slot is written again once as many frames have been sent as there are
+    slots. The websocket server copies each frame out of its slot when it
+    receives the message, before acknowledging it, so that a ring of
+    `n_slots` slots is never overwritten while it is read as long as at most
+    `n_slots` messages are in flight. The slots grow with the frames,
+    replacing the shared memory block.
+    """
+
+    # granularity of the slot size
+    SLOT_ALIGNMENT = 1024 * 1024
+
+    def __init__(self, n_slots: int) -> None:
+        """
+        Args:
+            n_slots (int): number of slots, at least the number of messages
+                in flight.
+        """
+        self.n_slots = n_slots
+        self.slot_size = 0
+        self.next_slot = 0
+        self.block: Optional[shared_memory.SharedMemory] = None
+
+    def fits(self, nbytes: int) -> bool:
+        """Whether a frame of `nbytes` bytes fits in a slot."""
+        return nbytes <= self.slot_size
+
+    def resize(self, nbytes: int) -> None:
+        """Replace the shared memory block with slots of at least `nbytes`
+        bytes. The frames of the previous block must have been received.
+
+        Args:
+            nbytes (int): size of the frames in bytes.
+        """
+        self.close()
+        self.slot_size = max(
+            -(-nbytes // self.SLOT_ALIGNMENT) * self.SLOT_ALIGNMENT,
+            self.SLOT_ALIGNMENT)
+        self.block = shared_memory.SharedMemory(
+            name=f'xrviewer_{uuid.uuid4().hex[:16]}',
+            create=True,
+            size=self.slot_size * self.n_slots)
+        self.next_slot = 0
+
+    def write(self, array: np.ndarray) -> Dict[str, Any]:
+        """Write an array to the next slot.
+
+        Args:
+            array (np.ndarray): the array, which must fit in a slot.
+
+        Returns:
+            Dict[str, Any]: location of the array, which replaces the array
+                packed by `pack_ndarray` in the message.
+        """
+        dtype = array.dtype.newbyteorder('<')
+        offset = self.next_slot * self.slot_size
+        slot = np.ndarray(
+            array.shape, dtype=dtype, buffer=self.block.buf, offset=offset)
+        np.copyto(slot, array)
+        self.next_slot = (self.next_slot + 1) % self.n_slots
+
+        return {
+            'dtype': dtype.name,
+            'shape': list(array.shape),
+            'shm': self.block.name,
+            'offset': offset,
+            'nbytes': array.nbytes,
+        }
+
+    def close(self) -> None:
+        if self.block is None:
+            return
+        self.block.close()
+        self.block.unlink()
+        self.block = None
+
+
+class SharedMemoryReader:
+    """Read the frames written by the `SharedMemoryRing` of a pipeline."""
+
+    def __init__(self) -> None:
+        self.block: Optional[shared_memory.SharedMemory] = None
+
+    def attach(self, name: str) -> shared_memory.SharedMemory:
+        """Attach the shared memory block of the ring, releasing the
+        previous one, which is not written anymore once replaced."""
+        if self.block is not None and self.block.name == name:
+            return self.block
+        self.close()
+        # the block belongs to the pipeline, which unlinks it
+        try:
+            self.block = shared_memory.SharedMemory(name=name, track=False)
+        except TypeError:
+            # python < 3.13 always tracks the block
+            self.block = shared_memory.SharedMemory(name=name)
+            resource_tracker.unregister(self.block._name, 'shared_memory')
+        return self.block
+
+    def read_message(self, cmd: Dict[str, Any]) -> bytes:
+        """Pack a vertex message whose vertices are in shared memory, see
+        `pack_frame_message`.
+
+        Args:
+            cmd (Dict[str, Any]): the unpacked message, with the location of
+                the vertices in `cmd['data']['verts']`.
+
+        Returns:
+            bytes: the packed message.
+        """
+        location = cmd['data']['verts']
+        block = self.attach(location['shm'])
+        begin = location['offset']
+        buffer = block.buf[begin:begin + location['nbytes']]
+        message = pack_frame_message(cmd, location['dtype'], location['shape'],
+                                     buffer)
+        buffer.release()
+
+        return message
+
+    def close(self) -> None:
+        if self.block is None:
+            return
+        self.block.close()
+        self.block = None
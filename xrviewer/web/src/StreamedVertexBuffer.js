@@ -3,15 +3,27 @@ export default class StreamedVertexBuffer {
     // a buffer that stores coordinates of smpl vertices sequentially
     this.data = [];
     this.index = [];
+    // faces of each frame, undefined for the faces of the mesh
+    this.faces = [];
+    // time of each frame in seconds, undefined unless the server plays the
+    // frames on its clock
+    this.timestamps = [];
     // whether the buffer should receive the incoming vertex data
     this.isOpen = true;
 
     this.max_buffer_size = 256;
   }
 
-  enqueue(verts: Number[], idx: Number) {
+  enqueue(
+    verts: Float32Array,
+    idx: Number,
+    faces: Int32Array = undefined,
+    timestamp: Number = undefined,
+  ) {
     this.data.push(verts);
     this.index.push(idx);
+    this.faces.push(faces);
+    this.timestamps.push(timestamp);
 
     return true;
   }
@@ -19,19 +31,33 @@ export default class StreamedVertexBuffer {
   // Get the vertices that are on the buffer head
   head() {
     if (this.data.length === 0) {
-      return [undefined, -1];
+      return [undefined, -1, undefined, undefined];
     }
 
-    return [this.data[0], this.index[0]];
+    return [this.data[0], this.index[0], this.faces[0], this.timestamps[0]];
+  }
+
+  // Get the vertices that are on the buffer tail
+  tail() {
+    const last = this.data.length - 1;
+    if (last < 0) {
+      return [undefined, -1, undefined, undefined];
+    }
+
+    return [this.data[last], this.index[last], this.faces[last], this.timestamps[last]];
   }
 
   dequeue() {
-    return [this.data.shift(), this.index.shift()];
+    return [
+      this.data.shift(), this.index.shift(), this.faces.shift(), this.timestamps.shift(),
+    ];
   }
 
   reset() {
     this.data = [];
     this.index = [];
+    this.faces = [];
+    this.timestamps = [];
     this.isOpen = true;
   }
 
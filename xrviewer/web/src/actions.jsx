@@ -1,7 +1,11 @@
 export const ServerActionsEnum = {
   UPDATE_STREAM_DATA: 'UPDATE_STREAM_DATA',
+  UPLOAD_STREAM_DATA_BEGIN: 'UPLOAD_STREAM_DATA_BEGIN',
+  UPLOAD_STREAM_DATA_CHUNK: 'UPLOAD_STREAM_DATA_CHUNK',
+  UPLOAD_STREAM_DATA_END: 'UPLOAD_STREAM_DATA_END',
   UPDATE_MESH_FACES: 'UPDATE_MESH_FACES',
   UPDATE_MESH_VERTICES: 'UPDATE_MESH_VERTICES',
+  UPDATE_TOPOLOGY_FACES: 'UPDATE_TOPOLOGY_FACES',
   UPDATE_IS_PLAYING: 'UPDATE_IS_PLAYING',
   UPDATE_NUM_FRAMES: 'UPDATE_NUM_FRAMES',
   APPEND_VERTEX_DATA: 'APPEND_VERTEX_DATA',
@@ -12,12 +16,15 @@ export const ServerActionsEnum = {
   UPDATE_PIPELINE_NAME: 'UPDATE_PIPELINE_NAME',
   HEART_CHECK: 'HEART_CHECK',
   UPDATE_ALERT_MESSAGE: 'UPDATE_ALERT_MESSAGE',
+  UPDATE_BAKE_PROGRESS: 'UPDATE_BAKE_PROGRESS',
+  UPDATE_PLAYHEAD_CONTROL: 'UPDATE_PLAYHEAD_CONTROL',
 };
 
 export const WebSocketErrorCodeEnum = {
   VIEWER_SHUT_DOWN: 1005,
   FAILED_TO_ESTABLISH_CONNECTION: 1006,
   SERVER_ALREADY_IN_USE: 8001,
+  SERVER_BUSY: 8002,
 };
 
 export const SynchronizeModeEnum = {
@@ -41,3 +48,32 @@ export function sendMessage(_webSocket: WebSocket, _type: String, _data) {
 
   return false;
 }
+
+// bytes of the stream data read and sent at once
+const UPLOAD_CHUNK_SIZE = 4 * 1024 * 1024;
+// chunks waiting to be sent by the websocket before reading the next one
+const UPLOAD_MAX_BUFFERED_CHUNKS = 4;
+
+// Upload a file in chunks, which are read from the disk as they are sent,
+// so that neither the viewer nor the server holds the whole file in memory.
+export async function sendStreamData(_webSocket: WebSocket, _file: File) {
+  if (!sendMessage(_webSocket, ServerActionsEnum.UPLOAD_STREAM_DATA_BEGIN, {
+    size: _file.size,
+  })) return false;
+
+  for (let offset = 0; offset < _file.size; offset += UPLOAD_CHUNK_SIZE) {
+    // eslint-disable-next-line no-await-in-loop
+    const chunk = await _file.slice(offset, offset + UPLOAD_CHUNK_SIZE).arrayBuffer();
+    while (_webSocket.bufferedAmount > UPLOAD_MAX_BUFFERED_CHUNKS * UPLOAD_CHUNK_SIZE) {
+      // eslint-disable-next-line no-await-in-loop
+      await new Promise((resolve) => { setTimeout(resolve, 10); });
+    }
+    if (!sendMessage(
+      _webSocket,
+      ServerActionsEnum.UPLOAD_STREAM_DATA_CHUNK,
+      new Uint8Array(chunk),
+    )) return false;
+  }
+
+  return sendMessage(_webSocket, ServerActionsEnum.UPLOAD_STREAM_DATA_END, null);
+}
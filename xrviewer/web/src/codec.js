@@ -0,0 +1,77 @@
+const TypedArrays = {
+  float32: Float32Array,
+  int32: Int32Array,
+  uint32: Uint32Array,
+  int16: Int16Array,
+  uint16: Uint16Array,
+  int8: Int8Array,
+  uint8: Uint8Array,
+};
+
+// Decode an array packed by the server as {dtype, shape, buffer}, the
+// buffer is copied once so that the typed array is properly aligned.
+export function decodeNdarray(packed) {
+  const TypedArray = TypedArrays[packed.dtype];
+  if (TypedArray === undefined) {
+    throw new Error(`Unsupported dtype: ${packed.dtype}`);
+  }
+  const { buffer } = packed;
+  const bytes = buffer.buffer.slice(
+    buffer.byteOffset,
+    buffer.byteOffset + buffer.byteLength,
+  );
+
+  return new TypedArray(bytes);
+}
+
+// Reconstruct the vertices encoded as 16-bit quantized keyframes and
+// per-frame deltas. Frames must be decoded in the order they are received.
+export class QuantizedDeltaDecoder {
+  constructor() {
+    this.origin = null;
+    this.step = null;
+    this.q = null;
+  }
+
+  decode(encoded) {
+    const q = decodeNdarray(encoded.q);
+    if (encoded.kind === 'key') {
+      this.origin = encoded.origin;
+      this.step = encoded.step;
+      this.q = Int32Array.from(q);
+    } else {
+      if (this.q === null) {
+        throw new Error('Received a delta frame before any keyframe');
+      }
+      for (let i = 0; i < q.length; i++) {
+        this.q[i] += q[i];
+      }
+    }
+
+    const verts = new Float32Array(this.q.length);
+    for (let i = 0; i < verts.length; i++) {
+      verts[i] = this.origin[i % 3] + this.q[i] * this.step[i % 3];
+    }
+
+    return verts;
+  }
+}
+
+export const VertexEncodingEnum = {
+  RAW: 'raw',
+  QUANTIZED_DELTA: 'quantized_delta',
+};
+
+// Encodings the viewer is able to decode, in order of preference
+export const supportedVertexEncodings = [
+  VertexEncodingEnum.QUANTIZED_DELTA,
+  VertexEncodingEnum.RAW,
+];
+
+export function decodeVertices(encoded, decoder: QuantizedDeltaDecoder) {
+  if (encoded.encoding === VertexEncodingEnum.QUANTIZED_DELTA) {
+    return decoder.decode(encoded);
+  }
+
+  return decodeNdarray(encoded);
+}
@@ -7,7 +7,7 @@ import {
 import * as BABYLON from '@babylonjs/core';
 import { Item } from '../../Common/UIComponents';
 import { WebSocketContext } from '../../WebSocket/WebSocket';
-import { ServerActionsEnum, sendMessage } from '../../../actions';
+import { ServerActionsEnum, sendMessage, sendStreamData } from '../../../actions';
 import { ViewerState } from '../../../reducer';
 
 export type AnimationPanelProps = {
@@ -79,46 +79,31 @@ export default function MeshPanel(props: AnimationPanelProps) {
   const handleStreamDataInput = (event) => {
     const uploadedStreamData = event.target.files[0];
 
-    const promise = new Promise((resolve) => {
-      const reader = new FileReader();
-
-      reader.onload = (res) => {
-        const buffer = res.target.result;
+    dispatch({
+      type: 'write',
+      path: 'streaming/frameIndex',
+      data: 0,
+    });
 
-        const uint8Array = new Uint8Array(buffer);
-        resolve(uint8Array);
-      };
+    dispatch({
+      type: 'write',
+      path: 'streaming/reloadFlag',
+      data: true,
+    });
 
-      reader.readAsArrayBuffer(uploadedStreamData);
+    dispatch({
+      type: 'write',
+      path: 'streaming/meshVertices',
+      data: null,
     });
 
-    promise.then((fileContent) => {
-      dispatch({
-        type: 'write',
-        path: 'streaming/frameIndex',
-        data: 0,
-      });
-
-      dispatch({
-        type: 'write',
-        path: 'streaming/reloadFlag',
-        data: true,
-      });
-
-      dispatch({
-        type: 'write',
-        path: 'streaming/meshVertices',
-        data: null,
-      });
-
-      dispatch({
-        type: 'write',
-        path: 'streaming/meshFaces',
-        data: null,
-      });
-      sendMessage(webSocket, ServerActionsEnum.UPDATE_FRAME_INDEX, 0);
-      sendMessage(webSocket, ServerActionsEnum.UPDATE_STREAM_DATA, fileContent);
+    dispatch({
+      type: 'write',
+      path: 'streaming/meshFaces',
+      data: null,
     });
+    sendMessage(webSocket, ServerActionsEnum.UPDATE_FRAME_INDEX, 0);
+    sendStreamData(webSocket, uploadedStreamData);
   };
 
   const objectLocation = useSelector(
@@ -44,6 +44,10 @@ export function StreamedTimelinePanel() {
     (state) => state.streaming.numFrames,
   );
 
+  const bakeProgress = useSelector(
+    (state) => state.streaming.bakeProgress,
+  );
+
   const dispatch = useDispatch();
 
   const setPlaying = (_isPlaying: Boolean) => {
@@ -148,6 +152,8 @@ export function StreamedTimelinePanel() {
           <Grid item xs={2}>
             <Item elevation={0}>
               <font id="frameCached">0</font>
+              {bakeProgress !== null && bakeProgress < 1
+                && ` (baked ${Math.round(bakeProgress * 100)}%)`}
             </Item>
           </Grid>
 
@@ -1,5 +1,5 @@
 /* eslint-disable no-param-reassign */
-import React, { useEffect } from 'react';
+import React, { useEffect, useRef } from 'react';
 import { useScene, useBeforeRender } from 'react-babylonjs';
 import * as BABYLON from '@babylonjs/core';
 import '@babylonjs/loaders';
@@ -29,6 +29,41 @@ export type ProceduralMeshProps = {
   currentFrameTimeRef: React.MutableRefObject<Number>,
   desiredFrameIntervalRef: React.MutableRefObject<Number>,
   frameRateRef: React.MutableRefObject<Number>,
+  controlsPlayhead: Boolean,
+}
+
+// Babylon.js indices of the faces received from the server
+const babylonIndices = new WeakMap();
+
+function toBabylonIndices(faces) {
+  if (babylonIndices.has(faces)) return babylonIndices.get(faces);
+
+  // faces are received as a flattened |F|x3 typed array
+  const indices = new Uint32Array(faces.length);
+  for (let i = 0; i < faces.length; i += 3) {
+    /*
+          There exists a polygon winding order gap between the SMPL and
+          the Babylon.js. For arbitrary face 'f' in mesh:
+
+                 o  V1(#VERT1/#UV1/#NORMAL1)
+
+                         V3(#VERT3/#UV3/#NORMAL3)
+           o            o
+             V2(#VERT2/#UV2/#NORMAL2)
+
+          SMPL uses counter-clockwise(CCW) polygon winding order:
+              f #VERT1/#UV1/#NORMAL1 #VERT2/#UV2/#NORMAL2 #VERT3/#UV3/#NORMAL3
+
+          Whereas the Babylon.js uses clockwise(CW) polygon winding order:
+              f #VERT1/#UV1/#NORMAL1 #VERT3/#UV3/#NORMAL3 #VERT2/#UV2/#NORMAL2
+      */
+    indices[i] = faces[i];
+    indices[i + 1] = faces[i + 2];
+    indices[i + 2] = faces[i + 1];
+  }
+  babylonIndices.set(faces, indices);
+
+  return indices;
 }
 
 export function ProceduralMesh(props: ProceduralMeshProps) {
@@ -38,9 +73,25 @@ export function ProceduralMesh(props: ProceduralMeshProps) {
     bufferHeadFrameIndexRef, numFramesRef, shouldClearBufferRef,
     frameCachedDivTextRef, minimumPlayableFrameRef, freezeBufferHeadRef,
     replayFlagRef, prevFrameTimeRef, currentFrameTimeRef, desiredFrameIntervalRef,
-    frameRateRef,
+    frameRateRef, controlsPlayhead,
   } = props;
   const scene = useScene();
+  // faces of the topology displayed, undefined for the faces of the mesh
+  const displayedFacesRef = useRef(undefined);
+  // local time in milliseconds at which the timestamp 0 is presented, for
+  // the frames played on the clock of the server, undefined until the
+  // playback (re)starts
+  const clockOriginRef = useRef(undefined);
+
+  // switch the mesh to the topology of a frame, if it is not displayed yet
+  const applyTopology = (positions, frameFaces) => {
+    if (frameFaces === undefined || frameFaces === displayedFacesRef.current) return;
+    const vertexData = new BABYLON.VertexData();
+    vertexData.indices = toBabylonIndices(frameFaces);
+    vertexData.positions = positions;
+    vertexData.applyToMesh(pMeshRef.current, true);
+    displayedFacesRef.current = frameFaces;
+  };
 
   useBeforeRender(() => {
     if (shouldClearBufferRef.current) {
@@ -63,6 +114,7 @@ export function ProceduralMesh(props: ProceduralMeshProps) {
         bufferHeadFrameIndexRef.current,
       );
       previewFrameSpawnedRef.current = false;
+      clockOriginRef.current = undefined;
       return;
     }
 
@@ -83,9 +135,10 @@ export function ProceduralMesh(props: ProceduralMeshProps) {
 
     let verts_out;
     let idx = -1;
+    let faces_out;
     // preview mesh not spawned, fetch 1-st frame vertices from the buffer
     if (previewFrameSpawnedRef.current === false) {
-      [verts_out, idx] = vertexBuffer.head();
+      [verts_out, idx, faces_out] = vertexBuffer.head();
       // buffer is empty, try re-fetching in the next scene update
       if (verts_out === undefined) return;
       previewFrameSpawnedRef.current = true;
@@ -96,6 +149,7 @@ export function ProceduralMesh(props: ProceduralMeshProps) {
         // vertex buffer is empty, freeze the buffer head
         freezeBufferHeadRef.current = true;
         replayFlagRef.current = false;
+        clockOriginRef.current = undefined;
       } else if (vertexBuffer.length() >= minimumPlayableFrameRef.current) {
         // frame count in vertex buffer is enough for playing for
         // some specified time, unfreeze the buffer
@@ -106,7 +160,16 @@ export function ProceduralMesh(props: ProceduralMeshProps) {
 
       // if vertex buffer head is frozen, skip dequeue
       if (freezeBufferHeadRef.current === false) {
-        if (Number(frameRateRef.current) < 60) {
+        const headTimestamp = vertexBuffer.head()[3];
+        if (headTimestamp !== undefined) {
+          // the server plays the frames on its clock, present each frame at
+          // its timestamp
+          const now = Date.now();
+          if (clockOriginRef.current === undefined) {
+            clockOriginRef.current = now - headTimestamp * 1000;
+          }
+          if (now < clockOriginRef.current + headTimestamp * 1000) return;
+        } else if (Number(frameRateRef.current) < 60) {
           currentFrameTimeRef.current = Date.now();
           const frameInterval = currentFrameTimeRef.current - prevFrameTimeRef.current;
 
@@ -115,20 +178,24 @@ export function ProceduralMesh(props: ProceduralMeshProps) {
           prevFrameTimeRef.current = currentFrameTimeRef.current;
         }
 
-        [verts_out, idx] = vertexBuffer.dequeue();  // eslint-disable-line
+        [verts_out, idx, faces_out] = vertexBuffer.dequeue();  // eslint-disable-line
         if (verts_out !== undefined) {
           bufferHeadFrameIndexRef.current = Number(bufferHeadFrameIndexRef.current) + 1;
         }
         frameCachedDivTextRef.current = vertexBuffer.data.length;
       }
+    } else {
+      // restart the clock from the head frame once resumed
+      clockOriginRef.current = undefined;
     }
 
     // vertex buffer is empty
     if (verts_out === undefined) return;
 
-    const positions = verts_out.flat();
+    const positions = verts_out;
     const normals = [];
 
+    applyTopology(positions, faces_out);
     BABYLON.VertexData.ComputeNormals(
       positions,
       pMeshRef.current.getIndices(),
@@ -186,8 +253,9 @@ export function ProceduralMesh(props: ProceduralMeshProps) {
         data: 0,
       });
 
-      const positions = verts_data.flat();
+      const positions = verts_data;
       const normals = [];
+      applyTopology(positions, verts.faces);
       BABYLON.VertexData.ComputeNormals(
         positions,
         pMeshRef.current.getIndices(),
@@ -217,8 +285,47 @@ export function ProceduralMesh(props: ProceduralMeshProps) {
     }
 
     const enqueue_vert_idx = Number(verts_idx);
-    const expected_vert_idx = Number(bufferHeadFrameIndexRef.current) + vertexBuffer.length();
-    if (Number(enqueue_vert_idx) !== Number(expected_vert_idx)) {
+    let expected_vert_idx = Number(bufferHeadFrameIndexRef.current) + vertexBuffer.length();
+    if (verts.skipped && enqueue_vert_idx > expected_vert_idx) {
+      // the server skipped the frames that would have been presented late
+      if (vertexBuffer.isEmpty()) {
+        bufferHeadFrameIndexRef.current = enqueue_vert_idx;
+      } else {
+        // hold the last buffered frame in place of the skipped frames
+        const [tailVerts, , tailFaces, tailTimestamp] = vertexBuffer.tail();
+        const numSkipped = enqueue_vert_idx - expected_vert_idx;
+        const interval = (verts.timestamp - tailTimestamp) / (numSkipped + 1);
+        for (let i = 1; i <= numSkipped; i += 1) {
+          if (!vertexBuffer.isPushable(bufferHeadFrameIndexRef.current, numFramesRef.current)) {
+            break;
+          }
+          vertexBuffer.enqueue(
+            tailVerts,
+            expected_vert_idx + i - 1,
+            tailFaces,
+            tailTimestamp + interval * i,
+          );
+        }
+      }
+      expected_vert_idx = Number(bufferHeadFrameIndexRef.current) + vertexBuffer.length();
+      if (!vertexBuffer.isPushable(bufferHeadFrameIndexRef.current, numFramesRef.current)) {
+        if (!vertexBuffer.isOpen) return;
+        vertexBuffer.setIsOpen(false);
+        sendMessage(webSocketRef.current, ServerActionsEnum.UPDATE_IS_BUFFER_OPEN, false);
+        return;
+      }
+    }
+    if (!controlsPlayhead && enqueue_vert_idx !== expected_vert_idx) {
+      // another viewer controls the shared playhead, follow its frames
+      console.log(`Following the shared playhead to frame ${enqueue_vert_idx}.`);
+      vertexBuffer.reset();
+      bufferHeadFrameIndexRef.current = enqueue_vert_idx;
+      dispatch({
+        type: 'write',
+        path: 'streaming/frameIndex',
+        data: enqueue_vert_idx,
+      });
+    } else if (Number(enqueue_vert_idx) !== Number(expected_vert_idx)) {
       // unexpected frame, tell the backend to resend the expected frame
       let info = `Expected frame ${expected_vert_idx} whereas frame ${enqueue_vert_idx} received, `;
       const diff = expected_vert_idx - enqueue_vert_idx;
@@ -242,7 +349,7 @@ export function ProceduralMesh(props: ProceduralMeshProps) {
       console.log(info);
       return;
     }
-    vertexBuffer.enqueue(verts_data, verts_idx);
+    vertexBuffer.enqueue(verts_data, verts_idx, verts.faces, verts.timestamp);
 
     frameCachedDivTextRef.current = vertexBuffer.data.length;
   }, [updateAnimationSuccess, verts]); // eslint-disable-line
@@ -252,34 +359,19 @@ export function ProceduralMesh(props: ProceduralMeshProps) {
       return;
     }
 
-    const indices = [];
-    // strip the vertex indices: |F|, 3 -> |F|x3
-    faces.forEach((face) => {
-      /*
-            There exists a polygon winding order gap between the SMPL and
-            the Babylon.js. For arbitrary face 'f' in mesh:
-
-                   o  V1(#VERT1/#UV1/#NORMAL1)
-
-                           V3(#VERT3/#UV3/#NORMAL3)
-             o            o
-               V2(#VERT2/#UV2/#NORMAL2)
-
-            SMPL uses counter-clockwise(CCW) polygon winding order:
-                f #VERT1/#UV1/#NORMAL1 #VERT2/#UV2/#NORMAL2 #VERT3/#UV3/#NORMAL3
-
-            Whereas the Babylon.js uses clockwise(CW) polygon winding order:
-                f #VERT1/#UV1/#NORMAL1 #VERT3/#UV3/#NORMAL3 #VERT2/#UV2/#NORMAL2
-        */
-      indices.push(face[0], face[2], face[1]);
-    });
+    const indices = toBabylonIndices(faces);
+    let numVerts = 0;
+    for (let i = 0; i < faces.length; i += 1) {
+      numVerts = Math.max(numVerts, faces[i] + 1);
+    }
 
-    const positions = Array(10475 * 3).fill(0.0);
+    const positions = new Float32Array(numVerts * 3);
     const vertexData = new BABYLON.VertexData();
     vertexData.indices = indices;
     vertexData.positions = positions;
 
     vertexData.applyToMesh(pMeshRef.current, true);
+    displayedFacesRef.current = undefined;
   }, [scene, faces]); // eslint-disable-line
 
   return (
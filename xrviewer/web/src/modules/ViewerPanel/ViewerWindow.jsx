@@ -955,6 +955,7 @@ function ViewerWindow() {
             currentFrameTimeRef={currentFrameTimeRef}
             desiredFrameIntervalRef={desiredFrameIntervalRef}
             frameRateRef={streamingFrameRateRef}
+            controlsPlayhead={state.streaming.controlsPlayhead}
           />
         </Scene>
       </Engine>
@@ -1,7 +1,10 @@
 import { useContext, useEffect } from 'react';
 import { useDispatch } from 'react-redux';
 import { WebSocketContext } from './WebSocket';
-import { ServerActionsEnum } from '../../actions';
+import { sendMessage, ServerActionsEnum } from '../../actions';
+import {
+  decodeNdarray, decodeVertices, QuantizedDeltaDecoder, supportedVertexEncodings,
+} from '../../codec';
 
 const msgpack = require('msgpack-lite');
 
@@ -9,24 +12,44 @@ const WebSocketListener = () => {
   const { socket } = useContext(WebSocketContext);
   const dispatch = useDispatch();
   useEffect(() => {
+    const vertexDecoder = new QuantizedDeltaDecoder();
+    // faces of the topologies of the stream data whose topology changes
+    // over time, referenced by the frames
+    const topologyFaces = new Map();
     socket.addEventListener('message', (originalCmd) => {
       const cmd = msgpack.decode(new Uint8Array(originalCmd.data));
 
       switch (cmd.type) {
         case ServerActionsEnum.UPDATE_MESH_FACES:
+          topologyFaces.clear();
           dispatch({
             type: 'write',
             path: 'streaming/meshFaces',
-            data: cmd.data,
+            // flattened [|F| x 3] Int32Array
+            data: decodeNdarray(cmd.data),
           });
           break;
         case ServerActionsEnum.UPDATE_MESH_VERTICES:
           dispatch({
             type: 'write',
             path: 'streaming/meshVertices',
-            data: cmd.data,
+            data: {
+              verts: decodeVertices(cmd.data.verts, vertexDecoder),
+              frame_idx: cmd.data.frame_idx,
+              // undefined if the topology of the stream data is constant
+              faces: topologyFaces.get(cmd.data.topology),
+              // time of the frame in seconds, undefined unless the server
+              // plays the frames on its clock
+              timestamp: cmd.data.timestamp,
+              // whether the server skipped the frames preceding this one
+              skipped: cmd.data.skipped === true,
+            },
           });
           break;
+        case ServerActionsEnum.UPDATE_TOPOLOGY_FACES:
+          // flattened [|F| x 3] Int32Array
+          topologyFaces.set(cmd.data.topology, decodeNdarray(cmd.data.faces));
+          break;
         case ServerActionsEnum.UPDATE_NUM_FRAMES:
           dispatch({
             type: 'write',
@@ -41,6 +64,23 @@ const WebSocketListener = () => {
             data: cmd.data,
           });
           break;
+        case ServerActionsEnum.UPDATE_BAKE_PROGRESS:
+          dispatch({
+            type: 'write',
+            path: 'streaming/bakeProgress',
+            // the frames are not baked anymore once baking has stopped
+            data: cmd.data.stopped
+              ? null
+              : cmd.data.n_baked / Math.max(cmd.data.n_frames, 1),
+          });
+          break;
+        case ServerActionsEnum.UPDATE_PLAYHEAD_CONTROL:
+          dispatch({
+            type: 'write',
+            path: 'streaming/controlsPlayhead',
+            data: cmd.data,
+          });
+          break;
         case ServerActionsEnum.UPDATE_STREAM_DATA_SUCCESS:
           dispatch({
             type: 'write',
@@ -50,6 +90,10 @@ const WebSocketListener = () => {
           break;
         case ServerActionsEnum.CONFIRM_WEBSOCKET_CONNECTED:
           console.log('webSocketConnectionConfirmed: '.concat(cmd.data));
+          // tell the server which vertex encodings can be decoded
+          sendMessage(socket, ServerActionsEnum.CONFIRM_WEBSOCKET_CONNECTED, {
+            vertex_encodings: supportedVertexEncodings,
+          });
           dispatch({
             type: 'write',
             path: 'webSocketState/webSocketConnectionConfirmed',
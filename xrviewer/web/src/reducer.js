@@ -45,7 +45,9 @@ export interface Streaming {
     instantFrame: Boolean,
     minimumPlayableFrame: Number,
     frameRate: Number,
-    maxBufferSize: Number
+    maxBufferSize: Number,
+    bakeProgress: any,
+    controlsPlayhead: Boolean
 }
 
 export interface ViewerState{
@@ -123,6 +125,10 @@ const initialState: ViewerState = {
     minimumPlayableFrame: 0,
     frameRate: 60,
     maxBufferSize: 256,
+    // fraction of frames baked by the pipeline, null if not baking
+    bakeProgress: null,
+    // whether the viewer controls the playhead shared with other viewers
+    controlsPlayhead: true,
   },
 };
 